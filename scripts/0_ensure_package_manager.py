@@ -4,6 +4,8 @@ import os
 import platform
 import subprocess
 
+import tracing
+
 def is_windows_version_supported():
     # On Windows, platform.release() returns e.g. "10", "11"
     try:
@@ -14,7 +16,7 @@ def is_windows_version_supported():
 
 def ensure_winget():
     try:
-        subprocess.run(['winget', '--version'], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        tracing.run(['winget', '--version'], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, category="install")
         return
     except (subprocess.CalledProcessError, FileNotFoundError):
         print("winget not found. Attempting to install winget…")
@@ -22,14 +24,14 @@ def ensure_winget():
         installer_url = 'https://aka.ms/getwinget'
         tmpfile = os.path.join(os.environ.get('TEMP', '/tmp'), 'getwinget.msixbundle')
         try:
-            subprocess.run([
+            tracing.run([
                 'powershell', '-Command',
                 f"Invoke-WebRequest -Uri {installer_url!r} -OutFile {tmpfile!r}"
-            ], check=True)
-            subprocess.run([
+            ], check=True, category="install")
+            tracing.run([
                 'powershell', '-Command',
                 f"Add-AppxPackage -Path {tmpfile!r}"
-            ], check=True)
+            ], check=True, category="install")
             print("winget installed successfully.")
         except subprocess.CalledProcessError:
             print("Failed to install winget. Please install the Windows Package Manager manually:")
@@ -54,16 +56,16 @@ def is_ubuntu_version_supported():
 
 def ensure_homebrew():
     try:
-        subprocess.run(['brew', '--version'], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        tracing.run(['brew', '--version'], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, category="install")
         print("Homebrew is installed.")
     except (subprocess.CalledProcessError, FileNotFoundError):
         print("Homebrew is not installed. Attempting to install Homebrew…")
         try:
             # Use the official Homebrew install script
-            subprocess.run([
+            tracing.run([
                 'bash', '-c',
                 '"$(curl -fsSL https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh)"'
-            ], check=True)
+            ], check=True, category="install")
             print("Homebrew installed successfully.")
         except subprocess.CalledProcessError:
             print("Failed to install Homebrew. Please install it manually from https://brew.sh/")
@@ -91,4 +93,5 @@ def main():
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
+    with tracing.span('0_ensure_package_manager', 'script'):
+        main()
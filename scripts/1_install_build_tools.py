@@ -1,8 +1,13 @@
-import os, sys, platform, subprocess, tempfile
+import os, sys, platform, tempfile, argparse
 from pathlib import Path
-from urllib.request import urlretrieve
 from dataclasses import make_dataclass, fields
 
+import downloader
+import package_install
+import vswhere
+import toolchain_probe
+import tracing
+
 def ensure_msvc2022():
 
     VSInstallerUtilities = make_dataclass('VSInstallerUtilities', [
@@ -47,58 +52,22 @@ def ensure_msvc2022():
     ]
     
     # Get Installer Executables
-    pf86 = os.environ.get("ProgramFiles(x86)")
-    vs_installer_utilities_tuple_list = \
-        [
-            (
-                util.name,
-                os.path.join(
-                    pf86, 
-                    "Microsoft Visual Studio",
-                    "Installer",
-                    f"{util.name}.exe"
-                ) if util.name else ""
-            )
-            for util in fields(VSInstallerUtilities)
-        ]
-    vs_installer_utilities = VSInstallerUtilities(**dict(vs_installer_utilities_tuple_list))
+    pf86 = os.environ.get("ProgramFiles(x86)", "")
+    setup = os.path.join(pf86, "Microsoft Visual Studio", "Installer", "setup.exe") if pf86 else ""
+    vs_installer_utilities = VSInstallerUtilities(
+        vswhere=vswhere.vswhere_path(),
+        setup=setup if os.path.isfile(setup) else "",
+    )
     ## If no VS installer utilities are found, vs_installer_utilities.vswhere = ""
 
-    # Get VS2022 Installation Info
-    install_info_tuple_list = []
-    if vs_installer_utilities.vswhere:
-        for installPropertyId in fields(VS2022InstallInfo):
-            result = subprocess.run(
-                [
-                    vs_installer_utilities.vswhere,
-                    "-latest",
-                    "-products", "*",
-                    "-version", "[17.0,18.0)", # VS2022(17)
-                    "-property", installPropertyId.name
-                ],
-                capture_output=True, text=True
-            )
-            property = result.stdout.strip() if result.returncode == 0 else ""
-            install_info_tuple_list.append((installPropertyId.name, property))
-    else:
-        install_info_tuple_list = [(propId.name, "") for propId in fields(VS2022InstallInfo)]
-    install_info = VS2022InstallInfo(**dict(install_info_tuple_list))
+    # Get VS2022 Installation and Component Info from a single vswhere call
+    installation = vswhere.latest_installation(vs_installer_utilities.vswhere) if vs_installer_utilities.vswhere else None
+    install_info = VS2022InstallInfo(**{
+        prop.name: vswhere.installation_property(installation, prop.name) for prop in fields(VS2022InstallInfo)
+    })
     ## If no VS2022 are found, install_info.installationPath = ""
-
-    # Get Component Installation Info
-    if vs_installer_utilities.vswhere:
-        for i in range(len(vs_required_components)):
-            result = subprocess.run(
-                [
-                    vs_installer_utilities.vswhere,
-                    "-latest",
-                    "-products", "*",
-                    "-requires", vs_required_components[i].id,
-                    "-property", "installationVersion"
-                ],
-                capture_output=True, text=True
-            )
-            vs_required_components[i].version = result.stdout.strip() if result.returncode == 0 else ""
+    for comp in vs_required_components:
+        comp.version = vswhere.component_version(installation, comp.id)
 
     # Print and Action
     if not vs_installer_utilities.setup:
@@ -110,10 +79,10 @@ def ensure_msvc2022():
             dir=downloads_dir, suffix=".exe", delete=False
         )
         tmp_path = Path(tmp_file.name)
-        tmp_file.close()  # close so urlretrieve can write to it
+        tmp_file.close()  # close so the downloader can write to it
         # 3. Download the VS Community installer
         url = "https://aka.ms/vs/17/release/vs_community.exe"
-        urlretrieve(url, str(tmp_path))
+        downloader.download(url, str(tmp_path))
         # 4. Specify the installer as the setup utility
         vs_installer_utilities.setup = str(tmp_path)
         vs_installer_utilities.vswhere = ""
@@ -122,7 +91,7 @@ def ensure_msvc2022():
     if not_installed_comps:
         print(f'ERROR: These components are not installed and required to be installed: {[comp.name for comp in not_installed_comps]}')
         not_installed_comps_ids = [comp.id for comp in not_installed_comps]
-        subprocess.run(
+        tracing.run(
             [
                 vs_installer_utilities.setup,
                 "modify",
@@ -131,6 +100,7 @@ def ensure_msvc2022():
                 '--channelId', install_info.channelId,
                 '--productId', install_info.productId,
             ],
+            category="install",
         )
         sys.exit(1)
 
@@ -141,38 +111,38 @@ def ensure_msvc2022():
         return True
 
 
-def ensure_ninja():
+def ensure_ninja(probe=None):
     def check_ninja():
-        try:
-            result = subprocess.run(["ninja", "--version"], check=True)
-            return result.returncode == 0
-        except FileNotFoundError:
+        ninja = probe or toolchain_probe.probe_tools(["ninja"])["ninja"]
+        if ninja.status != 'ok':
             print("Ninja build system is not installed. Please install it.")
             return False
+        print(ninja.version)
+        return True
 
     if not check_ninja():
         print("Installing Ninja build system...")
         system = platform.system()
         if system == 'Windows':
-            result = subprocess.run([
+            result = tracing.run([
                 "winget", "install", "--exact",
                 "--id", "Ninja-build.Ninja",
-                ], check=True)
+                ], check=True, category="install")
             if result.returncode != 0:
                 print("Failed to install Ninja. Please install it manually from https://ninja-build.org/")
                 sys.exit(1)
         elif system == 'Linux':
-            result = subprocess.run([
+            result = tracing.run([
                 "sudo", "apt-get", "install", "-y",
                 "ninja-build"
-                ], check=True)
+                ], check=True, category="install")
             if result.returncode != 0:
                 print("Failed to install Ninja. Please install it manually from https://ninja-build.org/")
                 sys.exit(1)
         elif system == 'Darwin':
-            result = subprocess.run([
+            result = tracing.run([
                 "brew", "install", "ninja"
-                ], check=True)
+                ], check=True, category="install")
             if result.returncode != 0:
                 print("Failed to install Ninja. Please install it manually from https://ninja-build.org/")
                 sys.exit(1)
@@ -187,7 +157,7 @@ def ensure_ninja():
         return True
 
 
-def ensure_xcode():
+def ensure_xcode(probe=None):
     """
     Check if Xcode is installed on macOS, and if not, prompt the user to install it.
     """
@@ -196,12 +166,9 @@ def ensure_xcode():
         """
         Check if Xcode command line tools are installed.
         """
-        try:
-            subprocess.run(["xcode-select", "--install"], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            return True
-        except subprocess.CalledProcessError:
-            return False
-        
+        xcode = probe or toolchain_probe.probe_tools(["xcode"])["xcode"]
+        return xcode.status == 'ok'
+
 
     if not is_xcode_installed():
         print("Xcode is not installed. Please install it from the App Store.")
@@ -211,7 +178,7 @@ def ensure_xcode():
     return True
 
 
-def ensure_cmake():
+def ensure_cmake(probe=None):
     """
     Check if CMake is installed on the system, and if not, install it.
     """
@@ -220,32 +187,29 @@ def ensure_cmake():
         """
         Check if CMake is installed.
         """
-        try:
-            subprocess.run(["cmake", "--version"], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return False
+        cmake = probe or toolchain_probe.probe_tools(["cmake"])["cmake"]
+        return cmake.status == 'ok'
 
     if not is_cmake_installed():
         system = platform.system()
         if system == 'Windows':
             print("CMake is not installed. Installing CMake using winget...")
-            result = subprocess.run([
+            result = tracing.run([
                 "winget", "install", "--exact",
                 "--id", "Kitware.CMake"
-                ], check=True)
+                ], check=True, category="install")
             if result.returncode != 0:
                 print("Failed to install CMake. Please install it manually from https://cmake.org/download/")
                 sys.exit(1)
         elif system == 'Linux':
             print("CMake is not installed. Installing CMake using apt-get...")
-            result = subprocess.run(["sudo", "apt-get", "install", "-y", "cmake"], check=True)
+            result = tracing.run(["sudo", "apt-get", "install", "-y", "cmake"], check=True, category="install")
             if result.returncode != 0:
                 print("Failed to install CMake. Please install it manually from https://cmake.org/download/")
                 sys.exit(1)
         elif system == 'Darwin':
             print("CMake is not installed. Installing CMake using Homebrew...")
-            result = subprocess.run(["brew", "install", "--cask", "cmake-app"], check=True)
+            result = tracing.run(["brew", "install", "--cask", "cmake-app"], check=True, category="install")
             if result.returncode != 0:
                 print("Failed to install CMake. Please install it manually from https://cmake.org/download/")
                 sys.exit(1)
@@ -260,7 +224,7 @@ def ensure_cmake():
         return True
 
 
-def ensure_build_essential():
+def ensure_build_essential(probe=None):
     """
     Check if build-essential is installed on Linux, and if not, install it.
     """
@@ -269,15 +233,12 @@ def ensure_build_essential():
         """
         Check if build-essential package is installed.
         """
-        try:
-            subprocess.run(["dpkg", "-l", "build-essential"], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            return True
-        except subprocess.CalledProcessError:
-            return False
+        build_essential = probe or toolchain_probe.probe_tools(["build-essential"])["build-essential"]
+        return build_essential.status == 'ok'
 
     if not is_build_essential_installed():
         print("build-essential is not installed. Installing build-essential...")
-        result = subprocess.run(["sudo", "apt-get", "install", "-y", "build-essential"], check=True)
+        result = tracing.run(["sudo", "apt-get", "install", "-y", "build-essential"], check=True, category="install")
         if result.returncode != 0:
             print("Failed to install build-essential. Please install it manually.")
             sys.exit(1)
@@ -289,7 +250,7 @@ def ensure_build_essential():
         return True
 
 
-def ensure_java():
+def ensure_java(probe=None):
     """
     Check if Java is installed on the system, and if not, install it.
     """
@@ -298,20 +259,17 @@ def ensure_java():
         """
         Check if Java is installed.
         """
-        try:
-            subprocess.run(["java", "-version"], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return False
+        java = probe or toolchain_probe.probe_tools(["java"])["java"]
+        return java.status == 'ok'
 
     if not is_java_installed():
         system = platform.system()
         if system == 'Windows':
-            subprocess.run(["winget", "install", "--id", "EclipseAdoptium.Temurin.17.JDK", "-e"], check=True)
+            tracing.run(["winget", "install", "--id", "EclipseAdoptium.Temurin.17.JDK", "-e"], check=True, category="install")
         elif system == 'Darwin':
-            subprocess.run(["brew", "install", "--cask","temurin"], check=True)
+            tracing.run(["brew", "install", "--cask","temurin"], check=True, category="install")
         elif system == 'Linux':
-            subprocess.run(["sudo", "apt", "install", "-y", "openjdk-17-jdk"], check=True)
+            tracing.run(["sudo", "apt", "install", "-y", "openjdk-17-jdk"], check=True, category="install")
         else:
             print(f"Unsupported operating system: {system}")
             sys.exit(1)
@@ -326,18 +284,43 @@ def main():
     Main function to ensure all build tools are installed.
     """
 
-    result = True
-    result &= ensure_cmake()
-    result &= ensure_ninja()
-    result &= ensure_java()
+    parser = argparse.ArgumentParser(
+        prog="1_install_build_tools",
+        description="Install the build tools needed to build onnxruntime."
+    )
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the packages that would be installed without installing them")
+    args = parser.parse_args()
 
     system = platform.system()
+    platform_probes = {'Linux': ['build-essential'], 'Darwin': ['xcode'], 'Windows': ['msvc']}.get(system, [])
+    # All probes run concurrently; unchanged tools are answered from the probe cache,
+    # and ensure_msvc2022 reuses the vswhere answer of the msvc probe.
+    probes = toolchain_probe.probe_tools(['cmake', 'ninja', 'java'] + platform_probes)
+
+    # Every missing package is installed in one package manager transaction
+    plan = package_install.plan_installs(probes, system)
+    package_install.print_plan(plan, system)
+    if args.dry_run:
+        return
+    package_install.apply_plan(plan, system)
+    planned = {package.tool for package in plan}
+
+    result = not plan
+    if 'cmake' not in planned:
+        result &= ensure_cmake(probes['cmake'])
+    if 'ninja' not in planned:
+        result &= ensure_ninja(probes['ninja'])
+    if 'java' not in planned:
+        result &= ensure_java(probes['java'])
+
     if system == 'Windows':
         result &= ensure_msvc2022()
     elif system == 'Linux':
-        result &= ensure_build_essential()
+        if 'build-essential' not in planned:
+            result &= ensure_build_essential(probes['build-essential'])
     elif system == 'Darwin':
-        result &= ensure_xcode()
+        result &= ensure_xcode(probes['xcode'])
     else:
         print(f"Unsupported operating system: {system}")
         sys.exit(1)
@@ -350,5 +333,6 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    with tracing.span('1_install_build_tools', 'script'):
+        main()
     
\ No newline at end of file
@@ -1,24 +1,27 @@
-import os, sys, platform, zipfile, hashlib, shutil, subprocess, argparse
+import os, sys, platform, zipfile, argparse
 from pathlib import Path
-from urllib.request import urlretrieve
+
+import deps_cache
+import hash_memo
+import sdk_packages
+import tracing
+import zip_extract
 
 ANDROID_COMMAND_LINE_TOOLS_VERSION = "13114758"
 ANDROID_COMMAND_LINE_TOOLS_ZIP_SHA256 = ""
+ANDROID_SDK_PACKAGES = [
+    "platform-tools",
+    "platforms;android-22",
+    "build-tools;22.0.1",
+    "ndk;27.2.12479018",
+]
 
 def sha256sum(path):
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-    return h.hexdigest()
+    return hash_memo.file_digest(path, "sha256")
 
 
 def sha1sum(filepath):
-    sha1 = hashlib.sha1()
-    with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            sha1.update(chunk)
-    return sha1.hexdigest()
+    return hash_memo.file_digest(filepath, "sha1")
 
 
 def download_android_command_line_tools(root):
@@ -48,14 +51,10 @@ def download_android_command_line_tools(root):
     
     print("Downloading Android Command Line Tools...")
     try:
-        if not os.path.exists(os.path.join(root, "_deps")):
-            os.makedirs(os.path.join(root, "_deps"))
-        response = urlretrieve(url, os.path.join(root, "_deps/android_commandlinetools.zip"))
-        print(f"Downloaded Android Command Line Tools to {response[0]}")
-        if sha256sum(response[0]) != ANDROID_COMMAND_LINE_TOOLS_ZIP_SHA256:
-            print("Downloaded file checksum does not match expected value.")
-            sys.exit(1)
-        return response[0]
+        deps_cache.fetch(url, ANDROID_COMMAND_LINE_TOOLS_ZIP_SHA256, local_path)
+        hash_memo.record_digest(local_path, "sha256", ANDROID_COMMAND_LINE_TOOLS_ZIP_SHA256)
+        print(f"Downloaded Android Command Line Tools to {local_path}")
+        return local_path
     except Exception as e:
         print(f"Failed to download Android Command Line Tools: {e}")
         sys.exit(1)
@@ -97,39 +96,49 @@ def ensure_android_command_line_tools(root):
         print("Android SDK Manager is already installed and verified.")
         return sdkmanager_path
 
-    if os.path.exists(cmdline_path):
-        print(f"Removing existing broken cmdline-tools directory at {cmdline_path}")
-        shutil.rmtree(cmdline_path)
-    elif not os.path.exists(cmdline_base_path):
-        print(f"Creating directory for Android Command Line Tools at {cmdline_base_path}")
-        os.makedirs(cmdline_base_path)
-
     print("Extracting Android Command Line Tools...")
-    with zipfile.ZipFile(local_path, 'r') as zip_ref:
-        zip_ref.extractall(cmdline_base_path)
-    print("Android Command Line Tools extracted successfully.")
+    rewritten, total = zip_extract.sync_zip(local_path, cmdline_base_path)
+    print(f"Android Command Line Tools extracted successfully ({rewritten} of {total} files rewritten).")
     return sdkmanager_path
 
 
-def install_android_sdk_tools(root):
+def install_android_sdk_tools(root, offline=False, archives=None, export=False):
     """
-    Install the Android SDK tools.
+    Install the Android SDK tools. Only packages without a package.xml under the
+    SDK root are installed, so sdkmanager does not even start when all are present.
+    Offline, they are extracted from the local archive cache instead; export fills
+    that cache from the installed packages.
     """
-    sdkmanager = ensure_android_command_line_tools(root)
     sdk_path = os.path.join(root, '_deps/android-sdk')
     os.makedirs(sdk_path, exist_ok=True)
-    
-    subprocess.run([
-        os.path.normpath(sdkmanager), 
-        "--install", 
-        "platform-tools", 
-        "platforms;android-22", 
-        "build-tools;22.0.1", 
-        "ndk;27.2.12479018",
-        f"--sdk_root={sdk_path}",
-        ], check=True)
-    
+    archives = archives or sdk_packages.archive_dir()
+
+    missing = sdk_packages.missing_packages(sdk_path, ANDROID_SDK_PACKAGES)
+    if not missing:
+        print("Android SDK components are already installed.")
+    elif offline:
+        unavailable = sdk_packages.install_from_archives(sdk_path, archives, missing)
+        if unavailable:
+            print(f"No archives for {', '.join(unavailable)} in {archives}. "
+                  "Run once online with --export to fill the archive cache.")
+            sys.exit(1)
+    else:
+        sdkmanager = ensure_android_command_line_tools(root)
+        tracing.run([
+            os.path.normpath(sdkmanager),
+            "--install",
+            ] + missing + [
+            f"--sdk_root={sdk_path}",
+            ], check=True, category="install")
+
+    missing = sdk_packages.missing_packages(sdk_path, ANDROID_SDK_PACKAGES)
+    if missing:
+        print(f"Failed to install Android SDK components: {', '.join(missing)}")
+        sys.exit(1)
     print("Android SDK components installed successfully.")
+    if export:
+        for path in sdk_packages.export_packages(sdk_path, archives, ANDROID_SDK_PACKAGES):
+            print(f"Exported {path}")
     print("Android Command Line Tools are ready to use.")
 
 if __name__ == "__main__":
@@ -146,9 +155,16 @@ if __name__ == "__main__":
         metavar="root",
         help="root directory of onnxruntime-secure repository"
     )
+    parser.add_argument("--offline", action="store_true",
+                        help="install missing packages from the local archive cache instead of sdkmanager")
+    parser.add_argument("--archive-dir", default=None,
+                        help="local archive cache (default: android-packages under the dependency cache)")
+    parser.add_argument("--export", action="store_true",
+                        help="archive the installed packages into the archive cache for offline installs")
 
     # Parse arguments; will auto-exit and print usage on error
     args = parser.parse_args()
     root = args.root.resolve()
 
-    install_android_sdk_tools(root)
\ No newline at end of file
+    with tracing.span("2_download_android_sdk", "script"):
+        install_android_sdk_tools(root, args.offline, args.archive_dir, args.export)
\ No newline at end of file
@@ -1,51 +1,11 @@
-import os, shutil, subprocess, argparse
+import argparse
 from pathlib import Path
 
-def run(cmd, cwd=None):
-    print(f"[RUN] {' '.join(cmd)}")
-    subprocess.run(cmd, cwd=cwd, check=True)
+import tracing
+from git_sync import sync_dependencies, dependency_dir, deepen_repo, add_sync_arguments, sync_options_from_args
 
-def is_git_repo(path):
-    return os.path.isdir(os.path.join(path, ".git"))
-
-def get_remote_url(path):
-    try:
-        result = subprocess.run(["git", "config", "--get", "remote.origin.url"],
-                                cwd=path, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        return result.stdout.strip()
-    except subprocess.CalledProcessError:
-        return None
-
-def clone_repo(repo_url, clone_dir):
-    run(["git", "clone", "--recursive", repo_url, clone_dir])
-
-def reset_and_update(clone_dir):
-    run(["git", "fetch", "--all"], cwd=clone_dir)
-    run(["git", "reset", "--hard", "origin/main"], cwd=clone_dir)
-    run(["git", "submodule", "update", "--init", "--recursive", "--force"], cwd=clone_dir)
-
-def ensure_onnxruntime_src_repo(root):
-    REPO_URL = "https://github.com/microsoft/onnxruntime.git"
-    CLONE_DIR = os.path.join(root, "_deps", "onnxruntime-src")
-
-    if os.path.isdir(CLONE_DIR):
-        if is_git_repo(CLONE_DIR):
-            remote_url = get_remote_url(CLONE_DIR)
-            if remote_url != REPO_URL:
-                print("[-] Remote URL mismatch. Removing and recloning.")
-                shutil.rmtree(CLONE_DIR)
-                clone_repo(REPO_URL, CLONE_DIR)
-            else:
-                print("[+] Repository exists and is correct. Updating...")
-                reset_and_update(CLONE_DIR)
-        else:
-            print("[-] Folder exists but is not a Git repository. Removing and recloning.")
-            shutil.rmtree(CLONE_DIR)
-            clone_repo(REPO_URL, CLONE_DIR)
-    else:
-        print("[+] Folder does not exist. Cloning repository.")
-        os.makedirs(os.path.dirname(CLONE_DIR), exist_ok=True)
-        clone_repo(REPO_URL, CLONE_DIR)
+def ensure_onnxruntime_src_repo(root, options=None, update_lock=False):
+    sync_dependencies(root, ["onnxruntime-src"], options, update_lock)
 
 if __name__ == "__main__":
 
@@ -61,9 +21,14 @@ if __name__ == "__main__":
         metavar="root",
         help="root directory of onnxruntime-secure repository"
     )
+    add_sync_arguments(parser)
 
     # Parse arguments; will auto-exit and print usage on error
     args = parser.parse_args()
     root = args.root.resolve()
 
-    ensure_onnxruntime_src_repo(root)
+    with tracing.span("2_download_onnxruntime_src", "script"):
+        if args.deepen is not None:
+            deepen_repo(dependency_dir(root, "onnxruntime-src"), args.deepen or None)
+        else:
+            ensure_onnxruntime_src_repo(root, sync_options_from_args(args), args.update_lock)
@@ -0,0 +1,55 @@
+import argparse
+from pathlib import Path
+
+import tracing
+from git_sync import sync_dependencies, dependency_dir, deepen_repo, add_sync_arguments, sync_options_from_args, \
+    update_lock_file, load_json, MANIFEST_FILE, LOCK_FILE
+
+def ensure_source_repos(root, names=None, options=None, update_lock=False, repo_jobs=None):
+    sync_dependencies(root, names, options, update_lock, repo_jobs)
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="2_download_sources",
+        description="Sync every source dependency in deps.json to the commit pinned in deps.lock.json."
+    )
+
+    # Positional argument "path"
+    parser.add_argument(
+        "root",
+        type=Path,
+        metavar="root",
+        help="root directory of onnxruntime-secure repository"
+    )
+    parser.add_argument(
+        "names",
+        nargs="*",
+        metavar="name",
+        help="dependencies to sync (default: all)"
+    )
+    parser.add_argument(
+        "--repo-jobs",
+        type=int,
+        default=None,
+        help="number of repositories to sync concurrently (default: all at once)"
+    )
+    parser.add_argument(
+        "--lock-only",
+        action="store_true",
+        help=f"resolve and write {LOCK_FILE} (with --update-lock: re-resolve every ref) without syncing"
+    )
+    add_sync_arguments(parser)
+
+    # Parse arguments; will auto-exit and print usage on error
+    args = parser.parse_args()
+    root = args.root.resolve()
+
+    with tracing.span("2_download_sources", "script"):
+        if args.lock_only:
+            update_lock_file(root, args.names, args.update_lock)
+        elif args.deepen is not None:
+            for name in args.names or sorted(load_json(root / MANIFEST_FILE)):
+                deepen_repo(dependency_dir(root, name), args.deepen or None)
+        else:
+            ensure_source_repos(root, args.names, sync_options_from_args(args), args.update_lock, args.repo_jobs)
@@ -0,0 +1,409 @@
+import os, re, sys, json, shutil, hashlib, tarfile, platform, posixpath, tempfile, subprocess, argparse
+from pathlib import Path
+from contextlib import contextmanager
+
+import deps_cache
+import hash_memo
+import tracing
+from git_sync import dependency_dir
+
+MANIFEST_FILE = "manifest.json"
+COMMON_BUNDLE = "common"
+BUNDLE_SUFFIX = ".tar.zst"
+DEFAULT_LEVEL = 10
+
+
+def zstd_backend():
+    """
+    First available zstd implementation: the standard library (Python 3.14+), the
+    zstandard package, or the zstd command line tool. None if there is none.
+    """
+    try:
+        from compression import zstd  # noqa: F401
+        return "compression.zstd"
+    except ImportError:
+        pass
+    try:
+        import zstandard  # noqa: F401
+        return "zstandard"
+    except ImportError:
+        pass
+    return "cli" if shutil.which("zstd") else None
+
+
+@contextmanager
+def zstd_writer(path, level=DEFAULT_LEVEL, backend=None):
+    """
+    Binary stream compressed into path.
+    """
+    backend = backend or zstd_backend()
+    if backend == "compression.zstd":
+        from compression import zstd
+        with zstd.open(path, "wb", level=level) as f:
+            yield f
+    elif backend == "zstandard":
+        import zstandard
+        with open(path, "wb") as raw, \
+                zstandard.ZstdCompressor(level=level, threads=-1).stream_writer(raw, closefd=False) as f:
+            yield f
+    elif backend == "cli":
+        proc = subprocess.Popen(["zstd", f"-{level}", "-T0", "-q", "-f", "-o", path], stdin=subprocess.PIPE)
+        try:
+            yield proc.stdin
+        finally:
+            proc.stdin.close()
+            if proc.wait() != 0:
+                raise RuntimeError(f"zstd failed to write {path}")
+    else:
+        raise RuntimeError("No zstd implementation found; install the zstandard package or the zstd tool.")
+
+
+@contextmanager
+def zstd_reader(path, backend=None):
+    """
+    Binary stream decompressed from path.
+    """
+    backend = backend or zstd_backend()
+    if backend == "compression.zstd":
+        from compression import zstd
+        with zstd.open(path, "rb") as f:
+            yield f
+    elif backend == "zstandard":
+        import zstandard
+        with open(path, "rb") as raw, zstandard.ZstdDecompressor().stream_reader(raw) as f:
+            yield f
+    elif backend == "cli":
+        proc = subprocess.Popen(["zstd", "-d", "-c", "-q", path], stdout=subprocess.PIPE)
+        try:
+            yield proc.stdout
+        finally:
+            proc.stdout.close()
+            if proc.wait() != 0:
+                raise RuntimeError(f"zstd failed to read {path}")
+    else:
+        raise RuntimeError("No zstd implementation found; install the zstandard package or the zstd tool.")
+
+
+def scan_tree(prefix):
+    """
+    {relative path: entry} of an install tree. Files are {sha256, size, mode},
+    symlinks {link: target}.
+    """
+    tree = {}
+    for dirpath, dirnames, filenames in os.walk(prefix):
+        for name in filenames + [name for name in dirnames if os.path.islink(os.path.join(dirpath, name))]:
+            path = os.path.join(dirpath, name)
+            relpath = os.path.relpath(path, prefix).replace(os.sep, "/")
+            if os.path.islink(path):
+                tree[relpath] = {"link": os.readlink(path)}
+            else:
+                st = os.stat(path)
+                tree[relpath] = {"sha256": hash_memo.file_digest(path), "size": st.st_size,
+                                 "mode": st.st_mode & 0o777}
+    return tree
+
+
+def bundle_name(archs, all_archs):
+    """
+    Bundle of the contents used by exactly archs: the architecture itself, "common"
+    for all of them, otherwise "common+<arch>+<arch>...".
+    """
+    if len(archs) == 1:
+        return next(iter(archs))
+    if set(archs) == set(all_archs):
+        return COMMON_BUNDLE
+    return "+".join([COMMON_BUNDLE] + sorted(archs))
+
+
+def plan_bundles(trees):
+    """
+    {bundle name: {archs, digests}}: every content goes into the one bundle of the
+    exact set of architectures using it, so unpacking an architecture reads no
+    content it does not need. The price is one bundle per combination of
+    architectures that actually shares files, some of them small.
+    """
+    users = {}
+    for arch, tree in trees.items():
+        for entry in tree.values():
+            if "sha256" in entry:
+                users.setdefault(entry["sha256"], set()).add(arch)
+    bundles = {arch: {"archs": [arch], "digests": []} for arch in trees}
+    for digest, archs in users.items():
+        bundle = bundles.setdefault(bundle_name(archs, trees), {"archs": sorted(archs), "digests": []})
+        bundle["digests"].append(digest)
+    for bundle in bundles.values():
+        bundle["digests"].sort()
+    return bundles
+
+
+def _bundle_key(digests, level):
+    return hashlib.sha256(json.dumps([digests, level]).encode()).hexdigest()
+
+
+def write_bundle(path, digests, sources, level, backend):
+    """
+    Write the contents as a zstd-compressed tar whose members are named by digest.
+    """
+    tmp = f"{path}.tmp{os.getpid()}"
+    with zstd_writer(tmp, level, backend) as f, tarfile.open(fileobj=f, mode="w|") as tar:
+        for digest in digests:
+            info = tar.gettarinfo(sources[digest], arcname=digest)
+            info.uid = info.gid = 0
+            info.uname = info.gname = ""
+            with open(sources[digest], "rb") as src:
+                tar.addfile(info, src)
+    os.replace(tmp, path)
+
+
+def load_manifest(store_dir):
+    try:
+        with open(os.path.join(store_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _check_name(name, what):
+    """
+    name must be a single path component, so joining it cannot leave its directory.
+    """
+    if not name or name in (".", "..") or re.search(r"[/\\:]", name):
+        raise RuntimeError(f"Unsafe {what} in {MANIFEST_FILE}: {name!r}")
+
+
+def validate_manifest(manifest):
+    """
+    Reject a manifest whose paths would write outside the destination tree:
+    absolute paths, drive letters, "." or ".." components, symlinks pointing
+    out of their architecture's tree or files placed below a symlink.
+    """
+    for name, bundle in manifest["bundles"].items():
+        _check_name(bundle["file"], "bundle file")
+    for arch, tree in manifest["trees"].items():
+        _check_name(arch, "architecture")
+        links = {relpath for relpath, entry in tree.items() if "link" in entry}
+        for relpath, entry in tree.items():
+            for part in relpath.split("/"):
+                _check_name(part, "path")
+            if any(relpath.startswith(link + "/") for link in links):
+                raise RuntimeError(f"Unsafe path in {MANIFEST_FILE}: {relpath!r} is below a symlink")
+            if "link" in entry:
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(relpath), entry["link"]))
+                if posixpath.isabs(entry["link"]) or ":" in entry["link"] or target == ".." \
+                        or target.startswith("../"):
+                    raise RuntimeError(f"Unsafe symlink in {MANIFEST_FILE}: {relpath!r} -> {entry['link']!r}")
+            elif not re.fullmatch(r"[0-9a-f]{64}", entry["sha256"]):
+                raise RuntimeError(f"Invalid digest in {MANIFEST_FILE} for {relpath!r}")
+
+
+def _extract_objects(store_dir, manifest, names, digests, staging):
+    """
+    {digest: path} of the given contents, read back from bundles names of a store into staging.
+    """
+    found = {}
+    for name in names:
+        bundle = manifest["bundles"][name]
+        with tracing.span("read_bundle", "package", bundle=name), \
+                zstd_reader(os.path.join(store_dir, bundle["file"])) as f, tarfile.open(fileobj=f, mode="r|") as tar:
+            for member in tar:
+                if member.name in digests and member.name not in found and member.isfile():
+                    path = os.path.join(staging, member.name)
+                    with tar.extractfile(member) as src, open(path, "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                    found[member.name] = path
+    return found
+
+
+def pack(install_root, store_dir, archs=None, level=DEFAULT_LEVEL, prune=False):
+    """
+    Store the install trees under install_root (one per architecture) as bundles
+    keyed by the set of architectures sharing their contents, and a manifest.
+    Architectures already in the store that are not packed again stay in it, their
+    contents read back from the old bundles, unless prune is set. Bundles whose
+    contents did not change are kept. Returns the manifest.
+    """
+    backend = zstd_backend()
+    if backend is None:
+        raise RuntimeError("No zstd implementation found; install the zstandard package or the zstd tool.")
+    archs = archs or sorted(name for name in os.listdir(install_root)
+                            if os.path.isdir(os.path.join(install_root, name)))
+    missing = [arch for arch in archs if not os.path.isdir(os.path.join(install_root, arch))]
+    if missing:
+        raise RuntimeError(f"No install tree for {', '.join(missing)} under {install_root}")
+    with tracing.span("scan_install_trees", "package", archs=archs):
+        trees = {arch: scan_tree(os.path.join(install_root, arch)) for arch in archs}
+    sources = {}
+    for arch, tree in trees.items():
+        for relpath, entry in tree.items():
+            if "sha256" in entry:
+                sources.setdefault(entry["sha256"], os.path.join(install_root, arch, *relpath.split("/")))
+
+    os.makedirs(store_dir, exist_ok=True)
+    old_manifest = load_manifest(store_dir) or {"archs": {}, "trees": {}, "bundles": {}}
+    validate_manifest(old_manifest)
+    previous = old_manifest["bundles"]
+    kept = {} if prune else {arch: tree for arch, tree in old_manifest["trees"].items() if arch not in trees}
+    if kept:
+        print(f"Keeping {', '.join(sorted(kept))} from the previous manifest (use --prune to drop them).")
+    trees.update(kept)
+
+    plan = plan_bundles(trees)
+    changed = {}
+    for name, bundle in plan.items():
+        bundle["key"] = _bundle_key(bundle["digests"], level)
+        if previous.get(name, {}).get("key") == bundle["key"] \
+                and os.path.isfile(os.path.join(store_dir, name + BUNDLE_SUFFIX)):
+            print(f"  {name:24} unchanged")
+        else:
+            changed[name] = bundle
+    with tempfile.TemporaryDirectory(dir=store_dir) as staging:
+        needed = {digest for bundle in changed.values() for digest in bundle["digests"] if digest not in sources}
+        if needed:
+            old_bundles = sorted({name for arch in kept for name in old_manifest["archs"][arch]})
+            sources.update(_extract_objects(store_dir, old_manifest, old_bundles, needed, staging))
+            if needed - set(sources):
+                raise RuntimeError(f"{len(needed - set(sources))} files of {', '.join(sorted(kept))} are missing "
+                                   f"from the store; pack them again or use --prune")
+        for name, bundle in changed.items():
+            with tracing.span("write_bundle", "package", bundle=name, objects=len(bundle["digests"])):
+                write_bundle(os.path.join(store_dir, name + BUNDLE_SUFFIX), bundle["digests"], sources, level, backend)
+
+    bundles = {}
+    for name, bundle in plan.items():
+        path = os.path.join(store_dir, name + BUNDLE_SUFFIX)
+        bundles[name] = {"file": name + BUNDLE_SUFFIX, "key": bundle["key"], "archs": bundle["archs"],
+                         "objects": len(bundle["digests"]), "size": os.path.getsize(path),
+                         "sha256": hash_memo.file_digest(path)}
+    manifest = {
+        "version": 1,
+        "archs": {arch: sorted(name for name, bundle in plan.items() if arch in bundle["archs"]) for arch in trees},
+        "trees": trees,
+        "bundles": bundles,
+    }
+    tmp = os.path.join(store_dir, f"{MANIFEST_FILE}.tmp{os.getpid()}")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(store_dir, MANIFEST_FILE))
+    for name in set(previous) - set(bundles):
+        deps_cache.remove_file(os.path.join(store_dir, previous[name]["file"]))
+    return manifest
+
+
+def print_pack_summary(manifest):
+    raw = sum(entry.get("size", 0) for tree in manifest["trees"].values() for entry in tree.values())
+    unique = {entry["sha256"]: entry["size"] for tree in manifest["trees"].values()
+              for entry in tree.values() if "sha256" in entry}
+    packed = sum(bundle["size"] for bundle in manifest["bundles"].values())
+    print(f"Packed {len(manifest['trees'])} install trees:")
+    for name, bundle in sorted(manifest["bundles"].items()):
+        print(f"  {bundle['file']:28} {bundle['objects']:6} files {bundle['size'] / 1024 / 1024:10.1f} MiB")
+    print(f"  {'install trees':28} {raw / 1024 / 1024:17.1f} MiB")
+    print(f"  {'after deduplication':28} {sum(unique.values()) / 1024 / 1024:17.1f} MiB")
+    print(f"  {'bundles':28} {packed / 1024 / 1024:17.1f} MiB")
+
+
+def unpack(store_dir, dest, archs=None):
+    """
+    Recreate the install trees of archs (default: all) under dest/<arch>. Each
+    bundle is decompressed once as a stream; every content is written once and
+    hardlinked to its other paths, within and across architectures.
+    """
+    manifest = load_manifest(store_dir)
+    if manifest is None:
+        raise RuntimeError(f"No {MANIFEST_FILE} in {store_dir}")
+    validate_manifest(manifest)
+    archs = archs or sorted(manifest["archs"])
+    unknown = [arch for arch in archs if arch not in manifest["archs"]]
+    if unknown:
+        raise RuntimeError(f"Unknown architectures: {', '.join(unknown)}")
+
+    targets = {}  # digest -> [(path, mode)]
+    for arch in archs:
+        for relpath, entry in manifest["trees"][arch].items():
+            path = os.path.join(dest, arch, *relpath.split("/"))
+            if "sha256" in entry:
+                targets.setdefault(entry["sha256"], []).append((path, entry["mode"]))
+
+    bundle_names = sorted({name for arch in archs for name in manifest["archs"][arch]})
+    for name in bundle_names:
+        bundle = manifest["bundles"][name]
+        with tracing.span("read_bundle", "package", bundle=name), \
+                zstd_reader(os.path.join(store_dir, bundle["file"])) as f, tarfile.open(fileobj=f, mode="r|") as tar:
+            for member in tar:
+                paths = targets.get(member.name)
+                if not paths or not member.isfile():
+                    continue
+                first, mode = paths[0]
+                os.makedirs(os.path.dirname(first), exist_ok=True)
+                tmp = f"{first}.tmp{os.getpid()}"
+                with tar.extractfile(member) as src, open(tmp, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                if os.name != "nt":
+                    os.chmod(tmp, mode)
+                os.replace(tmp, first)
+                for path, other_mode in paths[1:]:
+                    if other_mode == mode:
+                        deps_cache.link_into_place(first, path)
+                    else:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        shutil.copyfile(first, path)
+                        os.chmod(path, other_mode)
+
+    for arch in archs:
+        for relpath, entry in manifest["trees"][arch].items():
+            if "link" in entry:
+                path = os.path.join(dest, arch, *relpath.split("/"))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if os.path.lexists(path):
+                    os.remove(path)
+                os.symlink(entry["link"], path)
+    return archs
+
+
+def store_paths(root):
+    """
+    (install root, store directory) of the host platform's onnxruntime builds.
+    """
+    deps_dir = os.path.dirname(dependency_dir(root, 'onnxruntime-src'))
+    system = platform.system()
+    return (os.path.join(deps_dir, 'onnxruntime-install', system),
+            os.path.join(deps_dir, 'onnxruntime-artifacts', system))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="artifact_store",
+        description="Pack the onnxruntime install trees into deduplicated zstd bundles, or unpack them."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    pack_parser = subparsers.add_parser("pack", help="pack the install trees of every architecture")
+    pack_parser.add_argument(
+        "root",
+        type=Path,
+        metavar="root",
+        help="root directory of onnxruntime-secure repository"
+    )
+    pack_parser.add_argument("archs", nargs="*", metavar="arch", help="architectures to pack (default: all)")
+    pack_parser.add_argument("--level", type=int, default=DEFAULT_LEVEL,
+                             help="zstd compression level (default: %(default)s)")
+    pack_parser.add_argument("--prune", action="store_true",
+                             help="drop architectures of the existing store that are not packed this time")
+    unpack_parser = subparsers.add_parser("unpack", help="recreate install trees from a store")
+    unpack_parser.add_argument("store", type=Path, help="store directory with manifest.json and the bundles")
+    unpack_parser.add_argument("dest", type=Path, help="directory to unpack <arch> install trees into")
+    unpack_parser.add_argument("archs", nargs="*", metavar="arch", help="architectures to unpack (default: all)")
+    args = parser.parse_args()
+
+    with tracing.span("artifact_store", "script", command=args.command):
+        try:
+            if args.command == "pack":
+                install_root, store_dir = store_paths(args.root.resolve())
+                print_pack_summary(pack(install_root, store_dir, args.archs, args.level, args.prune))
+                print(f"Store written to {store_dir}")
+            else:
+                archs = unpack(str(args.store.resolve()), str(args.dest.resolve()), args.archs)
+                print(f"Unpacked {', '.join(archs)} into {args.dest}")
+        except (RuntimeError, OSError) as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
@@ -0,0 +1,287 @@
+import os, re, sys, json, math, time, platform, statistics, subprocess, argparse
+from pathlib import Path
+
+import ort_build
+import build_fingerprint
+import minimal_build
+import tracing
+from ort_build import BuildVariant
+from git_sync import dependency_dir, git_output
+
+HISTORY_FILE = "benchmark-history.jsonl"  # one JSON record per benchmark run
+DEFAULT_THRESHOLD = 10.0  # percent
+DEFAULT_REPETITIONS = 200
+DEFAULT_ROUNDS = 3  # for comparisons between builds
+
+LATENCY_PATTERN = re.compile(r"^(P50|P95|P99) Latency: ([0-9.eE+-]+) s", re.MULTILINE)
+THROUGHPUT_PATTERN = re.compile(r"^Number of inferences per second: ([0-9.eE+-]+)", re.MULTILINE)
+
+# metric -> True if larger is better
+METRICS = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "throughput": True}
+
+
+def perf_test_path(build_dir, config='Release'):
+    """
+    onnxruntime_perf_test built in build_dir, or None. Multi-config generators
+    put it one directory deeper (<config>/<config>).
+    """
+    name = 'onnxruntime_perf_test.exe' if platform.system() == 'Windows' else 'onnxruntime_perf_test'
+    for path in [os.path.join(build_dir, config, name), os.path.join(build_dir, config, config, name)]:
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def parse_perf_test(output):
+    """
+    {p50_ms, p95_ms, p99_ms, throughput} from the onnxruntime_perf_test summary,
+    or None if the summary is incomplete.
+    """
+    latencies = {f"{name.lower()}_ms": float(value) * 1000 for name, value in LATENCY_PATTERN.findall(output)}
+    throughput = THROUGHPUT_PATTERN.search(output)
+    if len(latencies) != 3 or throughput is None:
+        return None
+    return dict(latencies, throughput=float(throughput.group(1)))
+
+
+def run_model(perf_test, model, repetitions=DEFAULT_REPETITIONS, threads=None, env=None):
+    """
+    Benchmark one model on the CPU execution provider with generated inputs (-I).
+    Returns the parsed metrics, or None if the run failed. env replaces the
+    environment of perf_test, e.g. to find the PGO runtime.
+    """
+    cmd = [perf_test, '-I', '-e', 'cpu', '-m', 'times', '-r', str(repetitions)]
+    if threads:
+        cmd += ['-x', str(threads)]
+    cmd += [model]
+    print(f"[RUN] {' '.join(cmd)}")
+    result = tracing.run(cmd, capture_output=True, text=True, env=env, category="benchmark")
+    metrics = parse_perf_test(result.stdout) if result.returncode == 0 else None
+    if metrics is None:
+        print(result.stdout + result.stderr)
+    return metrics
+
+
+def benchmark_models(perf_test, models_dir, repetitions=DEFAULT_REPETITIONS, threads=None, env=None,
+                     suffix=".onnx"):
+    """
+    {model path relative to models_dir: metrics} for every model with the given
+    suffix under models_dir, or None if there are none or a run failed.
+    """
+    models = minimal_build.find_models(models_dir, suffix)
+    if not models:
+        print(f"ERROR: No {suffix} models under {models_dir}")
+        return None
+    results = {}
+    for model in models:
+        name = os.path.relpath(model, models_dir).replace(os.sep, "/")
+        with tracing.span("benchmark_model", "benchmark", model=name):
+            metrics = run_model(perf_test, model, repetitions, threads, env)
+        if metrics is None:
+            print(f"ERROR: Benchmark of {name} failed.")
+            return None
+        results[name] = metrics
+    return results
+
+
+def median_results(samples):
+    """
+    {model: {metric: median}} over the results of several benchmark rounds.
+    """
+    return {
+        model: {metric: statistics.median(sample[model][metric] for sample in samples) for metric in metrics}
+        for model, metrics in samples[0].items()
+    }
+
+
+def relative_cost(results, baseline):
+    """
+    {metric: percent} change against the baseline, as the geometric mean of the
+    per-model ratios. Positive latency and negative throughput changes are costs.
+    """
+    cost = {}
+    for metric in METRICS:
+        ratios = [results[model][metric] / baseline[model][metric] for model in results if baseline[model][metric]]
+        cost[metric] = 100 * (math.exp(sum(map(math.log, ratios)) / len(ratios)) - 1) if ratios else None
+    return cost
+
+
+def compare_builds(perf_tests, models_dir, repetitions=DEFAULT_REPETITIONS, rounds=DEFAULT_ROUNDS,
+                   threads=None):
+    """
+    {label: median results} of several builds given as {label: perf_test path},
+    benchmarked on the same models in rounds that alternate between the builds so
+    drift in machine load hits all of them alike. None if a build cannot be benchmarked.
+    """
+    missing = [label for label, perf_test in perf_tests.items() if perf_test is None]
+    if missing:
+        print(f"ERROR: No onnxruntime_perf_test for {', '.join(missing)}.")
+        return None
+    samples = {label: [] for label in perf_tests}
+    for round in range(rounds):
+        for label, perf_test in perf_tests.items():
+            with tracing.span("benchmark_build", "benchmark", build=label, round=round):
+                sample = benchmark_models(perf_test, models_dir, repetitions, threads)
+            if sample is None:
+                return None
+            samples[label].append(sample)
+    return {label: median_results(samples[label]) for label in samples}
+
+
+def build_identity(src_dir, install_prefix):
+    """
+    (fingerprint digest, ORT commit) of the installed build. The commit comes from
+    the recorded fingerprint, or from the source checkout if none was recorded.
+    """
+    fingerprint = build_fingerprint.load_fingerprint(install_prefix)
+    if fingerprint is not None:
+        return fingerprint["digest"], fingerprint["inputs"]["source"]["head"]
+    try:
+        commit = git_output(["rev-parse", "HEAD"], cwd=src_dir)
+    except (subprocess.CalledProcessError, OSError):
+        commit = None
+    return None, commit
+
+
+def load_history(path):
+    records = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return records
+
+
+def append_history(path, record):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+def previous_build(history, variant, fingerprint):
+    """
+    Most recent record of variant from a different build, or None. Reruns on
+    the same build are not a baseline for it.
+    """
+    for record in reversed(history):
+        if record["variant"] == variant and (fingerprint is None or record["fingerprint"] != fingerprint):
+            return record
+    return None
+
+
+def regressions(results, baseline, threshold):
+    """
+    [(model, metric, old, new, percent)] for every metric that got worse by more
+    than threshold percent compared with the baseline results.
+    """
+    found = []
+    for model, metrics in results.items():
+        old_metrics = baseline.get(model)
+        if not old_metrics:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = old_metrics.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = 100 * (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                found.append((model, metric, old, new, change))
+    return found
+
+
+def print_results(results, baseline):
+    print(f"  {'model':40} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'inf/s':>10}")
+    for model, metrics in results.items():
+        old = (baseline or {}).get(model) or {}
+        row = " ".join(f"{metrics[metric]:9.3f}" for metric in ["p50_ms", "p95_ms", "p99_ms"])
+        change = f"  ({100 * (metrics['throughput'] - old['throughput']) / old['throughput']:+.1f}%)" \
+            if old.get('throughput') else ""
+        print(f"  {model:40} {row} {metrics['throughput']:10.1f}{change}")
+
+
+def benchmark(root, variant, models_dir, config='Release', repetitions=DEFAULT_REPETITIONS, threads=None,
+              threshold=DEFAULT_THRESHOLD):
+    """
+    Benchmark every model under models_dir with the variant's onnxruntime_perf_test,
+    append the results to the history and compare them with the previous build.
+    Minimal builds only load ORT format models, so for them the models are
+    converted first, next to the ones the minimal builds were reduced to.
+    Returns 1 if the build cannot be benchmarked or a metric regressed past threshold.
+    """
+    src_dir = dependency_dir(root, 'onnxruntime-src')
+    deps_dir = os.path.dirname(src_dir)
+    platform_name = platform.system()
+    perf_test = perf_test_path(ort_build.build_dir(deps_dir, platform_name, variant), config)
+    if perf_test is None:
+        print(f"ERROR: No onnxruntime_perf_test in {ort_build.build_dir(deps_dir, platform_name, variant)}. "
+              f"Build the {variant.name} variant first.")
+        return 1
+    suffix = ".onnx"
+    if minimal_build.is_minimal(variant):
+        converted = os.path.join(deps_dir, 'onnxruntime-models', platform_name, f'{variant.name}-benchmark')
+        if minimal_build.convert_models(src_dir, os.path.abspath(models_dir), converted) is None:
+            return 1
+        models_dir, suffix = converted, ".ort"
+    results = benchmark_models(perf_test, models_dir, repetitions, threads, suffix=suffix)
+    if results is None:
+        return 1
+
+    fingerprint, commit = build_identity(src_dir, ort_build.install_dir(deps_dir, platform_name, variant))
+    history_path = os.path.join(deps_dir, 'onnxruntime-build', platform_name, HISTORY_FILE)
+    baseline = previous_build(load_history(history_path), variant.name, fingerprint)
+    append_history(history_path, {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "variant": variant.name,
+        "config": config,
+        "fingerprint": fingerprint,
+        "commit": commit,
+        "repetitions": repetitions,
+        "results": results,
+    })
+
+    print(f"== {platform_name} {variant.name} ({commit[:12] if commit else 'unknown commit'})")
+    print_results(results, baseline and baseline["results"])
+    if baseline is None:
+        print("No previous build to compare with.")
+        return 0
+    found = regressions(results, baseline["results"], threshold)
+    for model, metric, old, new, change in found:
+        print(f"REGRESSION: {model} {metric} {old:.3f} -> {new:.3f} ({change:+.1f}%)")
+    if found:
+        print(f"ERROR: {len(found)} metrics regressed by more than {threshold}% "
+              f"since build {(baseline['commit'] or 'unknown')[:12]}.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="benchmark",
+        description="Benchmark a build with onnxruntime_perf_test and fail if it regressed since the previous build."
+    )
+    parser.add_argument(
+        "root",
+        type=Path,
+        metavar="root",
+        help="root directory of onnxruntime-secure repository"
+    )
+    parser.add_argument("--models", type=Path, required=True, help="directory of .onnx models to benchmark")
+    parser.add_argument("--variant", default=ort_build.host_variant().name,
+                        help="build variant, e.g. x64 or x86_64-minimal (default: %(default)s)")
+    parser.add_argument("--config", default="Release", help="CMake build configuration (default: %(default)s)")
+    parser.add_argument("--repetitions", type=int, default=DEFAULT_REPETITIONS,
+                        help="inference runs per model (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op threads (default: onnxruntime's)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown in percent before failing (default: %(default)s)")
+    args = parser.parse_args()
+
+    with tracing.span("benchmark", "script"):
+        sys.exit(benchmark(args.root.resolve(), BuildVariant(args.variant, []), str(args.models.resolve()),
+                           args.config, args.repetitions, args.threads, args.threshold))
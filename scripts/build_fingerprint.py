@@ -0,0 +1,120 @@
+import os, sys, json, hashlib, platform, subprocess, argparse
+
+import hash_memo
+import toolchain_probe
+from git_sync import git_output, submodule_shas
+
+FINGERPRINT_SUFFIX = ".fingerprint.json"
+
+
+def fingerprint_path(install_prefix):
+    """
+    The fingerprint lives next to the install prefix, e.g. Linux/x86_64.fingerprint.json.
+    """
+    return os.path.normpath(install_prefix) + FINGERPRINT_SUFFIX
+
+
+def source_state(src_dir):
+    """
+    {head, submodules} of the source checkout, or None if it is not a clean git
+    checkout (uncommitted changes or submodules off their recorded commits).
+    """
+    try:
+        if git_output(["status", "--porcelain", "--untracked-files=no", "--ignore-submodules=none"], cwd=src_dir):
+            return None
+        submodules = submodule_shas(src_dir)
+        if submodules is None:
+            return None
+        return {"head": git_output(["rev-parse", "HEAD"], cwd=src_dir), "submodules": submodules}
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def toolchain_versions(generator):
+    """
+    Versions of the tools that shape the build output for the given generator.
+    """
+    windows = platform.system() == 'Windows'
+    names = ['cmake'] + (['ninja'] if generator == 'Ninja' else []) + \
+        ([toolchain_probe.MSVC_PROBE] if windows else ['cxx'])
+    return {name: probe.version for name, probe in toolchain_probe.probe_tools(names).items()}
+
+
+def compute_fingerprint(src_dir, args, generator):
+    """
+    Fingerprint of a build: source commit and submodule SHAs, the full build.py
+    argument list (flags and extra defines included), the content of every file
+    the arguments name (e.g. an --include_ops_by_config file) and the toolchain versions.
+    None if the source state cannot be pinned down, in which case the build always runs.
+    """
+    source = source_state(src_dir)
+    if source is None:
+        return None
+    inputs = {
+        "source": source,
+        "args": args,
+        "files": {arg: hash_memo.file_digest(arg) for arg in args if os.path.isfile(arg)},
+        "toolchain": toolchain_versions(generator),
+        "platform": platform.machine(),
+    }
+    digest = hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+    return {"digest": digest, "inputs": inputs}
+
+
+def load_fingerprint(install_prefix):
+    try:
+        with open(fingerprint_path(install_prefix)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_up_to_date(install_prefix, fingerprint):
+    """
+    True if install_prefix exists and was built from exactly these inputs.
+    """
+    if fingerprint is None or not os.path.isdir(install_prefix):
+        return False
+    recorded = load_fingerprint(install_prefix)
+    return recorded is not None and recorded.get("digest") == fingerprint["digest"]
+
+
+def changed_inputs(install_prefix, fingerprint):
+    """
+    Top-level inputs that differ from the recorded fingerprint, for explaining a rebuild.
+    """
+    recorded = load_fingerprint(install_prefix)
+    if recorded is None or fingerprint is None:
+        return []
+    return sorted(key for key in fingerprint["inputs"] if recorded["inputs"].get(key) != fingerprint["inputs"][key])
+
+
+def write_fingerprint(install_prefix, fingerprint):
+    path = fingerprint_path(install_prefix)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(fingerprint, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def remove_fingerprint(install_prefix):
+    try:
+        os.remove(fingerprint_path(install_prefix))
+    except FileNotFoundError:
+        pass
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="build_fingerprint",
+        description="Print the fingerprint recorded next to an install prefix."
+    )
+    parser.add_argument("install_prefix", help="install prefix, e.g. _deps/onnxruntime-install/Linux/x86_64")
+    args = parser.parse_args()
+
+    fingerprint = load_fingerprint(args.install_prefix)
+    if fingerprint is None:
+        print(f"No fingerprint recorded for {args.install_prefix}")
+        sys.exit(1)
+    print(json.dumps(fingerprint, indent=1, sort_keys=True))
@@ -0,0 +1,293 @@
+import os, re, sys, json, glob, shutil, argparse
+from pathlib import Path
+from dataclasses import make_dataclass, asdict
+
+import tracing
+import ort_build
+from git_sync import dependency_dir
+
+NINJA_LOG = ".ninja_log"
+REPORT_FILE = "ninja-report.json"  # summary of the previous run, next to .ninja_log
+
+Step = make_dataclass('Step', [
+    ('output', str), ('start', int), ('end', int), ('outputs', list)
+])
+## start/end: milliseconds since the start of the run; outputs: every output of the edge
+
+COMPILE_SUFFIXES = ('.o', '.obj')
+LINK_SUFFIXES = ('.so', '.dll', '.dylib', '.exe', '.a', '.lib', '.pyd')
+
+
+def step_kind(step):
+    name = step.output.lower()
+    if name.endswith(COMPILE_SUFFIXES):
+        return 'compile'
+    if name.endswith(LINK_SUFFIXES) or '.so.' in name:
+        return 'link'
+    return 'other'
+
+
+def duration(step):
+    return step.end - step.start
+
+
+def read_last_run(log_path):
+    """
+    Steps of the most recent run recorded in a .ninja_log. Ninja appends every run
+    to the same log with times restarting at zero, and writes entries in completion
+    order, so the last run starts after the last entry whose end time goes backwards.
+    Outputs of one edge share start, end and command hash and become one Step.
+    """
+    with open(log_path) as f:
+        header = f.readline()
+        version = re.match(r"# ninja log v(\d+)", header)
+        if not version or int(version.group(1)) < 5:
+            raise ValueError(f"Unsupported ninja log format in {log_path}: {header.strip()}")
+        entries, last_end = [], -1
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 5:
+                continue
+            start, end, output, command_hash = int(fields[0]), int(fields[1]), fields[3], fields[4]
+            if end < last_end:
+                entries = []
+            last_end = end
+            entries.append((start, end, command_hash, output))
+
+    steps = {}
+    for start, end, command_hash, output in entries:
+        key = (start, end, command_hash)
+        if key in steps:
+            steps[key].outputs.append(output)
+        else:
+            steps[key] = Step(output, start, end, [output])
+    return list(steps.values())
+
+
+def _parse_graph(dot):
+    """
+    {output: [inputs]} from `ninja -t graph`. Edges with several inputs or outputs
+    are drawn through an intermediate ellipse node.
+    """
+    labels, edges = {}, []
+    for line in dot.splitlines():
+        node = re.match(r'^"(0x[0-9a-f]+)" \[label="(.*?)"(.*)\]$', line)
+        if node:
+            labels[node.group(1)] = None if 'shape=ellipse' in node.group(3) else node.group(2)
+            continue
+        edge = re.match(r'^"(0x[0-9a-f]+)" -> "(0x[0-9a-f]+)"', line)
+        if edge:
+            edges.append((edge.group(1), edge.group(2)))
+    into = {}
+    for src, dst in edges:
+        into.setdefault(dst, []).append(src)
+
+    def file_inputs(node):
+        inputs = []
+        for src in into.get(node, []):
+            if labels.get(src) is None:  # intermediate edge node
+                inputs.extend(file_inputs(src))
+            else:
+                inputs.append(labels[src])
+        return inputs
+
+    return {labels[node]: file_inputs(node) for node in into if labels.get(node) is not None}
+
+
+def dependency_graph(build_dir):
+    """
+    {output: [inputs]} for the whole build, or None if ninja is not available.
+    """
+    ninja = shutil.which("ninja")
+    if ninja is None:
+        return None
+    result = tracing.run([ninja, "-C", build_dir, "-t", "graph"], capture_output=True, text=True, category="report")
+    if result.returncode != 0:
+        return None
+    return _parse_graph(result.stdout)
+
+
+def critical_path(steps, graph=None):
+    """
+    Longest chain of dependent steps, weighted by their duration in this run.
+    Without a dependency graph the chain is approximated from timing alone: from the
+    last step to finish, repeatedly take the latest step that ended before it started.
+    """
+    if graph is not None:
+        by_output = {output: step for step in steps for output in step.outputs}
+        best = {}  # output -> (cost of the heaviest chain ending there, previous step)
+
+        def cost(output, visiting=()):
+            if output in best:
+                return best[output][0]
+            if output in visiting:
+                return 0
+            step = by_output.get(output)
+            chain = max(((cost(dep, visiting + (output,)), dep) for dep in graph.get(output, [])), default=(0, None))
+            best[output] = (chain[0] + (duration(step) if step else 0), chain[1])
+            return best[output][0]
+
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+        end = max((step.output for step in steps), key=cost, default=None)
+        path = []
+        while end is not None:
+            if end in by_output and (not path or path[-1] is not by_output[end]):
+                path.append(by_output[end])
+            end = best.get(end, (0, None))[1]
+        return list(reversed(path))
+
+    path, remaining = [], sorted(steps, key=lambda step: step.end)
+    current = remaining[-1] if remaining else None
+    while current is not None:
+        path.append(current)
+        before = [step for step in remaining if step.end <= current.start]
+        current = before[-1] if before else None
+    return list(reversed(path))
+
+
+def summarize(steps, path, top):
+    wall = max((step.end for step in steps), default=0) - min((step.start for step in steps), default=0)
+    cpu = sum(duration(step) for step in steps)
+    ranked = sorted(steps, key=duration, reverse=True)
+    return {
+        "steps": len(steps),
+        "wall_ms": wall,
+        "cpu_ms": cpu,
+        "parallelism": cpu / wall if wall else 0.0,
+        "critical_path_ms": sum(duration(step) for step in path),
+        "critical_path": [asdict(step) for step in path],
+        "slowest_compile": [asdict(step) for step in ranked if step_kind(step) == 'compile'][:top],
+        "slowest_link": [asdict(step) for step in ranked if step_kind(step) == 'link'][:top],
+        "durations": {step.output: duration(step) for step in steps},
+    }
+
+
+def find_build_dirs(build_root):
+    """
+    {"<OS>/<arch>/<config>": dir} of every build directory with a ninja log.
+    """
+    return {
+        os.path.relpath(os.path.dirname(log), build_root).replace(os.sep, "/"): os.path.dirname(log)
+        for log in sorted(glob.glob(os.path.join(build_root, "*", "*", "*", NINJA_LOG)))
+    }
+
+
+def unsupported_build_dirs(build_root):
+    """
+    {"<OS>/<arch>/<config>": generator} of configured build directories without a
+    ninja log, e.g. Visual Studio trees from before Windows builds switched to Ninja.
+    """
+    dirs = {}
+    for cache in sorted(glob.glob(os.path.join(build_root, "*", "*", "*", "CMakeCache.txt"))):
+        build_dir = os.path.dirname(cache)
+        generator = ort_build.cmake_generator(build_dir) or "unknown"
+        if not generator.startswith("Ninja") and not os.path.isfile(os.path.join(build_dir, NINJA_LOG)):
+            dirs[os.path.relpath(build_dir, build_root).replace(os.sep, "/")] = generator
+    return dirs
+
+
+def _seconds(ms):
+    return f"{ms / 1000:8.1f}s"
+
+
+def _delta(new, old, fmt):
+    if old is None:
+        return ""
+    change = new - old
+    return f"  ({'+' if change >= 0 else ''}{fmt(change).strip()})"
+
+
+def print_report(name, summary, previous, top):
+    print(f"== {name}")
+    old = previous or {}
+    print(f"  steps        {summary['steps']:9}{_delta(summary['steps'], old.get('steps'), str)}")
+    print(f"  wall time    {_seconds(summary['wall_ms'])}{_delta(summary['wall_ms'], old.get('wall_ms'), _seconds)}")
+    print(f"  CPU time     {_seconds(summary['cpu_ms'])}{_delta(summary['cpu_ms'], old.get('cpu_ms'), _seconds)}")
+    print(f"  parallelism  {summary['parallelism']:9.2f}"
+          f"{_delta(summary['parallelism'], old.get('parallelism'), lambda v: f'{v:.2f}')}")
+    print(f"  critical path {_seconds(summary['critical_path_ms'])} over {len(summary['critical_path'])} steps"
+          f"{_delta(summary['critical_path_ms'], old.get('critical_path_ms'), _seconds)}")
+    for step in summary['critical_path'][-top:]:
+        print(f"    {_seconds(step['end'] - step['start'])}  {step['output']}")
+    for kind in ('compile', 'link'):
+        print(f"  slowest {kind} steps:")
+        for step in summary[f'slowest_{kind}']:
+            print(f"    {_seconds(step['end'] - step['start'])}  {step['output']}")
+
+    if previous:
+        common = set(summary['durations']) & set(previous.get('durations', {}))
+        changes = sorted(((summary['durations'][o] - previous['durations'][o], o) for o in common), reverse=True)
+        regressions = [(change, output) for change, output in changes[:top] if change > 0]
+        if regressions:
+            print("  largest slowdowns since the previous run:")
+            for change, output in regressions:
+                print(f"    {change / 1000:+8.1f}s  {output}")
+
+
+def print_comparison(summaries):
+    """
+    One row per build directory, to compare architectures side by side.
+    """
+    print("== comparison")
+    print(f"  {'build':32} {'steps':>7} {'wall':>9} {'CPU':>9} {'par.':>6} {'critical':>9}")
+    for name, summary in summaries.items():
+        print(f"  {name:32} {summary['steps']:7} {_seconds(summary['wall_ms'])} {_seconds(summary['cpu_ms'])} "
+              f"{summary['parallelism']:6.2f} {_seconds(summary['critical_path_ms'])}")
+
+
+def report(build_root, top=10, use_graph=True):
+    """
+    Print a report for every build directory under build_root and remember each
+    summary so the next report can show what changed. Returns {name: summary}.
+    """
+    summaries = {}
+    for name, build_dir in find_build_dirs(build_root).items():
+        steps = read_last_run(os.path.join(build_dir, NINJA_LOG))
+        graph = dependency_graph(build_dir) if use_graph else None
+        summary = summarize(steps, critical_path(steps, graph), top)
+        summary["critical_path_source"] = "graph" if graph is not None else "timing"
+
+        report_path = os.path.join(build_dir, REPORT_FILE)
+        try:
+            with open(report_path) as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = None
+        print_report(name, summary, previous, top)
+        with open(report_path, "w") as f:
+            json.dump(summary, f)
+        summaries[name] = summary
+
+    for name, generator in unsupported_build_dirs(build_root).items():
+        print(f"== {name}")
+        print(f"  unsupported generator {generator}: only Ninja builds write the .ninja_log this report reads; "
+              f"rebuild to get a report")
+
+    if len(summaries) > 1:
+        print_comparison(summaries)
+    return summaries
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="build_report",
+        description="Report timing, critical path and slowest steps from the ninja logs of the onnxruntime builds."
+    )
+    parser.add_argument(
+        "root",
+        type=Path,
+        metavar="root",
+        help="root directory of onnxruntime-secure repository"
+    )
+    parser.add_argument("--top", type=int, default=10, help="slowest steps to list (default: %(default)s)")
+    parser.add_argument("--no-graph", dest="use_graph", action="store_false",
+                        help="estimate the critical path from timing instead of `ninja -t graph`")
+    args = parser.parse_args()
+
+    build_root = os.path.join(os.path.dirname(dependency_dir(args.root.resolve(), "onnxruntime-src")), "onnxruntime-build")
+    with tracing.span("build_report", "script"):
+        summaries = report(build_root, args.top, args.use_graph)
+    if not summaries:
+        print(f"No ninja logs found under {build_root}")
+        sys.exit(1)
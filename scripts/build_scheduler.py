@@ -0,0 +1,268 @@
+import os, re, sys, time, shlex, ctypes, threading, subprocess, argparse
+from dataclasses import make_dataclass, field
+
+import tracing
+
+# Peak resident memory of one ORT compile job (MSVC/GCC on the big kernels files)
+MEMORY_PER_JOB = 2 * 1024 ** 3
+# A build is not worth starting with fewer parallel jobs than this
+MIN_JOBS_PER_BUILD = 4
+
+BuildJob = make_dataclass('BuildJob', [
+    ('name', str), ('configure', list), ('build', object), ('cwd', str),
+    ('env', dict, field(default=None)), ('log', str, field(default='')),
+    ('up_to_date', bool, field(default=False)), ('on_success', object, field(default=None)),
+    ('error', str, field(default='')),
+])
+## configure: command run with a single slot, or None
+## build(jobs): command compiling and installing with the given parallelism
+## log: file receiving the combined output, if set
+## up_to_date: skip the build, its outputs are current
+## on_success(): called after the build succeeded, e.g. to record its fingerprint
+## error: why the build cannot run, e.g. no compiler; it fails without starting
+
+# Ninja status line: [finished edges/total edges]. Regenerating build.ninja runs as a
+# separate two-edge build before the real one, so those lines do not count.
+PROGRESS_PATTERN = re.compile(r"^\[(\d+)/(\d+)\] (?!Re-checking globbed directories|Re-running CMake)")
+# Link of the onnxruntime library itself, for generators without ninja's progress. Protoc,
+# onnxruntime_providers_shared and others link early while the kernels still compile.
+FINAL_LINK_PATTERN = re.compile(
+    r"Linking CXX shared library .*\blibonnxruntime\.(?:so|dylib)\b"  # Makefiles
+    r"|Creating library .*[\\/]onnxruntime\.lib\b"                  # MSVC link
+)
+
+
+def available_memory():
+    """
+    Bytes of memory available for new processes, or None if unknown.
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/meminfo") as f:
+                for line in f:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    elif os.name == "nt":
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def total_slots(memory_per_job=MEMORY_PER_JOB):
+    """
+    Compile jobs the machine can run at once: CPU count, capped by available memory.
+    """
+    cpus = os.cpu_count() or 1
+    memory = available_memory()
+    if memory is None:
+        return cpus
+    return max(1, min(cpus, memory // memory_per_job))
+
+
+class BuildScheduler:
+    """
+    Runs several builds at once within a shared budget of compile slots.
+
+    A build holds one slot while it configures, then waits for its share of the
+    budget before compiling with that many parallel jobs. The job count of a
+    running build cannot change, so rebalancing happens near its end: with
+    ninja, a build can run no more jobs than it has edges left, so it gives back
+    the slots above that count as its progress line nears the total. Other
+    generators give back all slots but one once the onnxruntime library links.
+    A build down to one slot is in its (mostly serial) link step and stops
+    counting against the concurrency limit, letting the next queued build
+    configure and compile while the first one links.
+    """
+
+    def __init__(self, builds, slots=None, max_concurrent=None):
+        self.builds = list(builds)
+        self.slots = slots or total_slots()
+        self.max_concurrent = max_concurrent or max(1, self.slots // MIN_JOBS_PER_BUILD)
+        self.free = self.slots
+        self.compiling = 0  # builds past configure that have not reached the link step
+        self.active = 0     # started builds that have not reached the link step
+        self.cond = threading.Condition()
+        self.output_lock = threading.Lock()
+        self.results = {}
+        self.timings = {}
+
+    def _share(self):
+        # Called with self.cond held: results is written by finishing builds
+        return max(1, self.slots // max(1, min(self.max_concurrent, len(self.builds) - len(self.results))))
+
+    def _acquire(self):
+        with self.cond:
+            # Take the full share, or whatever is free once no build is left to return slots
+            self.cond.wait_for(lambda: self.free >= self._share() or (self.free > 0 and self.compiling == 0))
+            got = min(self._share(), self.free)
+            self.free -= got
+            return got
+
+    def _release(self, count):
+        with self.cond:
+            self.free += count
+            self.cond.notify_all()
+
+    def _print(self, build, line):
+        with self.output_lock:
+            print(f"[{build.name}] {line}", flush=True)
+
+    def _run_step(self, build, phase, cmd, log, on_line=None):
+        self._print(build, f"[RUN] {shlex.join(cmd)}")
+        env = dict(os.environ, **build.env) if build.env else None
+        with tracing.span(f"{build.name} {phase}", "build", cmd=cmd) as span_args:
+            proc = subprocess.Popen(cmd, cwd=build.cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    text=True, encoding="utf-8", errors="replace", bufsize=1)
+            for line in proc.stdout:
+                line = line.rstrip()
+                if log:
+                    log.write(line + "\n")
+                self._print(build, line)
+                if on_line:
+                    on_line(line)
+            span_args["exit_code"] = proc.wait()
+        return span_args["exit_code"]
+
+    def _run_build(self, build):
+        log = open(build.log, "a", encoding="utf-8") if build.log else None
+        state = {'held': 1, 'compiling': False, 'linking': False}
+        started = time.monotonic()
+        timings = self.timings[build.name] = {}
+
+        def on_line(line):
+            if state['linking']:
+                return
+            progress = PROGRESS_PATTERN.match(line)
+            if progress:
+                keep = max(1, int(progress.group(2)) - int(progress.group(1)))
+            elif FINAL_LINK_PATTERN.search(line):
+                keep = 1
+            else:
+                return
+            if keep >= state['held']:
+                return
+            released = state['held'] - keep
+            if keep == 1:
+                timings['compile'] = time.monotonic() - compile_started
+                self._print(build, f"Reached link step; releasing {released} of {state['held']} slots.")
+                tracing.instant(f"{build.name} link", "build", released=released)
+            with self.cond:
+                if keep == 1:
+                    state['compiling'], state['linking'] = False, True
+                    self.compiling -= 1
+                    self.active -= 1
+                self.free += released
+                state['held'] = keep
+                self.cond.notify_all()
+
+        try:
+            if build.configure:
+                returncode = self._run_step(build, "configure", build.configure, log)
+                timings['configure'] = time.monotonic() - started
+                if returncode:
+                    return returncode
+            self._release(state['held'])
+            state['held'] = 0
+            jobs = self._acquire()
+            with self.cond:
+                state['held'], state['compiling'] = jobs, True
+                self.compiling += 1
+            compile_started = time.monotonic()
+            self._print(build, f"Building with {jobs} parallel jobs.")
+            returncode = self._run_step(build, "build", build.build(jobs), log, on_line)
+            if state['linking']:
+                timings['link'] = time.monotonic() - compile_started - timings['compile']
+            else:
+                timings['compile'] = time.monotonic() - compile_started
+            if returncode == 0 and build.on_success:
+                build.on_success()
+            return returncode
+        finally:
+            with self.cond:
+                if state['compiling']:
+                    self.compiling -= 1
+                if not state['linking']:
+                    self.active -= 1
+                self.free += state['held']
+                self.cond.notify_all()
+            timings['total'] = time.monotonic() - started
+            if log:
+                log.close()
+
+    def run(self):
+        """
+        Run every build and return {name: returncode}.
+        """
+        print(f"Scheduling {len(self.builds)} builds on {self.slots} slots, "
+              f"at most {self.max_concurrent} compiling at once.")
+        threads = []
+        for build in self.builds:
+            if build.up_to_date:
+                print(f"[{build.name}] Up to date; skipping.")
+                with self.cond:
+                    self.results[build.name] = 0
+                continue
+            if build.error:
+                print(f"[{build.name}] ERROR: {build.error}")
+                with self.cond:
+                    self.results[build.name] = 1
+                continue
+            with self.cond:
+                self.cond.wait_for(lambda: self.active < self.max_concurrent and self.free > 0)
+                self.active += 1
+                self.free -= 1
+
+            def target(build=build):
+                returncode = 1  # a build that raised counts as failed
+                try:
+                    returncode = self._run_build(build)
+                finally:
+                    with self.cond:
+                        self.results[build.name] = returncode
+                        self.cond.notify_all()
+
+            thread = threading.Thread(target=target, name=build.name)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        for build in self.builds:
+            timings = self.timings.get(build.name, {})
+            phases = ", ".join(f"{phase} {timings[phase]:.1f}s" for phase in ('configure', 'compile', 'link')
+                               if phase in timings)
+            status = "skip" if build.up_to_date else "ok" if self.results.get(build.name) == 0 else "FAILED"
+            print(f"  {build.name:24} {status:6} {timings.get('total', 0):8.1f}s  ({phases})")
+        return self.results
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="build_scheduler",
+        description="Print the compile slot budget the build scheduler would use on this machine."
+    )
+    parser.add_argument("--memory-per-job", type=float, default=MEMORY_PER_JOB / 1024 ** 3,
+                        help="GiB of memory one compile job needs (default: %(default)s)")
+    args = parser.parse_args()
+
+    memory = available_memory()
+    slots = total_slots(int(args.memory_per_job * 1024 ** 3))
+    print(f"CPUs: {os.cpu_count()}")
+    print(f"Available memory: {memory / 1024 ** 3:.1f} GiB" if memory else "Available memory: unknown")
+    print(f"Compile slots: {slots}, concurrent builds: {max(1, slots // MIN_JOBS_PER_BUILD)}")
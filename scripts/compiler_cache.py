@@ -0,0 +1,156 @@
+import os, sys, json, shutil, zlib, platform, argparse
+from dataclasses import make_dataclass
+
+import deps_cache
+import tracing
+
+CompilerCache = make_dataclass('CompilerCache', [
+    ('tool', str), ('path', str), ('max_size', str)
+])
+## tool: "ccache" or "sccache"; max_size: per-variant cache size, e.g. "5G"
+
+TOOLS = ['ccache', 'sccache']
+DEFAULT_MAX_SIZE = "5G"
+SCCACHE_BASE_PORT = 4226
+
+
+def find_compiler_cache(tool="auto", max_size=DEFAULT_MAX_SIZE):
+    """
+    CompilerCache for tool ("auto" picks the first of ccache, sccache on PATH),
+    or None if tool is "none" or not installed.
+    """
+    for name in (TOOLS if tool == "auto" else [tool] if tool != "none" else []):
+        path = shutil.which(name)
+        if path:
+            return CompilerCache(name, path, max_size)
+    if tool not in ("auto", "none"):
+        print(f"WARNING: {tool} not found on PATH; building without a compiler cache.")
+    return None
+
+
+def cache_dir(cache, variant_name):
+    """
+    Per-variant cache directory, so each architecture has its own size budget and statistics.
+    """
+    return os.path.join(deps_cache.cache_root(), "compiler-cache", cache.tool, variant_name)
+
+
+def cache_env(cache, variant_name):
+    """
+    Environment pointing the launcher at the variant's cache directory and size.
+    """
+    directory = cache_dir(cache, variant_name)
+    os.makedirs(directory, exist_ok=True)
+    if cache.tool == "ccache":
+        return {"CCACHE_DIR": directory, "CCACHE_MAXSIZE": cache.max_size}
+    # One sccache server per variant; the port is derived from the name so it is stable across runs
+    return {
+        "SCCACHE_DIR": directory,
+        "SCCACHE_CACHE_SIZE": cache.max_size,
+        "SCCACHE_SERVER_PORT": str(SCCACHE_BASE_PORT + zlib.crc32(variant_name.encode()) % 1000),
+    }
+
+
+def launcher_defines(cache):
+    """
+    Defines making CMake run the compilers through the cache; they do not change the output.
+    """
+    return [
+        f"CMAKE_C_COMPILER_LAUNCHER={cache.path}",
+        f"CMAKE_CXX_COMPILER_LAUNCHER={cache.path}",
+    ]
+
+
+def debug_info_defines(system=None):
+    """
+    Defines the cache needs that do change the output: the debug information format on Windows.
+    """
+    if (system or platform.system()) == 'Windows':
+        # /Zi writes one PDB shared by many objects, which neither tool can cache; /Z7 embeds it per object
+        return ["CMAKE_POLICY_DEFAULT_CMP0141=NEW", "CMAKE_MSVC_DEBUG_INFORMATION_FORMAT=Embedded"]
+    return []
+
+
+def cache_defines(cache, system=None):
+    return launcher_defines(cache) + debug_info_defines(system)
+
+
+def _run(cache, args, env):
+    return tracing.run([cache.path] + args, env=dict(os.environ, **env),
+                       capture_output=True, text=True, category="build")
+
+
+def zero_stats(cache, env):
+    _run(cache, ["-z"] if cache.tool == "ccache" else ["--zero-stats"], env)
+
+
+def _sum_counts(entry):
+    return sum(entry.get("counts", {}).values()) if isinstance(entry, dict) else 0
+
+
+def cache_stats(cache, env):
+    """
+    (hits, misses) since the last zero_stats, or None if the tool could not report them.
+    Stops the variant's sccache server.
+    """
+    if cache.tool == "ccache":
+        result = _run(cache, ["--print-stats"], env)
+        if result.returncode != 0:
+            return None
+        stats = dict(line.split("\t", 1) for line in result.stdout.splitlines() if "\t" in line)
+        hits = int(stats.get("direct_cache_hit", 0)) + int(stats.get("preprocessed_cache_hit", 0))
+        return hits, int(stats.get("cache_miss", 0))
+    result = _run(cache, ["--show-stats", "--stats-format", "json"], env)
+    _run(cache, ["--stop-server"], env)
+    try:
+        stats = json.loads(result.stdout)["stats"]
+    except (ValueError, KeyError):
+        return None
+    return _sum_counts(stats.get("cache_hits")), _sum_counts(stats.get("cache_misses"))
+
+
+def print_stats(cache, variant_envs):
+    """
+    Print the hit rate of each variant given as {name: env}.
+    """
+    print(f"Compiler cache ({cache.tool}) statistics:")
+    for name, env in variant_envs.items():
+        stats = cache_stats(cache, env)
+        if stats is None:
+            print(f"  {name:24} unavailable")
+            continue
+        hits, misses = stats
+        total = hits + misses
+        rate = f"{100 * hits / total:5.1f}%" if total else "    -"
+        print(f"  {name:24} {rate} hit rate  ({hits} hits, {misses} misses)")
+
+
+def add_compiler_cache_arguments(parser):
+    parser.add_argument(
+        "--compiler-cache",
+        choices=["auto"] + TOOLS + ["none"],
+        default="auto",
+        help="compiler launcher for CMake (default: %(default)s, the first of ccache, sccache that is installed)"
+    )
+    parser.add_argument(
+        "--compiler-cache-size",
+        default=DEFAULT_MAX_SIZE,
+        help="maximum cache size per architecture, e.g. 5G (default: %(default)s)"
+    )
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="compiler_cache",
+        description="Print the compiler cache statistics of each build variant."
+    )
+    parser.add_argument("variants", nargs="+", metavar="variant", help="variant names, e.g. x86_64")
+    add_compiler_cache_arguments(parser)
+    args = parser.parse_args()
+
+    cache = find_compiler_cache(args.compiler_cache, args.compiler_cache_size)
+    if cache is None:
+        print("No compiler cache installed.")
+        sys.exit(1)
+    print_stats(cache, {name: cache_env(cache, name) for name in args.variants})
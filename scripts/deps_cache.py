@@ -0,0 +1,222 @@
+import os, platform, shutil, time, argparse
+
+import downloader
+import tracing
+from file_lock import file_lock
+
+DEFAULT_CACHE_MAX_SIZE = 4 * 1024 ** 3  # 4 GiB
+
+
+def cache_root():
+    """
+    Machine-wide cache directory shared by every checkout of onnxruntime-secure.
+    Override with ONNXRUNTIME_SECURE_CACHE_DIR.
+    """
+    override = os.environ.get("ONNXRUNTIME_SECURE_CACHE_DIR")
+    if override:
+        return os.path.abspath(override)
+    system = platform.system()
+    if system == 'Windows':
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+    elif system == 'Darwin':
+        base = os.path.join(os.path.expanduser("~"), "Library", "Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "onnxruntime-secure")
+
+
+def download_cache_dir():
+    return os.path.join(cache_root(), "downloads")
+
+
+def parse_size(text):
+    """
+    Parse a size such as "4G", "512M" or "1048576" into bytes.
+    """
+    text = text.strip().upper().rstrip("B").rstrip("I")
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def cache_max_size():
+    value = os.environ.get("ONNXRUNTIME_SECURE_CACHE_MAX_SIZE")
+    return parse_size(value) if value else DEFAULT_CACHE_MAX_SIZE
+
+
+def cached_file_path(sha256):
+    sha256 = sha256.lower()
+    return os.path.join(download_cache_dir(), "sha256", sha256[:2], sha256)
+
+
+def entry_lock_path(sha256):
+    """
+    Lock held while an entry is looked up, stored or linked, and while it is evicted.
+    """
+    return os.path.join(download_cache_dir(), "locks", f"{sha256.lower()}.lock")
+
+
+def remove_file(path):
+    """
+    Remove a file even if it was made read-only (Windows refuses otherwise).
+    """
+    try:
+        os.remove(path)
+    except PermissionError:
+        os.chmod(path, 0o644)
+        os.remove(path)
+
+
+def touch_cache_entry(path):
+    """
+    Mark a cache entry as recently used. Only atime is bumped: the entry may be
+    hardlinked into a checkout, and its mtime must stay stable there.
+    """
+    st = os.stat(path)
+    os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+
+
+def lookup(sha256):
+    """
+    Return the cache path holding the content with the given SHA-256, or None.
+    """
+    path = cached_file_path(sha256)
+    if os.path.isfile(path):
+        touch_cache_entry(path)
+        return path
+    return None
+
+
+def _reflink(src, dst):
+    """
+    Copy-on-write clone of src to dst. Returns False if the filesystem does not support it.
+    """
+    system = platform.system()
+    if system == 'Linux':
+        import fcntl
+        FICLONE = 0x40049409
+        try:
+            with open(src, "rb") as s, open(dst, "wb") as d:
+                fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            return True
+        except OSError:
+            if os.path.exists(dst):
+                os.remove(dst)
+            return False
+    if system == 'Darwin':
+        import subprocess
+        return subprocess.run(["cp", "-c", src, dst], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+    return False
+
+
+def link_into_place(cached, dest):
+    """
+    Materialize a cache entry at dest without copying data when possible:
+    hardlink first, then reflink, then a plain copy as a last resort.
+    """
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f"{dest}.tmp{os.getpid()}"
+    if os.path.lexists(tmp):
+        remove_file(tmp)
+    try:
+        os.link(cached, tmp)
+        method = "hardlinked"
+    except OSError:
+        if _reflink(cached, tmp):
+            method = "reflinked"
+        else:
+            shutil.copyfile(cached, tmp)
+            method = "copied"
+    if os.path.lexists(dest):
+        remove_file(dest)
+    os.replace(tmp, dest)
+    return method
+
+
+def evict(max_size=None, keep=()):
+    """
+    Drop least recently used entries until the download cache fits in max_size bytes.
+    Each entry is removed under its own lock, so a concurrent fetch never links an
+    entry that disappears underneath it; one used since it was listed is kept.
+    """
+    if max_size is None:
+        max_size = cache_max_size()
+    entries = []
+    base = os.path.join(download_cache_dir(), "sha256")
+    for dirpath, _, filenames in os.walk(base):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_atime_ns, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    keep = {os.path.abspath(p) for p in keep}
+    for atime, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        with file_lock(entry_lock_path(os.path.basename(path))):
+            try:
+                if os.stat(path).st_atime_ns != atime:
+                    continue
+            except FileNotFoundError:
+                total -= size
+                continue
+            print(f"Evicting {path} from download cache")
+            remove_file(path)
+        total -= size
+
+
+def store(src, sha256):
+    """
+    Move a verified file into the cache and return its cache path.
+    """
+    path = cached_file_path(sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(src, path)
+    os.chmod(path, 0o444)
+    touch_cache_entry(path)
+    return path
+
+
+def fetch(url, sha256, dest, jobs=None):
+    """
+    Ensure dest holds the content of url identified by sha256, going through the
+    machine-wide download cache. Interrupted downloads are resumed from the cache.
+    """
+    with tracing.span("fetch", "download", url=url, sha256=sha256) as span_args, \
+            file_lock(entry_lock_path(sha256)):
+        cached = lookup(sha256)
+        span_args["cache"] = "hit" if cached else "miss"
+        if cached:
+            print(f"Download cache hit for {url}")
+        else:
+            print(f"Download cache miss for {url}")
+            partial = os.path.join(download_cache_dir(), "partial", sha256.lower())
+            downloader.download(url, partial, sha256=sha256, jobs=jobs)
+            cached = store(partial, sha256)
+        method = span_args["link"] = link_into_place(cached, dest)
+        print(f"{method.capitalize()} {cached} -> {dest}")
+
+    with file_lock(os.path.join(download_cache_dir(), "locks", "evict.lock")):
+        evict(keep=[cached])
+    return dest
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="deps_cache",
+        description="Inspect or trim the machine-wide onnxruntime-secure download cache."
+    )
+    parser.add_argument("--max-size", type=parse_size, default=None,
+                        help="evict least recently used entries until the cache fits (e.g. 2G)")
+    args = parser.parse_args()
+
+    print(f"Download cache: {download_cache_dir()}")
+    with file_lock(os.path.join(download_cache_dir(), "locks", "evict.lock")):
+        evict(args.max_size)
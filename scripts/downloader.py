@@ -0,0 +1,266 @@
+import os, sys, json, time, hashlib, threading, argparse
+from pathlib import Path
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError, URLError
+
+import tracing
+
+DEFAULT_JOBS = 4
+CHUNK_SIZE = 1024 * 1024
+MIN_SEGMENT_SIZE = 16 * 1024 * 1024
+RETRIES = 3
+TIMEOUT = 60
+USER_AGENT = "onnxruntime-secure-downloader"
+# Client errors that a later attempt can get past: request timeout, rate limiting
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+
+def _open(url, start=None, end=None, method="GET"):
+    headers = {"User-Agent": USER_AGENT}
+    if start is not None:
+        headers["Range"] = f"bytes={start}-{'' if end is None else end - 1}"
+    return urlopen(Request(url, headers=headers, method=method), timeout=TIMEOUT)
+
+
+def probe(url):
+    """
+    Return (size, accepts_ranges) for url. size is None when the server does not say.
+    """
+    try:
+        with _open(url, method="HEAD") as response:
+            length = response.headers.get("Content-Length")
+            ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+            return (int(length) if length else None), ranges
+    except (HTTPError, URLError, ValueError):
+        return None, False
+
+
+def _retryable(error):
+    """
+    False for HTTP client errors such as 404 or 403, which no retry will fix.
+    """
+    return not (isinstance(error, HTTPError) and 400 <= error.code < 500
+                and error.code not in RETRYABLE_CLIENT_ERRORS)
+
+
+def _hash_file_prefix(path, length, h):
+    with open(path, "rb") as f:
+        remaining = length
+        while remaining:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            h.update(chunk)
+            remaining -= len(chunk)
+
+
+def _download_sequential(url, part, size, accepts_ranges):
+    """
+    Stream url into part, hashing while writing. A leftover part file is resumed
+    with a Range request; servers that ignore Range restart from zero.
+    """
+    offset = os.path.getsize(part) if os.path.isfile(part) else 0
+    if size is not None and offset > size:
+        offset = 0
+    if offset and not accepts_ranges and size is not None:
+        offset = 0
+    if offset and offset == size:
+        h = hashlib.sha256()
+        _hash_file_prefix(part, offset, h)
+        return h.hexdigest()
+
+    for attempt in range(RETRIES + 1):
+        try:
+            response = _open(url, start=offset) if offset else _open(url)
+            with response:
+                if offset and response.status != 206:
+                    print(f"Server ignored range request, restarting download of {url}")
+                    offset = 0
+                if offset:
+                    print(f"Resuming download of {url} at byte {offset}")
+                    h = hashlib.sha256()
+                    _hash_file_prefix(part, offset, h)
+                else:
+                    h = hashlib.sha256()
+                with open(part, "r+b" if offset else "wb") as f:
+                    f.seek(offset)
+                    f.truncate()
+                    for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                        f.write(chunk)
+                        h.update(chunk)
+                        offset += len(chunk)
+            if size is not None and offset != size:
+                raise IOError(f"Incomplete download of {url}: got {offset} of {size} bytes")
+            return h.hexdigest()
+        except (IOError, URLError) as e:
+            if attempt == RETRIES or not _retryable(e):
+                raise
+            print(f"Download of {url} interrupted ({e}), retrying...")
+            offset = os.path.getsize(part) if os.path.isfile(part) else 0
+
+
+def _load_segments(state_path, url, size, jobs):
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+        if state.get("url") == url and state.get("size") == size:
+            return [list(seg) for seg in state["segments"]]
+    except (OSError, ValueError, KeyError):
+        pass
+    count = max(1, min(jobs, size // MIN_SEGMENT_SIZE))
+    step = -(-size // count)
+    return [[start, min(start + step, size), 0] for start in range(0, size, step)]
+
+
+def _save_segments(state_path, url, size, segments):
+    tmp = state_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"url": url, "size": size, "segments": segments}, f)
+    os.replace(tmp, state_path)
+
+
+def _download_parallel(url, part, size, jobs):
+    """
+    Fetch url into part with concurrent range requests. Workers write their segment
+    in place while this thread hashes the contiguous prefix that has already landed,
+    so the data is still hashed exactly once and in order. Segment progress is kept
+    in a state file next to part so an interrupted transfer resumes per segment.
+    """
+    state_path = part + ".json"
+    segments = _load_segments(state_path, url, size, jobs)
+    if not os.path.isfile(part) or os.path.getsize(part) != size:
+        segments = [[start, end, 0] for start, end, _ in segments]
+        with open(part, "wb") as f:
+            f.truncate(size)
+    resumed = sum(seg[2] for seg in segments)
+    if resumed:
+        print(f"Resuming download of {url} with {resumed} of {size} bytes present")
+
+    cond = threading.Condition()
+    stop = threading.Event()
+    errors = []
+
+    def worker(seg):
+        start, end, _ = seg
+        with open(part, "r+b") as f:
+            for attempt in range(RETRIES + 1):
+                if seg[2] >= end - start:
+                    return
+                try:
+                    with _open(url, start=start + seg[2], end=end) as response:
+                        if response.status != 206:
+                            raise IOError(f"Server ignored range request for {url}")
+                        f.seek(start + seg[2])
+                        for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                            if stop.is_set():
+                                return
+                            f.write(chunk)
+                            f.flush()
+                            with cond:
+                                seg[2] += len(chunk)
+                                cond.notify_all()
+                    if seg[2] != end - start:
+                        raise IOError(f"Incomplete segment {start}-{end} of {url}")
+                    return
+                except (IOError, URLError) as e:
+                    if attempt == RETRIES or not _retryable(e):
+                        with cond:
+                            errors.append(e)
+                            cond.notify_all()
+                        return
+                    print(f"Segment {start}-{end} of {url} interrupted ({e}), retrying...")
+
+    threads = [threading.Thread(target=worker, args=(seg,), daemon=True) for seg in segments]
+    for t in threads:
+        t.start()
+
+    h = hashlib.sha256()
+    hashed = 0
+    saved_at = time.monotonic()
+    try:
+        with open(part, "rb") as f:
+            while hashed < size:
+                with cond:
+                    while True:
+                        available = 0
+                        for start, end, done in segments:
+                            available = start + done
+                            if done < end - start:
+                                break
+                        if available > hashed or errors:
+                            break
+                        cond.wait(1.0)
+                    if errors:
+                        raise errors[0]
+                    if time.monotonic() - saved_at > 1.0:
+                        _save_segments(state_path, url, size, segments)
+                        saved_at = time.monotonic()
+                f.seek(hashed)
+                while hashed < available:
+                    chunk = f.read(min(CHUNK_SIZE, available - hashed))
+                    h.update(chunk)
+                    hashed += len(chunk)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+        if hashed < size:
+            _save_segments(state_path, url, size, segments)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return h.hexdigest()
+
+
+def download(url, dest, sha256=None, jobs=None):
+    """
+    Download url to dest and return the hex SHA-256 of its content.
+
+    The hash is computed while the data is written, so the file is never read back.
+    Data goes to dest + ".part" first; a later call resumes it with HTTP Range requests.
+    Files larger than MIN_SEGMENT_SIZE are split into up to jobs concurrent range
+    requests when the server advertises range support. If sha256 is given and does
+    not match, the partial file is removed and ValueError is raised.
+    """
+    jobs = DEFAULT_JOBS if jobs is None else jobs
+    dest = str(dest)
+    part = dest + ".part"
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+
+    with tracing.span("download", "download", url=url, dest=dest) as span_args:
+        size, accepts_ranges = probe(url)
+        resumed = os.path.getsize(part) if os.path.exists(part) else 0
+        if jobs > 1 and accepts_ranges and size and size >= 2 * MIN_SEGMENT_SIZE:
+            span_args["mode"] = f"parallel x{jobs}"
+            digest = _download_parallel(url, part, size, jobs)
+        else:
+            span_args["mode"] = "sequential"
+            digest = _download_sequential(url, part, size, accepts_ranges)
+        span_args["bytes"] = os.path.getsize(part)
+        if span_args["mode"] == "sequential":
+            span_args["resumed_bytes"] = resumed
+
+        if sha256 and digest != sha256.lower():
+            os.remove(part)
+            raise ValueError(f"Checksum mismatch for {url}: expected {sha256}, got {digest}")
+        os.replace(part, dest)
+    return digest
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="downloader",
+        description="Download a file with resume, parallel range requests and on-the-fly SHA-256."
+    )
+    parser.add_argument("url", help="URL to download")
+    parser.add_argument("dest", type=Path, help="destination file")
+    parser.add_argument("--sha256", default=None, help="expected SHA-256 of the file")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="maximum concurrent range requests")
+    args = parser.parse_args()
+
+    try:
+        digest = download(args.url, args.dest, sha256=args.sha256, jobs=args.jobs)
+    except (ValueError, IOError, URLError) as e:
+        print(f"Download failed: {e}")
+        sys.exit(1)
+    print(f"{digest}  {args.dest}")
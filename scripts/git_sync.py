@@ -0,0 +1,658 @@
+import os, re, json, time, shutil, hashlib, argparse, threading, subprocess
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import make_dataclass, replace
+from urllib.parse import urlsplit
+
+import deps_cache
+import tracing
+from file_lock import file_lock
+
+# Mirrors updated by this process; each mirror is fetched at most once per run.
+_updated_mirrors = set()
+
+SyncOptions = make_dataclass('SyncOptions', [
+    ('use_mirror', bool, None),
+    ('dissociate', bool, False),
+    ('fetch_mode', str, "full"),
+    ('commit', str, None),
+    ('jobs', int, None),
+])
+## use_mirror: None uses the mirror only if the cache is persistent (see mirror_enabled)
+
+
+def run(cmd, cwd=None):
+    print(f"[RUN] {' '.join(cmd)}")
+    tracing.run(cmd, cwd=cwd, check=True, category="git")
+
+def git_output(args, cwd=None):
+    result = tracing.run(["git"] + args, cwd=cwd, check=True,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, category="git")
+    return result.stdout.rstrip()
+
+def is_git_repo(path):
+    return os.path.isdir(os.path.join(path, ".git"))
+
+def get_remote_url(path):
+    try:
+        return git_output(["config", "--get", "remote.origin.url"], cwd=path)
+    except subprocess.CalledProcessError:
+        return None
+
+
+def mirrors_root():
+    return os.path.join(deps_cache.cache_root(), "git-mirrors")
+
+def mirror_dir(repo_url):
+    """
+    Location of the machine-wide bare mirror for repo_url.
+    """
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", repo_url.rstrip("/").split("/")[-1])
+    if not name.endswith(".git"):
+        name += ".git"
+    digest = hashlib.sha1(repo_url.encode()).hexdigest()[:12]
+    return os.path.join(mirrors_root(), f"{digest}-{name}")
+
+def mirror_enabled(options):
+    """
+    Whether clones borrow objects from the machine-wide mirrors. A mirror holds
+    the full history of every branch, so shallow and blobless syncs never use one.
+    Otherwise use_mirror=None enables mirrors only where they pay off across runs:
+    ONNXRUNTIME_SECURE_CACHE_DIR points at a persistent cache, or an earlier run
+    already created mirrors. Ephemeral builders clone straight from upstream.
+    """
+    if options.fetch_mode != "full" or options.use_mirror is False:
+        return False
+    if options.use_mirror:
+        return True
+    return bool(os.environ.get("ONNXRUNTIME_SECURE_CACHE_DIR")) or os.path.isdir(mirrors_root())
+
+def ensure_mirror(repo_url):
+    """
+    Create or update the bare mirror of repo_url and return its path.
+    Workspace clones borrow objects from it, so it must never prune them.
+    """
+    path = mirror_dir(repo_url)
+    with deps_cache.file_lock(path + ".lock"):
+        if not os.path.isdir(path):
+            print(f"[+] Creating mirror of {repo_url} at {path}")
+            tmp = path + ".tmp"
+            if os.path.isdir(tmp):
+                run(["git", "-C", tmp, "remote", "update", "--prune"])
+            else:
+                run(["git", "clone", "--mirror", repo_url, tmp])
+            run(["git", "-C", tmp, "config", "gc.pruneExpire", "never"])
+            run(["git", "-C", tmp, "config", "gc.auto", "0"])
+            os.replace(tmp, path)
+        elif path not in _updated_mirrors:
+            print(f"[+] Updating mirror of {repo_url}")
+            run(["git", "-C", path, "remote", "update", "--prune"])
+        _updated_mirrors.add(path)
+    return path
+
+
+def list_submodules(repo_dir):
+    """
+    (name, path) of the direct submodules declared in repo_dir/.gitmodules.
+    """
+    if not os.path.isfile(os.path.join(repo_dir, ".gitmodules")):
+        return []
+    try:
+        output = git_output(["config", "--file", ".gitmodules", "--get-regexp", r"^submodule\..*\.path$"], cwd=repo_dir)
+    except subprocess.CalledProcessError:
+        return []
+    submodules = []
+    for line in output.splitlines():
+        key, path = line.split(" ", 1)
+        submodules.append((key[len("submodule."):-len(".path")], path))
+    return submodules
+
+def submodule_update_args(options):
+    """
+    Extra `git submodule update` arguments implied by options.fetch_mode.
+    """
+    if options.fetch_mode == "shallow":
+        return ["--depth", "1"]
+    if options.fetch_mode == "blobless":
+        return ["--filter=blob:none"]
+    return []
+
+def run_captured(cmd, cwd=None):
+    """
+    Like run(), but buffers the output so concurrent commands print whole blocks.
+    """
+    result = tracing.run(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, category="git")
+    print(f"[RUN] {' '.join(cmd)}" + (f"\n{result.stdout.rstrip()}" if result.stdout.strip() else ""))
+    if result.returncode:
+        raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout)
+
+def _clear_orphaned_submodule(submodule_dir):
+    """
+    Remove a submodule checkout whose .git file points at a git directory that no
+    longer exists (e.g. after the superproject's .git was lost); git refuses to
+    clone over it, and it has no objects worth keeping.
+    """
+    gitfile = os.path.join(submodule_dir, ".git")
+    if not os.path.isfile(gitfile):
+        return
+    with open(gitfile) as f:
+        content = f.read().strip()
+    if not content.startswith("gitdir:"):
+        return
+    gitdir = os.path.join(submodule_dir, content[len("gitdir:"):].strip())
+    if not os.path.isdir(gitdir):
+        print(f"[-] Removing orphaned submodule checkout {submodule_dir}")
+        shutil.rmtree(submodule_dir)
+
+def _update_submodule(pool, tasks, lock, timings, repo_dir, root_dir, name, path, options, force):
+    _clear_orphaned_submodule(os.path.join(repo_dir, path))
+    cmd = ["git", "submodule", "update", "--init"] + submodule_update_args(options)
+    if force:
+        cmd.append("--force")
+    if options.use_mirror:
+        url = git_output(["config", "--get", f"submodule.{name}.url"], cwd=repo_dir)
+        cmd += ["--reference", ensure_mirror(url)]
+        if options.dissociate:
+            cmd.append("--dissociate")
+    start = time.perf_counter()
+    with tracing.span(f"submodule {path}", "git", repo=repo_dir):
+        run_captured(cmd + ["--", path], cwd=repo_dir)
+    submodule_dir = os.path.join(repo_dir, path)
+    with lock:
+        timings.append((os.path.relpath(submodule_dir, root_dir), time.perf_counter() - start))
+    _schedule_submodules(pool, tasks, lock, timings, submodule_dir, root_dir, options, force)
+
+def _schedule_submodules(pool, tasks, lock, timings, repo_dir, root_dir, options, force):
+    submodules = list_submodules(repo_dir)
+    if not submodules:
+        return
+    run_captured(["git", "submodule", "init"], cwd=repo_dir)
+    with lock:
+        for name, path in submodules:
+            tasks.append(pool.submit(_update_submodule, pool, tasks, lock, timings,
+                                     repo_dir, root_dir, name, path, options, force))
+
+def update_submodules(repo_dir, options=None, force=False):
+    """
+    Recursively initialize and update the submodules of repo_dir, running up to
+    options.jobs (default: CPU count) submodule updates at once. A submodule's own
+    submodules are queued as soon as it is checked out. With use_mirror, every
+    submodule is cloned with --reference to its own machine-wide mirror.
+    Submodules are fetched at the commit recorded by their superproject, so the
+    shallow and blobless fetch modes carry over to them.
+    Prints how long each submodule took to fetch and check out.
+    """
+    options = options or SyncOptions()
+    jobs = options.jobs or os.cpu_count() or 1
+    tasks, lock, timings = [], threading.Lock(), []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(jobs) as pool:
+        _schedule_submodules(pool, tasks, lock, timings, repo_dir, repo_dir, options, force)
+        done = 0
+        while True:
+            with lock:
+                pending = tasks[done:]
+                done = len(tasks)
+            if not pending:
+                break
+            wait(pending)
+    errors = [task.exception() for task in tasks if task.exception()]
+    if timings:
+        print(f"[+] Updated {len(timings)} submodules in {time.perf_counter() - start:.2f}s with {jobs} jobs:")
+        for path, seconds in sorted(timings, key=lambda t: t[1], reverse=True):
+            print(f"    {seconds:8.2f}s  {path}")
+    if errors:
+        raise errors[0]
+
+
+def has_commit(repo_dir, commit):
+    return tracing.run(["git", "cat-file", "-e", f"{commit}^{{commit}}"], cwd=repo_dir,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, category="git").returncode == 0
+
+def clone_repo(repo_url, clone_dir, options=None):
+    options = options or SyncOptions()
+    mirror = ensure_mirror(repo_url) if options.use_mirror else None
+    if options.fetch_mode == "shallow" and options.commit:
+        # Only the pinned commit is transferred; no branch history at all.
+        run(["git", "init", clone_dir])
+        run(["git", "remote", "add", "origin", repo_url], cwd=clone_dir)
+        run(["git", "fetch", "--depth", "1", mirror or "origin", options.commit], cwd=clone_dir)
+        run(["git", "checkout", "--detach", "FETCH_HEAD"], cwd=clone_dir)
+    else:
+        cmd = ["git", "clone"]
+        if mirror:
+            cmd += ["--reference", mirror]
+            if options.dissociate:
+                cmd.append("--dissociate")
+        if options.fetch_mode == "shallow":
+            cmd += ["--depth", "1"]
+        elif options.fetch_mode == "blobless":
+            cmd.append("--filter=blob:none")
+        if options.commit:
+            cmd.append("--no-checkout")
+        run(cmd + [repo_url, clone_dir])
+        if options.commit:
+            run(["git", "checkout", "--detach", options.commit], cwd=clone_dir)
+    update_submodules(clone_dir, options)
+    write_sync_stamp(clone_dir, options.commit or "origin/main")
+
+STAMP_FILE = "onnxruntime-secure-sync.json"
+
+def _stamp_path(clone_dir):
+    return os.path.join(git_output(["rev-parse", "--absolute-git-dir"], cwd=clone_dir), STAMP_FILE)
+
+def submodule_shas(clone_dir):
+    """
+    {path: sha} of every submodule, recursively, or None if any of them is missing,
+    conflicted or not at the commit recorded by its superproject.
+    """
+    shas = {}
+    output = git_output(["submodule", "status", "--recursive"], cwd=clone_dir)
+    for line in output.splitlines():
+        if line[0] != " ":
+            return None
+        sha, path = line[1:].split(" ")[:2]
+        shas[path] = sha
+    return shas
+
+def write_sync_stamp(clone_dir, target):
+    """
+    Record the commit the superproject and each submodule were synced to.
+    """
+    stamp = {
+        "target": target,
+        "head": git_output(["rev-parse", "HEAD"], cwd=clone_dir),
+        "submodules": submodule_shas(clone_dir),
+    }
+    with open(_stamp_path(clone_dir), "w") as f:
+        json.dump(stamp, f, indent=1)
+
+def resolve_target(clone_dir, options):
+    """
+    SHA the checkout should end up at, or None if it cannot be resolved cheaply.
+    A pinned commit resolves locally; origin/main costs one ls-remote round trip.
+    """
+    try:
+        if options.commit:
+            return git_output(["rev-parse", "--verify", "--quiet", f"{options.commit}^{{commit}}"], cwd=clone_dir)
+        output = git_output(["ls-remote", get_remote_url(clone_dir), "refs/heads/main"], cwd=clone_dir)
+        return output.split()[0] if output else None
+    except subprocess.CalledProcessError:
+        return None
+
+def is_synced(clone_dir, target_sha):
+    """
+    True if the last sync stamp, HEAD and every submodule still match target_sha
+    and the working tree is clean.
+    """
+    try:
+        with open(_stamp_path(clone_dir)) as f:
+            stamp = json.load(f)
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return False
+    try:
+        if stamp.get("head") != target_sha or git_output(["rev-parse", "HEAD"], cwd=clone_dir) != target_sha:
+            return False
+        if submodule_shas(clone_dir) != stamp.get("submodules"):
+            return False
+        return git_output(["status", "--porcelain", "--untracked-files=no"], cwd=clone_dir) == ""
+    except subprocess.CalledProcessError:
+        return False
+
+def reset_and_update(clone_dir, options=None):
+    options = options or SyncOptions()
+    target_sha = resolve_target(clone_dir, options)
+    if target_sha and is_synced(clone_dir, target_sha):
+        print(f"[+] Already synced to {target_sha}. Skipping fetch, reset and submodule update.")
+        return
+    # With a mirror, it was just fetched from upstream; update from it locally.
+    source = ensure_mirror(get_remote_url(clone_dir)) if options.use_mirror else "origin"
+    depth = ["--depth", "1"] if options.fetch_mode == "shallow" else []
+    if options.commit:
+        if not has_commit(clone_dir, options.commit):
+            run(["git", "fetch"] + depth + [source, options.commit], cwd=clone_dir)
+        target = options.commit
+    else:
+        if depth:
+            run(["git", "fetch", "--prune"] + depth + [source, "+refs/heads/main:refs/remotes/origin/main"], cwd=clone_dir)
+        elif options.use_mirror:
+            run(["git", "fetch", "--prune", source, "+refs/heads/*:refs/remotes/origin/*"], cwd=clone_dir)
+        else:
+            run(["git", "fetch", "--all"], cwd=clone_dir)
+        target = "origin/main"
+    run(["git", "reset", "--hard", target], cwd=clone_dir)
+    update_submodules(clone_dir, options, force=True)
+    write_sync_stamp(clone_dir, target)
+
+
+def deepen_repo(repo_dir, depth=None):
+    """
+    Fetch more history into a shallow or blobless checkout and its submodules.
+    depth=None removes all limits: shallow repositories are unshallowed and
+    blobless ones refetch every blob and stop being partial clones.
+    """
+    if git_output(["rev-parse", "--is-shallow-repository"], cwd=repo_dir) == "true":
+        run(["git", "fetch", "--unshallow" if depth is None else f"--deepen={depth}", "origin"], cwd=repo_dir)
+    if depth is None and tracing.run(["git", "config", "--get", "remote.origin.partialclonefilter"],
+                                     cwd=repo_dir, stdout=subprocess.DEVNULL, category="git").returncode == 0:
+        run(["git", "config", "--unset", "remote.origin.partialclonefilter"], cwd=repo_dir)
+        run(["git", "fetch", "--refetch", "origin"], cwd=repo_dir)
+    for _, path in list_submodules(repo_dir):
+        submodule_dir = os.path.join(repo_dir, path)
+        if os.path.exists(os.path.join(submodule_dir, ".git")):
+            deepen_repo(submodule_dir, depth)
+
+
+def normalize_url(url):
+    """
+    Canonical form of a remote URL for comparison: scheme, user and a trailing
+    ".git" or "/" are dropped and scp-style SSH is folded into host/path, so
+    git@github.com:org/repo and https://github.com/org/repo.git compare equal.
+    """
+    url = url.strip()
+    scp = re.match(r"^(?:[^@/]+@)?([^:/]{2,}):(?!//)(.*)$", url)
+    if scp:
+        host, path = scp.groups()
+    else:
+        parts = urlsplit(url)
+        if parts.scheme in ("", "file") or not parts.netloc:
+            path = parts.path if parts.scheme == "file" else url
+            return os.path.normcase(os.path.abspath(path)).rstrip("/\\").removesuffix(".git")
+        host, path = parts.hostname or "", parts.path
+    return f"{host.lower()}/{path.strip('/').removesuffix('.git')}"
+
+def set_origin(clone_dir, repo_url):
+    if get_remote_url(clone_dir) is None:
+        run(["git", "remote", "add", "origin", repo_url], cwd=clone_dir)
+    else:
+        run(["git", "remote", "set-url", "origin", repo_url], cwd=clone_dir)
+
+def is_own_toplevel(clone_dir):
+    """
+    True if git run in clone_dir resolves to clone_dir itself. When clone_dir/.git
+    is damaged (e.g. HEAD is missing), git silently falls back to an enclosing
+    repository such as the onnxruntime-secure checkout, which must never be
+    repointed or reset.
+    """
+    try:
+        toplevel = git_output(["rev-parse", "--show-toplevel"], cwd=clone_dir)
+    except subprocess.CalledProcessError:
+        return False
+    try:
+        return os.path.samefile(toplevel, clone_dir)
+    except OSError:
+        return False
+
+def is_usable_repo(clone_dir):
+    """
+    True if clone_dir/.git is a repository of its own whose HEAD commit and tree can be read.
+    """
+    if not is_git_repo(clone_dir) or not is_own_toplevel(clone_dir):
+        return False
+    return tracing.run(["git", "cat-file", "-e", "HEAD^{tree}"], cwd=clone_dir,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, category="git").returncode == 0
+
+def salvage_objects(old_git_dir, git_dir):
+    """
+    Hardlink the objects of a broken repository into a fresh one and carry over its
+    remote-tracking refs, so the next fetch only transfers what is really missing.
+    Submodule repositories under .git/modules are moved over as they are.
+    Returns the number of object files salvaged.
+    """
+    modules = os.path.join(old_git_dir, "modules")
+    if os.path.isdir(modules) and not os.path.exists(os.path.join(git_dir, "modules")):
+        os.replace(modules, os.path.join(git_dir, "modules"))
+    count = 0
+    old_objects = os.path.join(old_git_dir, "objects")
+    for dirpath, _, filenames in os.walk(old_objects):
+        rel = os.path.relpath(dirpath, old_objects)
+        if rel.split(os.sep)[0] == "info":
+            continue
+        for name in filenames:
+            if name.startswith("tmp_") or name.endswith(".lock"):
+                continue
+            target = os.path.join(git_dir, "objects", rel, name)
+            if os.path.exists(target):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(os.path.join(dirpath, name), target)
+            except OSError:
+                shutil.copyfile(os.path.join(dirpath, name), target)
+            count += 1
+    refs = os.path.join(old_git_dir, "refs", "remotes")
+    if os.path.isdir(refs):
+        shutil.copytree(refs, os.path.join(git_dir, "refs", "remotes"), dirs_exist_ok=True)
+    packed_refs = os.path.join(old_git_dir, "packed-refs")
+    if os.path.isfile(packed_refs):
+        with open(packed_refs) as f:
+            lines = [line for line in f if "refs/remotes/" in line or line.startswith("#")]
+        with open(os.path.join(git_dir, "packed-refs"), "w") as f:
+            f.writelines(lines)
+    return count
+
+def repair_repo(repo_url, clone_dir, options=None):
+    """
+    Turn clone_dir into a clone of repo_url in place. A directory without git
+    metadata is initialized where it is; an unreadable .git is set aside and its
+    objects salvaged into a fresh one. With a mirror, objects are borrowed from it.
+    """
+    options = options or SyncOptions()
+    git_dir = os.path.join(clone_dir, ".git")
+    broken_git_dir = git_dir + ".broken"
+    if os.path.isdir(git_dir):
+        if os.path.isdir(broken_git_dir):
+            shutil.rmtree(broken_git_dir)
+        os.replace(git_dir, broken_git_dir)
+    elif os.path.exists(git_dir):
+        os.remove(git_dir)
+    run(["git", "init", clone_dir])
+    if not is_own_toplevel(clone_dir):
+        raise subprocess.CalledProcessError(1, ["git", "init", clone_dir], "repository not created in place")
+    if os.path.isdir(broken_git_dir):
+        print(f"[+] Salvaged {salvage_objects(broken_git_dir, git_dir)} object files from the broken repository.")
+    alternates = os.path.join(git_dir, "objects", "info", "alternates")
+    if options.use_mirror:
+        with open(alternates, "a") as f:
+            f.write(os.path.join(ensure_mirror(repo_url), "objects") + "\n")
+    set_origin(clone_dir, repo_url)
+    reset_and_update(clone_dir, options)
+    if options.use_mirror and options.dissociate:
+        # Same as clone --dissociate: copy borrowed objects in, then drop the mirror.
+        run(["git", "repack", "-a", "-d"], cwd=clone_dir)
+        os.remove(alternates)
+    if os.path.isdir(broken_git_dir):
+        shutil.rmtree(broken_git_dir)
+
+def sync_repo(repo_url, clone_dir, options=None):
+    """
+    Clone repo_url into clone_dir, or bring an existing clone up to date. A clone
+    of another URL is repointed and fetched in place, and a broken or non-git
+    directory is repaired in place; it is recloned only if that repair fails.
+    """
+    options = options or SyncOptions()
+    options = replace(options, use_mirror=mirror_enabled(options))
+    if os.path.isdir(clone_dir):
+        if is_usable_repo(clone_dir):
+            remote_url = get_remote_url(clone_dir)
+            if remote_url != repo_url:
+                if remote_url and normalize_url(remote_url) == normalize_url(repo_url):
+                    print(f"[~] Remote URL {remote_url} is equivalent to {repo_url}. Updating it in place.")
+                else:
+                    print(f"[-] Remote URL mismatch ({remote_url}). Repointing origin and fetching in place.")
+                set_origin(clone_dir, repo_url)
+            else:
+                print(f"[+] Repository {clone_dir} exists and is correct. Updating...")
+            reset_and_update(clone_dir, options)
+        else:
+            print(f"[-] Folder {clone_dir} is not a usable Git repository. Repairing in place.")
+            try:
+                repair_repo(repo_url, clone_dir, options)
+            except subprocess.CalledProcessError as e:
+                print(f"[-] In-place repair failed ({e}). Removing and recloning.")
+                shutil.rmtree(clone_dir)
+                clone_repo(repo_url, clone_dir, options)
+    else:
+        print(f"[+] Folder {clone_dir} does not exist. Cloning repository.")
+        os.makedirs(os.path.dirname(clone_dir), exist_ok=True)
+        clone_repo(repo_url, clone_dir, options)
+
+
+MANIFEST_FILE = "deps.json"
+LOCK_FILE = "deps.lock.json"
+
+def load_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_json(path, data):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+def resolve_ref(repo_url, ref):
+    """
+    Commit SHA that branch or tag ref points to in repo_url.
+    """
+    if re.fullmatch(r"[0-9a-f]{40}", ref):
+        return ref
+    refs = {}
+    for line in git_output(["ls-remote", repo_url, ref, f"refs/tags/{ref}^{{}}"]).splitlines():
+        sha, name = line.split("\t")
+        refs[name] = sha
+    for name in (f"refs/heads/{ref}", f"refs/tags/{ref}^{{}}", f"refs/tags/{ref}", ref):
+        if name in refs:
+            return refs[name]
+    raise ValueError(f"Cannot resolve {ref!r} in {repo_url}")
+
+def lock_dependencies(manifest, lock, update=False, jobs=None):
+    """
+    Return a lock entry, the manifest entry plus its commit, for each manifest entry.
+    Entries whose every manifest field (url, ref, dest, ...) is unchanged since they
+    were locked keep their commit unless update is set; the others are resolved
+    concurrently with ls-remote.
+    """
+    def lock_entry(name):
+        entry = manifest[name]
+        locked = lock.get(name, {})
+        if not update and locked.get("commit") and all(locked.get(key) == value for key, value in entry.items()):
+            return name, locked
+        commit = resolve_ref(entry["url"], entry["ref"])
+        print(f"[+] Locked {name} to {entry['ref']} @ {commit}")
+        return name, dict(entry, commit=commit)
+
+    with ThreadPoolExecutor(jobs or len(manifest) or 1) as pool:
+        return dict(pool.map(lock_entry, sorted(manifest)))
+
+def update_lock_file(root, names=None, update=False):
+    """
+    Resolve missing or outdated entries of <root>/deps.lock.json for the named
+    dependencies (default: all of deps.json), write it back if it changed and
+    return it. Entries no longer in the manifest are dropped. The read-modify-write
+    runs under <root>/deps.lock.json.lock, so concurrent syncs of different
+    dependencies (the pipeline's download stages) do not drop each other's entries.
+    """
+    manifest = load_json(os.path.join(root, MANIFEST_FILE))
+    names = names or sorted(manifest)
+    unknown = [name for name in names if name not in manifest]
+    if unknown:
+        raise ValueError(f"Unknown dependencies {unknown}; declared in {MANIFEST_FILE}: {sorted(manifest)}")
+    lock_path = os.path.join(root, LOCK_FILE)
+    with file_lock(f"{lock_path}.lock"):
+        old_lock = load_json(lock_path)
+        lock = {name: entry for name, entry in old_lock.items() if name in manifest}
+        lock.update(lock_dependencies({name: manifest[name] for name in names}, old_lock, update))
+        if lock != old_lock:
+            save_json(lock_path, lock)
+    return lock
+
+def sync_dependencies(root, names=None, options=None, update_lock=False, jobs=None):
+    """
+    Sync the dependencies declared in <root>/deps.json to the commits pinned in
+    <root>/deps.lock.json, all repositories at once on up to jobs workers.
+    Missing or outdated lock entries are resolved and written back first.
+    options.commit, when given, overrides the locked commit.
+    """
+    options = options or SyncOptions()
+    if options.use_mirror and options.fetch_mode != "full":
+        print(f"[~] Not using mirrors: they hold the full history, which a {options.fetch_mode} sync does not fetch.")
+    names = names or sorted(load_json(os.path.join(root, MANIFEST_FILE)))
+    lock = update_lock_file(root, names, update_lock)
+
+    def sync_one(name):
+        entry = lock[name]
+        start = time.perf_counter()
+        with tracing.span(f"sync {name}", "git", url=entry["url"], commit=options.commit or entry["commit"]):
+            sync_repo(entry["url"], os.path.join(root, entry["dest"]),
+                      replace(options, commit=options.commit or entry["commit"]))
+        return name, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(jobs or len(names) or 1) as pool:
+        results = list(pool.map(sync_one, names))
+    print(f"[+] Synced {len(results)} repositories in {time.perf_counter() - start:.2f}s:")
+    for name, seconds in sorted(results, key=lambda r: r[1], reverse=True):
+        print(f"    {seconds:8.2f}s  {name}")
+
+def dependency_dir(root, name):
+    return os.path.join(root, load_json(os.path.join(root, MANIFEST_FILE))[name]["dest"])
+
+
+def add_sync_arguments(parser):
+    parser.add_argument(
+        "--mirror",
+        dest="use_mirror",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="borrow objects from machine-wide bare mirrors of full fetch-mode clones "
+             "(default: only if ONNXRUNTIME_SECURE_CACHE_DIR is set or mirrors already exist)"
+    )
+    parser.add_argument(
+        "--dissociate",
+        action="store_true",
+        help="copy borrowed objects into the clone so it no longer depends on the mirror"
+    )
+    parser.add_argument(
+        "--fetch-mode",
+        choices=["full", "blobless", "shallow"],
+        default="full",
+        help="full history, partial clone without blobs (--filter=blob:none), or depth 1; applies to submodules too"
+    )
+    parser.add_argument(
+        "--commit",
+        default=None,
+        help=f"check out this commit SHA instead of the one pinned in {LOCK_FILE}"
+    )
+    parser.add_argument(
+        "--update-lock",
+        action="store_true",
+        help=f"re-resolve every ref in {MANIFEST_FILE} and rewrite {LOCK_FILE} before syncing"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of submodules to update concurrently (default: CPU count)"
+    )
+    parser.add_argument(
+        "--deepen",
+        type=int,
+        nargs="?",
+        const=0,
+        default=None,
+        metavar="N",
+        help="fetch N more commits of history into an existing shallow/blobless checkout (no N: full history) and exit"
+    )
+
+def sync_options_from_args(args):
+    return SyncOptions(
+        use_mirror=args.use_mirror,
+        dissociate=args.dissociate,
+        fetch_mode=args.fetch_mode,
+        commit=args.commit,
+        jobs=args.jobs,
+    )
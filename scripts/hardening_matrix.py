@@ -0,0 +1,213 @@
+import os, sys, json, platform, argparse
+from pathlib import Path
+from dataclasses import make_dataclass, field
+
+import ort_build
+import benchmark
+import compiler_cache
+import minimal_build
+import tracing
+from ort_build import BuildVariant
+from build_scheduler import BuildScheduler
+from git_sync import dependency_dir
+
+HardeningOption = make_dataclass('HardeningOption', [
+    ('name', str), ('flags', dict), ('conflicts', dict, field(default_factory=dict)),
+])
+## flags: {compiler id: compile flags}; compilers without an entry do not support the option
+## conflicts: {compiler id: [option names]} the compiler refuses together with this option
+
+HARDENING_OPTIONS = {
+    'Windows': [
+        HardeningOption('spectre', {'msvc': ['/Qspectre']}),
+    ],
+    'Linux': [
+        HardeningOption('slh', {'clang': ['-mspeculative-load-hardening']}),
+        HardeningOption('retpoline', {
+            'clang': ['-mretpoline'],
+            'gcc': ['-mindirect-branch=thunk', '-mfunction-return=thunk'],
+        }),
+        HardeningOption('cet', {
+            'clang': ['-fcf-protection=full'],
+            'gcc': ['-fcf-protection=full'],
+        }, conflicts={'gcc': ['retpoline']}),
+        HardeningOption('stack-protector', {
+            'clang': ['-fstack-protector-strong'],
+            'gcc': ['-fstack-protector-strong'],
+        }),
+        HardeningOption('fortify', {
+            'clang': ['-D_FORTIFY_SOURCE=2'],
+            'gcc': ['-D_FORTIFY_SOURCE=2'],
+        }),
+    ],
+}
+
+# Flags of the unhardened baseline, turning off what distribution compilers enable by default
+# (CET included, which GCC also refuses together with -mindirect-branch)
+BASELINE_FLAGS = {
+    'msvc': [],
+    'clang': ['-fno-stack-protector', '-U_FORTIFY_SOURCE', '-fcf-protection=none'],
+    'gcc': ['-fno-stack-protector', '-U_FORTIFY_SOURCE', '-fcf-protection=none'],
+}
+
+REPORT_FILE = "hardening-report.json"
+
+
+def _flag_defines(flags):
+    value = " ".join(flags)
+    return [f'CMAKE_C_FLAGS={value}', f'CMAKE_CXX_FLAGS={value}']
+
+
+def matrix_variants(base, system, compiler, names=None):
+    """
+    [(label, variant, flags)] of the same build without hardening ("baseline"),
+    with each supported option alone, and with all of them ("all") if there are
+    several. "all" leaves out an option the compiler refuses next to an earlier one.
+    """
+    baseline = BASELINE_FLAGS[compiler]
+    options = [option for option in HARDENING_OPTIONS.get(system, []) if names is None or option.name in names]
+    for option in options:
+        if compiler not in option.flags:
+            print(f"Skipping {option.name}: not supported by {compiler}.")
+    options = [option for option in options if compiler in option.flags]
+
+    def variant(label, flags):
+        return label, BuildVariant(f'{base.name}-hardening-{label}', base.flags, base.defines + _flag_defines(flags)), \
+            flags
+
+    variants = [variant('baseline', baseline)]
+    variants += [variant(option.name, baseline + option.flags[compiler]) for option in options]
+    if len(options) > 1:
+        combined = []
+        for option in options:
+            conflicting = [other.name for other in combined if other.name in option.conflicts.get(compiler, [])]
+            if conflicting:
+                print(f"Leaving {option.name} out of 'all': {compiler} refuses it with {', '.join(conflicting)}.")
+            else:
+                combined.append(option)
+        variants.append(variant('all', baseline + [flag for option in combined for flag in option.flags[compiler]]))
+    return variants
+
+
+def library_size(install_prefix):
+    """
+    Size of the installed onnxruntime shared library, or None.
+    """
+    for directory in ['lib', 'lib64', 'bin']:
+        for name in ['libonnxruntime.so', 'onnxruntime.dll']:
+            path = os.path.realpath(os.path.join(install_prefix, directory, name))
+            if os.path.isfile(path):
+                return os.path.getsize(path)
+    return None
+
+
+def _percent(value):
+    return f"{value:+8.1f}%" if value is not None else "        -"
+
+
+def print_cost_table(report):
+    print("Hardening cost against the unhardened baseline (latency up and throughput down are costs):")
+    print(f"  {'option':16} {'p50':>9} {'p95':>9} {'p99':>9} {'inf/s':>9} {'library':>9}")
+    for label, entry in report["variants"].items():
+        if label == "baseline":
+            continue
+        cost = entry["cost"]
+        print(f"  {label:16} {_percent(cost['p50_ms'])} {_percent(cost['p95_ms'])} {_percent(cost['p99_ms'])} "
+              f"{_percent(cost['throughput'])} {_percent(entry['library_change'])}")
+
+
+def run_matrix(root, models_dir, names=None, slots=None, max_concurrent=None, config='Release', cache=None,
+               force=False, repetitions=benchmark.DEFAULT_REPETITIONS, rounds=benchmark.DEFAULT_ROUNDS,
+               threads=None):
+    """
+    Build the hardening variants of the host architecture from the same source
+    checkout, benchmark them on the models under models_dir in interleaved rounds
+    and print the per-option cost. The report is also written next to the builds.
+    """
+    system = platform.system()
+    if system not in ort_build.GENERATORS:
+        print(f"Unsupported operating system: {system}")
+        return 1
+    src_dir = dependency_dir(root, 'onnxruntime-src')
+    if not os.path.isfile(ort_build.build_script(src_dir)):
+        print(f'ERROR: No onnxruntime source at {src_dir}. Run 2_download_onnxruntime_src.py first.')
+        return 1
+    deps_dir = os.path.dirname(src_dir)
+    if not minimal_build.find_models(models_dir):
+        print(f"ERROR: No .onnx models under {models_dir}")
+        return 1
+
+    compiler = ort_build.compiler_id(system)
+    variants = matrix_variants(ort_build.host_variant(system), system, compiler, names)
+    builds = [
+        ort_build.build_job(src_dir, deps_dir, system, variant, ort_build.GENERATORS[system], config, cache,
+                            force)
+        for label, variant, flags in variants
+    ]
+    results = BuildScheduler(builds, slots, max_concurrent).run()
+    failed = [name for name, returncode in results.items() if returncode]
+    if failed:
+        print(f'ERROR: Build for {", ".join(failed)} Failed.')
+        return 1
+
+    perf_tests = {
+        label: benchmark.perf_test_path(ort_build.build_dir(deps_dir, system, variant), config)
+        for label, variant, flags in variants
+    }
+    medians = benchmark.compare_builds(perf_tests, models_dir, repetitions, rounds, threads)
+    if medians is None:
+        return 1
+    sizes = {label: library_size(ort_build.install_dir(deps_dir, system, variant)) for label, variant, flags in variants}
+    report = {"compiler": compiler, "config": config, "rounds": rounds, "variants": {}}
+    for label, variant, flags in variants:
+        report["variants"][label] = {
+            "flags": flags,
+            "results": medians[label],
+            "cost": benchmark.relative_cost(medians[label], medians["baseline"]),
+            "library_size": sizes[label],
+            "library_change": 100 * (sizes[label] / sizes["baseline"] - 1)
+            if sizes[label] and sizes["baseline"] else None,
+        }
+    print_cost_table(report)
+    report_path = os.path.join(deps_dir, 'onnxruntime-build', system, REPORT_FILE)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Report written to {report_path}")
+    return 0
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="hardening_matrix",
+        description="Build onnxruntime with and without each hardening option and report what each one costs."
+    )
+    parser.add_argument(
+        "root",
+        type=Path,
+        metavar="root",
+        help="root directory of onnxruntime-secure repository"
+    )
+    parser.add_argument("--models", type=Path, required=True, help="directory of .onnx models to benchmark")
+    parser.add_argument("--options", nargs="+", default=None,
+                        choices=sorted({option.name for options in HARDENING_OPTIONS.values() for option in options}),
+                        help="hardening options to measure (default: all the compiler supports)")
+    parser.add_argument("--config", default="Release", help="CMake build configuration (default: %(default)s)")
+    parser.add_argument("--slots", type=int, default=None,
+                        help="compile jobs shared by all builds (default: CPU count, capped at 2 GiB of memory each)")
+    parser.add_argument("--max-concurrent", type=int, default=None,
+                        help="variants compiling at once (default: one per 4 slots)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the recorded fingerprint matches")
+    parser.add_argument("--repetitions", type=int, default=benchmark.DEFAULT_REPETITIONS,
+                        help="inference runs per model and round (default: %(default)s)")
+    parser.add_argument("--rounds", type=int, default=benchmark.DEFAULT_ROUNDS,
+                        help="benchmark rounds per variant; the median is reported (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op threads (default: onnxruntime's)")
+    compiler_cache.add_compiler_cache_arguments(parser)
+    args = parser.parse_args()
+
+    cache = compiler_cache.find_compiler_cache(args.compiler_cache, args.compiler_cache_size)
+    with tracing.span("hardening_matrix", "script"):
+        sys.exit(run_matrix(
+            args.root.resolve(), str(args.models.resolve()), args.options, args.slots, args.max_concurrent,
+            args.config, cache, args.force, args.repetitions, args.rounds, args.threads))
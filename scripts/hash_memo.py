@@ -0,0 +1,149 @@
+import os, sys, json, zlib, hashlib, argparse
+from pathlib import Path
+
+import deps_cache
+import tracing
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def memo_path():
+    """
+    Location of the persistent digest manifest. Override with ONNXRUNTIME_SECURE_HASH_MEMO.
+    """
+    return os.environ.get("ONNXRUNTIME_SECURE_HASH_MEMO") or os.path.join(deps_cache.cache_root(), "hash-memo.json")
+
+
+def _signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def _load():
+    try:
+        with open(memo_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save(memo):
+    path = memo_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    memo = {k: v for k, v in memo.items() if os.path.exists(k)}
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(memo, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _lock():
+    return deps_cache.file_lock(memo_path() + ".lock")
+
+
+def hash_file(path, algorithm):
+    """
+    Hex digest of path. Besides hashlib algorithms, "crc32" matches zip member CRCs.
+    """
+    with tracing.span("hash", "hash", path=str(path), algorithm=algorithm, bytes=os.path.getsize(path)):
+        if algorithm == "crc32":
+            crc = 0
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    crc = zlib.crc32(chunk, crc)
+            return f"{crc:08x}"
+        h = hashlib.new(algorithm)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+
+def lookup_digest(path):
+    """
+    Return the memoized digests of path as {algorithm: hexdigest}, or {} when the
+    file changed (size, mtime_ns or inode differ) since they were recorded.
+    """
+    key = os.path.abspath(path)
+    entry = _load().get(key)
+    if entry and entry.get("stat") == _signature(key):
+        return entry.get("digests", {})
+    return {}
+
+
+def _merge(memo, key, algorithm, digest):
+    signature = _signature(key)
+    entry = memo.get(key)
+    if not entry or entry.get("stat") != signature:
+        entry = {"stat": signature, "digests": {}}
+    entry["digests"][algorithm] = digest
+    memo[key] = entry
+
+
+def record_digest(path, algorithm, digest):
+    """
+    Remember a digest already known for path, e.g. one computed while downloading.
+    """
+    key = os.path.abspath(path)
+    with _lock():
+        memo = _load()
+        _merge(memo, key, algorithm, digest)
+        _save(memo)
+
+
+def file_digest(path, algorithm="sha256"):
+    """
+    Digest of path, hashing the file only when its stat signature changed since
+    the last time it was hashed.
+    """
+    digest = lookup_digest(path).get(algorithm)
+    if digest is None:
+        digest = hash_file(path, algorithm)
+        record_digest(path, algorithm, digest)
+    return digest
+
+
+def file_digests(paths, algorithm="sha256", hasher=None):
+    """
+    Batch form of file_digest: the manifest is read and written once for all paths.
+    hasher(paths) may be given to hash the stale paths concurrently; it returns
+    their digests in order.
+    """
+    keys = [os.path.abspath(p) for p in paths]
+    memo = _load()
+    digests, stale = {}, []
+    for key in keys:
+        entry = memo.get(key)
+        digest = None
+        if entry and entry.get("stat") == _signature(key):
+            digest = entry.get("digests", {}).get(algorithm)
+        if digest is None:
+            stale.append(key)
+        else:
+            digests[key] = digest
+    if stale:
+        computed = hasher(stale) if hasher else [hash_file(key, algorithm) for key in stale]
+        with _lock():
+            memo = _load()
+            for key, digest in zip(stale, computed):
+                _merge(memo, key, algorithm, digest)
+                digests[key] = digest
+            _save(memo)
+    return [digests[key] for key in keys]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="hash_memo",
+        description="Print file digests, reusing memoized values for unchanged files."
+    )
+    parser.add_argument("files", type=Path, nargs="+", metavar="file", help="files to hash")
+    parser.add_argument("--algorithm", default="sha256", help="hashlib algorithm name")
+    args = parser.parse_args()
+
+    for file in args.files:
+        if not file.is_file():
+            print(f"No such file: {file}")
+            sys.exit(1)
+        print(f"{file_digest(file, args.algorithm)}  {file}")
@@ -0,0 +1,101 @@
+import os, sys, glob, platform, argparse
+from pathlib import Path
+
+import ort_build
+import compiler_cache
+import minimal_build
+import tracing
+from ort_build import BuildVariant
+from build_scheduler import BuildScheduler
+from git_sync import dependency_dir
+
+
+def host_variants():
+    """
+    Linux variants built by default: the host architecture.
+    """
+    return [BuildVariant(platform.machine(), [])]
+
+
+def minimal_variants(src_dir, deps_dir, models_dir):
+    """
+    Host variant reduced to the operators and types of the models under models_dir,
+    which are converted to ORT format next to the builds. None if conversion fails.
+    """
+    variants = []
+    for variant in host_variants():
+        name = f'{variant.name}{minimal_build.MINIMAL_SUFFIX}'
+        output_dir = os.path.join(deps_dir, 'onnxruntime-models', 'Linux', name)
+        config = minimal_build.convert_models(src_dir, os.path.abspath(models_dir), output_dir)
+        if config is None:
+            return None
+        variants.append(minimal_build.minimal_variant(variant.name, config))
+    return variants
+
+
+def print_library_sizes(deps_dir, variants):
+    for variant in variants:
+        libraries = glob.glob(os.path.join(ort_build.install_dir(deps_dir, 'Linux', variant), 'lib*', 'libonnxruntime.so*'))
+        sizes = [os.path.getsize(path) for path in libraries if not os.path.islink(path)]
+        if sizes:
+            print(f'  {variant.name:24} libonnxruntime.so {max(sizes) / 1024 / 1024:8.1f} MiB')
+
+
+def build_onnxruntime_linux(root, variants=None, slots=None, max_concurrent=None, config='Release', cache=None,
+                            force=False, profile='full', models_dir=None):
+    src_dir = dependency_dir(root, 'onnxruntime-src')
+    if not os.path.isfile(os.path.join(src_dir, 'build.sh')):
+        print(f'ERROR: No onnxruntime source at {src_dir}. Run 2_download_onnxruntime_src.py first.')
+        return 1
+    deps_dir = os.path.dirname(src_dir)
+
+    if variants is None and profile == 'minimal':
+        variants = minimal_variants(src_dir, deps_dir, models_dir)
+        if variants is None:
+            return 1
+    variants = variants or host_variants()
+    builds = [
+        ort_build.build_job(src_dir, deps_dir, 'Linux', variant, 'Ninja', config, cache, force)
+        for variant in variants
+    ]
+    results = BuildScheduler(builds, slots, max_concurrent).run()
+    if cache and any(build.env for build in builds):
+        compiler_cache.print_stats(cache, {build.name: build.env for build in builds if build.env})
+    failed = [name for name, returncode in results.items() if returncode]
+    if failed:
+        print(f'ERROR: Build for {", ".join(failed)} Failed.')
+        return 1
+    print('Building for Linux...Success.')
+    print_library_sizes(deps_dir, variants)
+    return 0
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        prog="install_onnxruntime_linux",
+        description="Build and install onnxruntime for the Linux host."
+    )
+    parser.add_argument(
+        "root",
+        type=Path,
+        metavar="root",
+        help="root directory of onnxruntime-secure repository"
+    )
+    parser.add_argument("--config", default="Release", help="CMake build configuration (default: %(default)s)")
+    parser.add_argument("--slots", type=int, default=None,
+                        help="compile jobs shared by all builds (default: CPU count, capped at 2 GiB of memory each)")
+    parser.add_argument("--max-concurrent", type=int, default=None,
+                        help="variants compiling at once (default: one per 4 slots)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the recorded fingerprint matches")
+    compiler_cache.add_compiler_cache_arguments(parser)
+    minimal_build.add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.profile == 'minimal' and args.models is None:
+        parser.error("--profile minimal requires --models")
+
+    cache = compiler_cache.find_compiler_cache(args.compiler_cache, args.compiler_cache_size)
+    with tracing.span("install_onnxruntime_linux", "script"):
+        sys.exit(build_onnxruntime_linux(
+            args.root.resolve(), slots=args.slots, max_concurrent=args.max_concurrent,
+            config=args.config, cache=cache, force=args.force, profile=args.profile, models_dir=args.models))
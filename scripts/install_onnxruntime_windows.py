@@ -1,26 +1,15 @@
-import os, subprocess, shutil, shlex, tempfile
+import os, sys, shlex, tempfile, argparse
 from pathlib import Path
-from urllib.request import urlretrieve
 from dataclasses import make_dataclass, fields
 
-deps_dir = os.path.join(os.path.dirname(__file__), '../_deps')
-os.makedirs(deps_dir, exist_ok=True)
-
-# Update onnxruntime src
-def update_onnxruntime_src():  # -> int
-    ort_src_dir = os.path.join(deps_dir, 'onnxruntime-src')
-    if os.path.isdir(ort_src_dir):
-        if os.path.isdir(os.path.join(ort_src_dir, '.git')):
-            if subprocess.run(
-                ['git', 'reset', '--hard', 'origin/main'],
-                cwd=ort_src_dir
-            ).returncode == 0:
-                return
-        shutil.rmtree(ort_src_dir)
-    return subprocess.run(
-        ['git', 'clone', 'https://github.com/microsoft/onnxruntime.git', 'onnxruntime-src'],
-        cwd=deps_dir
-    ).returncode
+import downloader
+import vswhere
+import ort_build
+import compiler_cache
+import tracing
+from ort_build import BuildVariant
+from build_scheduler import BuildScheduler
+from git_sync import dependency_dir
 
 
 def check_vs2022():
@@ -63,58 +52,25 @@ def check_vs2022():
     ]
     
     # Get Installer Executables
-    pf86 = os.environ.get("ProgramFiles(x86)")
-    vs_installer_utilities_tuple_list = \
-        [
-            (
-                util.name,
-                os.path.join(
-                    pf86, 
-                    "Microsoft Visual Studio",
-                    "Installer",
-                    f"{util.name}.exe"
-                ) if util.name else ""
-            )
-            for util in fields(VSInstallerUtilities)
-        ]
-    vs_installer_utilities = VSInstallerUtilities(**dict(vs_installer_utilities_tuple_list))
-
-    # Get VS2022 Installation Info
-    install_info_tuple_list = []
-    if vs_installer_utilities.vswhere:
-        for installPropertyId in fields(VS2022InstallInfo):
-            result = subprocess.run(
-                [
-                    vs_installer_utilities.vswhere,
-                    "-latest",
-                    "-products", "*",
-                    "-version", "[17.0,18.0)", # VS2022(17)
-                    "-property", installPropertyId.name
-                ],
-                capture_output=True, text=True
-            )
-            property = result.stdout.strip() if result.returncode != 0 else ""
-            install_info_tuple_list.append((installPropertyId, property))
-    else:
-        install_info_tuple_list = [(propId, "") for propId in fields(VS2022InstallInfo)]
-    install_info = VS2022InstallInfo(**dict(install_info_tuple_list))
-
-    # Get Component Installation Info
-    if vs_installer_utilities.vswhere:
-        for i in range(len(vs_required_components)):
-            result = subprocess.run(
-                [
-                    vs_installer_utilities.vswhere,
-                    "-latest",
-                    "-products", "*",
-                    "-requires", vs_required_components[i].id,
-                    "-property", "installationVersion"
-                ],
-                capture_output=True, text=True
-            )
-            vs_required_components[i].version = result.stdout.strip() if result.returncode != 0 else ""
+    pf86 = os.environ.get("ProgramFiles(x86)", "")
+    setup = os.path.join(pf86, "Microsoft Visual Studio", "Installer", "setup.exe") if pf86 else ""
+    vs_installer_utilities = VSInstallerUtilities(
+        vswhere=vswhere.vswhere_path(),
+        setup=setup if os.path.isfile(setup) else "",
+    )
+    ## If no VS installer utilities are found, vs_installer_utilities.vswhere = ""
+
+    # Get VS2022 Installation and Component Info from a single vswhere call
+    installation = vswhere.latest_installation(vs_installer_utilities.vswhere) if vs_installer_utilities.vswhere else None
+    install_info = VS2022InstallInfo(**{
+        prop.name: vswhere.installation_property(installation, prop.name) for prop in fields(VS2022InstallInfo)
+    })
+    ## If no VS2022 are found, install_info.installationPath = ""
+    for comp in vs_required_components:
+        comp.version = vswhere.component_version(installation, comp.id)
 
     # Print and Action
+    tmp_path = None
     if not vs_installer_utilities.setup:
         # 1. Ensure Downloads folder exists
         downloads_dir = Path.home() / "Downloads"
@@ -124,10 +80,10 @@ def check_vs2022():
             dir=downloads_dir, suffix=".exe", delete=False
         )
         tmp_path = Path(tmp_file.name)
-        tmp_file.close()  # close so urlretrieve can write to it
+        tmp_file.close()  # close so the downloader can write to it
         # 3. Download the VS Community installer
         url = "https://aka.ms/vs/17/release/vs_community.exe"
-        urlretrieve(url, str(tmp_path))
+        downloader.download(url, str(tmp_path))
         # 4. Execute the installer
         vs_installer_utilities.setup = str(tmp_path)
         vs_installer_utilities.vswhere = ""
@@ -136,7 +92,7 @@ def check_vs2022():
     if not_installed_comps:
         print(f'ERROR: These components are not installed and required to be installed: {[comp.name for comp in not_installed_comps]}')
         not_installed_comps_ids = [comp.id for comp in not_installed_comps]
-        subprocess.run(
+        tracing.run(
             [
                 vs_installer_utilities.setup,
                 "modify",
@@ -145,9 +101,10 @@ def check_vs2022():
                 '--channelId', install_info.channelId,
                 '--productId', install_info.productId,
             ],
+            category="install",
         )
 
-    if not vs_installer_utilities.vswhere:
+    if tmp_path:
         # 5. Remove the temp file when done
         tmp_path.unlink()
 
@@ -274,43 +231,63 @@ def check_vs2022():
     # if not_installed_names:
     #     print(f'INSTALL VS2022 Components {not_installed_names}')
 
-def build_onnxruntime_windows():
+# Windows architectures built by build_onnxruntime_windows
+arch_variants = [
+    BuildVariant('x64', ['--use_dml']),
+    BuildVariant('ARM64', ['--arm64', '--use_dml']),
+    BuildVariant('x86', ['--x86', '--use_dml']),
+    BuildVariant('ARM', ['--arm']),
+]
+spectre_defines = ['CMAKE_C_FLAGS=/Qspectre', 'CMAKE_CXX_FLAGS=/Qspectre']
+
+
+def build_onnxruntime_windows(root, slots=None, max_concurrent=None, cache=None, force=False):
     if check_vs2022():
         return 1
-    if update_onnxruntime_src():
+    # The sources are synced to the commit pinned in deps.lock.json by 2_download_onnxruntime_src.py
+    src_dir = dependency_dir(root, 'onnxruntime-src')
+    if not os.path.isfile(os.path.join(src_dir, 'build.bat')):
+        print(f'ERROR: No onnxruntime source at {src_dir}. Run 2_download_onnxruntime_src.py first.')
         return 1
-    
-    arch_flags = [
-        ('x64', ['--use_dml',]),
-        ('ARM64', ['--arm64', '--use_dml',]),
-        ('x86', ['--x86', '--use_dml',]),
-        ('ARM', ['--arm',]),
+    deps_dir = os.path.dirname(src_dir)
+
+    builds = [
+        ort_build.build_job(
+            src_dir, deps_dir, 'Windows',
+            BuildVariant(variant.name, variant.flags, variant.defines + spectre_defines),
+            ort_build.GENERATORS['Windows'], compiler_cache=cache, force=force)
+        for variant in arch_variants
     ]
-    for arch, flags in arch_flags:
-        print(f'Building for Windows {arch}...')
-        if subprocess.run(
-            [
-                '\.build.bat',
-                '--cmake_generator="Visual Studio 17 2022"',
-                '--config', 'Release', '--parallel',
-                '--target', 'install',
-            ] + flags + [
-                '--build_dir', f'../onnxruntime-build/Windows/{arch}',
-                '--compile_no_warning_as_error',
-                '--skip_tests',
-                '--build_shared_lib',
-            ] + [
-                '--cmake_extra_defines', 
-                'CMAKE_C_FLAGS="/Qspectre"', 
-                'CMAKE_CXX_FLAGS="/Qspectre"', 
-                f'CMAKE_INSTALL_PREFIX="../../../onnxruntime-install/Windows/{arch}"',
-            ],
-            cwd=os.path.join(deps_dir, 'onnxruntime-src')
-        ).returncode:
-            print(f'ERROR: Build for Windows {arch} Failed.')
-            return 1
-        else:
-            print(f'Building for Windows {arch}...Success.')
-
-
-check_vs2022()
\ No newline at end of file
+    results = BuildScheduler(builds, slots, max_concurrent).run()
+    if cache and any(build.env for build in builds):
+        compiler_cache.print_stats(cache, {build.name: build.env for build in builds if build.env})
+    failed = [name for name, returncode in results.items() if returncode]
+    if failed:
+        print(f'ERROR: Build for {", ".join(failed)} Failed.')
+        return 1
+    print('Building for Windows...Success.')
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        prog="install_onnxruntime_windows",
+        description="Build and install onnxruntime for every Windows architecture."
+    )
+    parser.add_argument(
+        "root",
+        type=Path,
+        metavar="root",
+        help="root directory of onnxruntime-secure repository"
+    )
+    parser.add_argument("--slots", type=int, default=None,
+                        help="compile jobs shared by all builds (default: CPU count, capped at 2 GiB of memory each)")
+    parser.add_argument("--max-concurrent", type=int, default=None,
+                        help="architectures compiling at once (default: one per 4 slots)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the recorded fingerprint matches")
+    compiler_cache.add_compiler_cache_arguments(parser)
+    args = parser.parse_args()
+
+    cache = compiler_cache.find_compiler_cache(args.compiler_cache, args.compiler_cache_size)
+    with tracing.span("install_onnxruntime_windows", "script"):
+        sys.exit(build_onnxruntime_windows(args.root.resolve(), args.slots, args.max_concurrent, cache, args.force))
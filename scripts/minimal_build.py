@@ -0,0 +1,129 @@
+import os, sys, json, glob, importlib.util, argparse
+from pathlib import Path
+
+import hash_memo
+import tracing
+from ort_build import BuildVariant
+
+PROFILES = ['full', 'minimal']
+OPS_CONFIG = "required_operators_and_types.config"
+ML_DOMAIN = "ai.onnx.ml"  # ZipMap, TreeEnsemble*, ...; dropped by --disable_ml_ops
+STAMP_FILE = "models.json"  # digests of the models the output directory was converted from
+MINIMAL_SUFFIX = '-minimal'  # of the variant names of minimal builds
+
+# Minimal build settings on top of the reduced operator set
+MINIMAL_FLAGS = [
+    '--minimal_build',
+    '--enable_reduced_operator_type_support',
+]
+
+
+def find_models(models_dir, suffix=".onnx"):
+    """
+    Sorted paths of every model with the given suffix (.onnx or .ort) under models_dir.
+    """
+    return sorted(glob.glob(os.path.join(models_dir, "**", "*" + suffix), recursive=True))
+
+
+def converter_command(src_dir, models_dir, output_dir):
+    """
+    Command converting models_dir to ORT format with type reduction: the installed
+    onnxruntime.tools module, or the source tree's copy of the script if the
+    onnxruntime wheel does not ship it.
+    """
+    args = ['--enable_type_reduction', '--output_dir', output_dir, models_dir]
+    if importlib.util.find_spec('onnxruntime') and importlib.util.find_spec('onnxruntime.tools'):
+        return [sys.executable, '-m', 'onnxruntime.tools.convert_onnx_models_to_ort'] + args
+    script = os.path.join(src_dir, 'tools', 'python', 'convert_onnx_models_to_ort.py')
+    return [sys.executable, script] + args
+
+
+def model_digests(models_dir, models):
+    return {os.path.relpath(model, models_dir): hash_memo.file_digest(model) for model in models}
+
+
+def convert_models(src_dir, models_dir, output_dir):
+    """
+    Convert the models under models_dir to ORT format in output_dir, which also
+    receives the required operators and types config. Skipped if output_dir was
+    converted from the same models. Returns the config path, or None on failure.
+    """
+    models = find_models(models_dir)
+    if not models:
+        print(f"ERROR: No .onnx models under {models_dir}")
+        return None
+    config = os.path.join(output_dir, OPS_CONFIG)
+    stamp = os.path.join(output_dir, STAMP_FILE)
+    digests = model_digests(models_dir, models)
+    try:
+        with open(stamp) as f:
+            if json.load(f) == digests and os.path.isfile(config):
+                print(f"Models in {output_dir} are up to date ({len(models)} models).")
+                return config
+    except (OSError, ValueError):
+        pass
+
+    os.makedirs(output_dir, exist_ok=True)
+    cmd = converter_command(src_dir, models_dir, output_dir)
+    print(f"[RUN] {' '.join(cmd)}")
+    with tracing.span("convert_models", "build", models=len(models)):
+        result = tracing.run(cmd, category="build")
+    if result.returncode != 0 or not os.path.isfile(config):
+        print(f"ERROR: Failed to convert the models under {models_dir} to ORT format.")
+        return None
+    with open(stamp, "w") as f:
+        json.dump(digests, f, indent=1, sort_keys=True)
+    print(f"Converted {len(models)} models to {output_dir}")
+    return config
+
+
+def config_domains(config):
+    """
+    Operator domains listed in a required operators config, one `domain;opset;ops` per line.
+    """
+    with open(config) as f:
+        return {line.split(';', 1)[0].strip() for line in f if line.strip() and not line.startswith('#')}
+
+
+def minimal_variant(name, config):
+    """
+    Variant building only the operators and types listed in config. The ML
+    operators are left out entirely unless the config lists some of them.
+    """
+    flags = MINIMAL_FLAGS + ([] if ML_DOMAIN in config_domains(config) else ['--disable_ml_ops'])
+    return BuildVariant(f'{name}{MINIMAL_SUFFIX}', flags + ['--include_ops_by_config', config])
+
+
+def is_minimal(variant):
+    """
+    True for minimal build variants, which only load ORT format models.
+    """
+    return variant.name.endswith(MINIMAL_SUFFIX)
+
+
+def add_profile_arguments(parser):
+    parser.add_argument(
+        "--profile",
+        choices=PROFILES,
+        default="full",
+        help="full build, or minimal build reduced to the operators of --models (default: %(default)s)"
+    )
+    parser.add_argument("--models", type=Path, default=None,
+                        help="directory of .onnx models the minimal profile is reduced to")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="minimal_build",
+        description="Convert a directory of ONNX models to ORT format and generate the required operators config."
+    )
+    parser.add_argument("src_dir", type=Path, help="onnxruntime source directory")
+    parser.add_argument("models", type=Path, help="directory of .onnx models")
+    parser.add_argument("output_dir", type=Path, help="directory for the .ort models and the config")
+    args = parser.parse_args()
+
+    config = convert_models(str(args.src_dir.resolve()), str(args.models.resolve()), str(args.output_dir.resolve()))
+    if config is None:
+        sys.exit(1)
+    print(config)
@@ -0,0 +1,169 @@
+import os, shutil, platform
+from dataclasses import make_dataclass, field
+
+import build_fingerprint
+import toolchain_probe
+import vswhere
+import compiler_cache as compiler_cache_module
+from build_scheduler import BuildJob
+
+BuildVariant = make_dataclass('BuildVariant', [
+    ('name', str), ('flags', list), ('defines', list, field(default_factory=list)),
+])
+## flags: extra build.py arguments, e.g. ['--arm64', '--use_dml']
+## defines: extra --cmake_extra_defines entries, e.g. ['CMAKE_CXX_FLAGS=/Qspectre']
+
+# Ninja on Windows too, from a vcvarsall.bat environment: MSBuild ignores compiler launchers
+GENERATORS = {'Windows': 'Ninja', 'Linux': 'Ninja'}
+
+
+def compiler_id(system=None):
+    """
+    "msvc" on Windows, otherwise "clang" or "gcc" from the version of $CXX.
+    """
+    if (system or platform.system()) == 'Windows':
+        return 'msvc'
+    probe = toolchain_probe.probe_tools(['cxx'])['cxx']
+    return 'clang' if 'clang' in probe.version.lower() else 'gcc'
+
+
+def host_variant(system=None):
+    """
+    Variant of the host architecture without extra flags.
+    """
+    return BuildVariant('x64' if (system or platform.system()) == 'Windows' else platform.machine(), [])
+
+
+def windows_arch(variant):
+    """
+    Target architecture of a Windows variant from its build.py flags, as a vswhere.VCVARS_TARGETS key.
+    """
+    for flag, arch in [('--arm64', 'ARM64'), ('--x86', 'x86'), ('--arm', 'ARM')]:
+        if flag in variant.flags:
+            return arch
+    return 'x64'
+
+
+def build_script(src_dir):
+    return os.path.join(src_dir, 'build.bat' if platform.system() == 'Windows' else 'build.sh')
+
+
+def build_dir(deps_dir, platform_name, variant):
+    return os.path.abspath(os.path.join(deps_dir, 'onnxruntime-build', platform_name, variant.name))
+
+
+def install_dir(deps_dir, platform_name, variant):
+    return os.path.abspath(os.path.join(deps_dir, 'onnxruntime-install', platform_name, variant.name))
+
+
+def output_dir(variant_build_dir, config, generator):
+    """
+    Directory of the built binaries; multi-config generators add another <config> level.
+    """
+    if generator.startswith('Visual Studio'):
+        return os.path.join(variant_build_dir, config, config)
+    return os.path.join(variant_build_dir, config)
+
+
+def cmake_generator(cache_dir):
+    """
+    Generator recorded in cache_dir/CMakeCache.txt, or None if it is not configured.
+    """
+    try:
+        with open(os.path.join(cache_dir, 'CMakeCache.txt')) as f:
+            return next((line.strip().split('=', 1)[1] for line in f
+                         if line.startswith('CMAKE_GENERATOR:INTERNAL=')), None)
+    except OSError:
+        return None
+
+
+def reset_stale_cache(variant_build_dir, config, generator):
+    """
+    CMake refuses to configure a build tree made by another generator (e.g. the
+    Visual Studio trees from before Windows switched to Ninja); drop its cache.
+    """
+    cache_dir = os.path.join(variant_build_dir, config)
+    previous = cmake_generator(cache_dir)
+    if previous and previous != generator:
+        print(f'Build tree {cache_dir} was generated for {previous}; reconfiguring for {generator}.')
+        os.remove(os.path.join(cache_dir, 'CMakeCache.txt'))
+        shutil.rmtree(os.path.join(cache_dir, 'CMakeFiles'), ignore_errors=True)
+
+
+def build_args(variant, build_dir, install_prefix, generator, config='Release'):
+    """
+    build.py arguments shared by the configure and build steps of a variant.
+    """
+    return [
+        '--cmake_generator', generator,
+        '--config', config,
+        '--build_dir', build_dir,
+        '--compile_no_warning_as_error',
+        '--skip_tests',
+        '--build_shared_lib',
+    ] + variant.flags + [
+        '--cmake_extra_defines',
+        f'CMAKE_INSTALL_PREFIX={install_prefix}',
+    ] + variant.defines
+
+
+def build_job(src_dir, deps_dir, platform_name, variant, generator, config='Release', compiler_cache=None,
+              force=False):
+    """
+    BuildJob configuring a variant with `build.py --update`, then compiling and
+    installing it with `build.py --build --parallel <jobs> --target install`.
+    With a compiler_cache, CMake gets it as compiler launcher and the job's env
+    points it at the variant's own cache directory, whose statistics are zeroed.
+    Ninja builds on Windows run in the vcvarsall.bat environment of the variant's
+    target architecture; without one the job fails without starting.
+    Unless force is set, the job is up to date when the fingerprint recorded next
+    to the install prefix matches the current sources, arguments and toolchain.
+    """
+    variant_build_dir = build_dir(deps_dir, platform_name, variant)
+    install_prefix = install_dir(deps_dir, platform_name, variant)
+    os.makedirs(variant_build_dir, exist_ok=True)
+    name = f'{platform_name} {variant.name}'
+
+    use_cache = compiler_cache and not generator.startswith('Visual Studio')
+    if compiler_cache and not use_cache:
+        print(f'WARNING: The {generator} generator ignores compiler launchers; '
+              f'building {name} without {compiler_cache.tool}.')
+    if use_cache:
+        variant = BuildVariant(variant.name, variant.flags,
+                               variant.defines + compiler_cache_module.debug_info_defines(platform_name))
+
+    # The launcher does not change the output, so it is not part of the fingerprint
+    fingerprint = build_fingerprint.compute_fingerprint(
+        src_dir, build_args(variant, variant_build_dir, install_prefix, generator, config), generator)
+    if not force and build_fingerprint.is_up_to_date(install_prefix, fingerprint):
+        return BuildJob(name=name, configure=None, build=None, cwd=src_dir, up_to_date=True)
+    changed = build_fingerprint.changed_inputs(install_prefix, fingerprint)
+    if changed:
+        print(f'[{name}] Rebuilding; changed inputs: {", ".join(changed)}')
+    build_fingerprint.remove_fingerprint(install_prefix)
+    reset_stale_cache(variant_build_dir, config, generator)
+
+    env = None
+    if platform_name == 'Windows' and generator == 'Ninja':
+        path = vswhere.vswhere_path()
+        env = vswhere.vcvars_env(vswhere.latest_installation(path) if path else None, windows_arch(variant))
+        if env is None:
+            return BuildJob(name=name, configure=None, build=None, cwd=src_dir,
+                            error=f'No Visual Studio 2022 developer environment for {windows_arch(variant)}; '
+                                  f'cannot find the compiler.')
+    if use_cache:
+        cache_env = compiler_cache_module.cache_env(compiler_cache, f'{platform_name}-{variant.name}')
+        env = dict(env or {}, **cache_env)
+        compiler_cache_module.zero_stats(compiler_cache, env)
+        variant = BuildVariant(variant.name, variant.flags,
+                               variant.defines + compiler_cache_module.launcher_defines(compiler_cache))
+    args = [build_script(src_dir)] + build_args(variant, variant_build_dir, install_prefix, generator, config)
+    return BuildJob(
+        name=name,
+        configure=args + ['--update'],
+        build=lambda jobs: args + ['--build', '--parallel', str(jobs), '--target', 'install'],
+        cwd=src_dir,
+        env=env,
+        log=os.path.join(variant_build_dir, 'build.log'),
+        on_success=(lambda: build_fingerprint.write_fingerprint(install_prefix, fingerprint)) if fingerprint else None,
+    )
@@ -0,0 +1,146 @@
+import os, sys, json, shlex, platform, tempfile, argparse
+from dataclasses import make_dataclass
+
+import toolchain_probe
+import tracing
+
+Package = make_dataclass('Package', [
+    ('tool', str), ('name', str), ('cask', bool)
+])
+## cask: Homebrew cask rather than formula (Darwin only)
+
+# tool -> {system: (package name, is cask)}
+PACKAGES = {
+    'cmake': {
+        'Windows': ('Kitware.CMake', False),
+        'Linux': ('cmake', False),
+        'Darwin': ('cmake-app', True),
+    },
+    'ninja': {
+        'Windows': ('Ninja-build.Ninja', False),
+        'Linux': ('ninja-build', False),
+        'Darwin': ('ninja', False),
+    },
+    'java': {
+        'Windows': ('EclipseAdoptium.Temurin.17.JDK', False),
+        'Linux': ('openjdk-17-jdk', False),
+        'Darwin': ('temurin', True),
+    },
+    'build-essential': {
+        'Linux': ('build-essential', False),
+    },
+}
+
+WINGET_SOURCE = {
+    'Argument': 'https://cdn.winget.microsoft.com/cache',
+    'Identifier': 'Microsoft.Winget.Source_8wekyb3d8bbwe',
+    'Name': 'winget',
+    'Type': 'Microsoft.PreIndexed.Package',
+}
+
+
+def plan_installs(probes, system=None):
+    """
+    Packages to install for every probed tool that is not usable, in probe order.
+    Tools without a package for this system (e.g. xcode, msvc) are left out.
+    """
+    system = system or platform.system()
+    plan = []
+    for name, probe in probes.items():
+        if probe.status == 'ok' or system not in PACKAGES.get(name, {}):
+            continue
+        package, cask = PACKAGES[name][system]
+        plan.append(Package(name, package, cask))
+    return plan
+
+
+def winget_import_document(plan):
+    """
+    `winget import` file installing every package of the plan in one invocation.
+    """
+    return {
+        '$schema': 'https://aka.ms/winget-packages.schema.2.0.json',
+        'WinGetVersion': '1.6',
+        'Sources': [{
+            'Packages': [{'PackageIdentifier': package.name} for package in plan],
+            'SourceDetails': WINGET_SOURCE,
+        }],
+    }
+
+
+def install_commands(plan, system=None, import_file='winget-import.json'):
+    """
+    Package manager invocations applying the plan: one apt-get transaction, one
+    brew call per formula/cask kind, or one winget import of import_file.
+    """
+    system = system or platform.system()
+    if not plan:
+        return []
+    if system == 'Linux':
+        return [["sudo", "apt-get", "install", "-y"] + [package.name for package in plan]]
+    if system == 'Darwin':
+        formulae = [package.name for package in plan if not package.cask]
+        casks = [package.name for package in plan if package.cask]
+        return ([["brew", "install"] + formulae] if formulae else []) + \
+            ([["brew", "install", "--cask"] + casks] if casks else [])
+    if system == 'Windows':
+        return [[
+            "winget", "import",
+            "--import-file", import_file,
+            "--accept-package-agreements", "--accept-source-agreements",
+        ]]
+    raise ValueError(f"Unsupported operating system: {system}")
+
+
+def print_plan(plan, system=None):
+    if not plan:
+        print("No packages to install.")
+        return
+    print("Packages to install:")
+    for package in plan:
+        print(f"  {package.tool:16} {package.name}{' (cask)' if package.cask else ''}")
+    for cmd in install_commands(plan, system):
+        print(f"[PLAN] {shlex.join(cmd)}")
+
+
+def apply_plan(plan, system=None):
+    """
+    Install every package of the plan in as few package manager transactions as
+    the platform allows. Exits if one fails.
+    """
+    system = system or platform.system()
+    if not plan:
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        import_file = os.path.join(tmp_dir, 'winget-import.json')
+        if system == 'Windows':
+            with open(import_file, 'w') as f:
+                json.dump(winget_import_document(plan), f, indent=2)
+        for cmd in install_commands(plan, system, import_file):
+            print(f"[RUN] {shlex.join(cmd)}")
+            result = tracing.run(cmd, category="install")
+            if result.returncode != 0:
+                print(f"Failed to install {', '.join(package.name for package in plan)}. Please install them manually.")
+                sys.exit(1)
+    print(f"Installed {', '.join(package.name for package in plan)}.")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="package_install",
+        description="Install every missing build tool package in a single package manager transaction."
+    )
+    parser.add_argument("names", nargs="*", metavar="tool",
+                        help=f"tools to check (default: all of {', '.join(sorted(PACKAGES))})")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without installing anything")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in PACKAGES]
+    if unknown:
+        parser.error(f"unknown tools: {', '.join(unknown)}")
+
+    names = args.names or [name for name in PACKAGES if platform.system() in PACKAGES[name]]
+    plan = plan_installs(toolchain_probe.probe_tools(names))
+    print_plan(plan)
+    if not args.dry_run:
+        apply_plan(plan)
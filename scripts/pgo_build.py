@@ -0,0 +1,263 @@
+import os, sys, glob, json, shutil, platform, argparse
+from pathlib import Path
+
+import ort_build
+import benchmark
+import build_fingerprint
+import compiler_cache
+import minimal_build
+import vswhere
+import tracing
+from ort_build import BuildVariant
+from build_scheduler import BuildScheduler
+from git_sync import dependency_dir
+
+TRAINING_STAMP = "training.json"  # inputs of the training run the profile came from
+MERGED_PROFILE = "merged.profdata"
+REPORT_FILE = "pgo-report.json"
+# /machine flag CMake puts in its default linker flags for each Windows architecture
+MSVC_MACHINES = {'x64': 'x64', 'x86': 'X86', 'ARM64': 'ARM64', 'ARM': 'ARM'}
+
+
+def stage_variants(base, compiler, deps_dir, system):
+    """
+    (instrumented, optimized, profile_dir) variants of base. GCC and Clang
+    instrument at compile time, MSVC at link time with whole program optimization;
+    the optimized build uses the profile and LTO.
+    """
+    instrumented = BuildVariant(f'{base.name}-pgo-instrument', base.flags, base.defines)
+    optimized = BuildVariant(f'{base.name}-pgo', base.flags + ['--enable_lto'], base.defines)
+    profile_dir = os.path.join(deps_dir, 'onnxruntime-build', system, f'{base.name}-pgo-profile')
+    if compiler == 'gcc':
+        # Profile file names embed the object path; strip each stage's own build directory from it
+        generate = [f'-fprofile-generate={profile_dir}', '-fprofile-update=atomic',
+                    f'-fprofile-prefix-path={ort_build.build_dir(deps_dir, system, instrumented)}']
+        use = [f'-fprofile-use={profile_dir}', '-fprofile-partial-training', '-Wno-missing-profile',
+               '-Wno-error=coverage-mismatch',
+               f'-fprofile-prefix-path={ort_build.build_dir(deps_dir, system, optimized)}']
+    elif compiler == 'clang':
+        generate = [f'-fprofile-generate={profile_dir}']
+        use = [f'-fprofile-use={os.path.join(profile_dir, MERGED_PROFILE)}',
+               '-Wno-profile-instr-unprofiled', '-Wno-profile-instr-out-of-date']
+    else:
+        # Setting the linker flags replaces CMake's default, so keep its /machine flag
+        machine = f'/machine:{MSVC_MACHINES[ort_build.windows_arch(base)]}'
+        instrumented.flags = instrumented.flags + ['--enable_lto']
+        for variant, flag in [(instrumented, '/GENPROFILE'), (optimized, '/USEPROFILE')]:
+            variant.defines = variant.defines + [
+                f'CMAKE_EXE_LINKER_FLAGS={machine} {flag}', f'CMAKE_SHARED_LINKER_FLAGS={machine} {flag}']
+        return instrumented, optimized, profile_dir
+    for variant, flags in [(instrumented, generate), (optimized, use)]:
+        value = " ".join(flags)
+        variant.defines = variant.defines + [f'CMAKE_C_FLAGS={value}', f'CMAKE_CXX_FLAGS={value}']
+    return instrumented, optimized, profile_dir
+
+
+def find_llvm_profdata():
+    """
+    llvm-profdata from $LLVM_PROFDATA, PATH or next to the clang $CXX resolves to.
+    """
+    path = os.environ.get('LLVM_PROFDATA') or shutil.which('llvm-profdata')
+    if path:
+        return path
+    cxx = shutil.which(os.environ.get('CXX', 'c++'))
+    candidate = os.path.join(os.path.dirname(os.path.realpath(cxx)), 'llvm-profdata') if cxx else ''
+    return candidate if os.path.isfile(candidate) else None
+
+
+def msvc_runtime_dir():
+    """
+    Directory of pgort140.dll, which /GENPROFILE images load, or None.
+    """
+    path = vswhere.vswhere_path()
+    installation = vswhere.latest_installation(path) if path else None
+    root = vswhere.installation_property(installation, 'installationPath')
+    if not root:
+        return None
+    try:
+        with open(os.path.join(root, 'VC', 'Auxiliary', 'Build', 'Microsoft.VCToolsVersion.default.txt')) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    return os.path.join(root, 'VC', 'Tools', 'MSVC', version, 'bin', 'Hostx64', 'x64')
+
+
+def _training_inputs(deps_dir, system, instrumented, training_dir, repetitions):
+    fingerprint = build_fingerprint.load_fingerprint(ort_build.install_dir(deps_dir, system, instrumented))
+    return {
+        "instrumented": fingerprint and fingerprint["digest"],
+        "models": minimal_build.model_digests(training_dir, minimal_build.find_models(training_dir)),
+        "repetitions": repetitions,
+    }
+
+
+def train(perf_test, training_dir, profile_dir, compiler, repetitions, threads, inputs):
+    """
+    Run the training models through the instrumented perf_test and turn the
+    counters into the profile the optimized build reads. Returns False on failure.
+    """
+    shutil.rmtree(profile_dir, ignore_errors=True)
+    os.makedirs(profile_dir)
+    env = None
+    if compiler == 'msvc':
+        for path in glob.glob(os.path.join(os.path.dirname(perf_test), '*.pgc')):
+            os.remove(path)
+        runtime_dir = msvc_runtime_dir()
+        if runtime_dir:
+            env = dict(os.environ, PATH=runtime_dir + os.pathsep + os.environ.get('PATH', ''))
+
+    with tracing.span("pgo_training", "build", models=len(inputs["models"])):
+        if benchmark.benchmark_models(perf_test, training_dir, repetitions, threads, env) is None:
+            return False
+
+    if compiler == 'clang':
+        profdata = find_llvm_profdata()
+        if profdata is None:
+            print("ERROR: llvm-profdata not found. Set LLVM_PROFDATA to the one matching the compiler.")
+            return False
+        raw = glob.glob(os.path.join(profile_dir, '*.profraw'))
+        cmd = [profdata, 'merge', f'--output={os.path.join(profile_dir, MERGED_PROFILE)}'] + raw
+        print(f"[RUN] {' '.join(cmd[:3])} <{len(raw)} raw profiles>")
+        if not raw or tracing.run(cmd, category="build").returncode != 0:
+            print("ERROR: Failed to merge the raw profiles.")
+            return False
+
+    with open(os.path.join(profile_dir, TRAINING_STAMP), "w") as f:
+        json.dump(inputs, f, indent=1, sort_keys=True)
+    return True
+
+
+def copy_msvc_profiles(instrumented_dir, optimized_dir):
+    """
+    /USEPROFILE reads <image>.pgd and its .pgc counts next to the image being linked.
+    """
+    os.makedirs(optimized_dir, exist_ok=True)
+    for pattern in ['*.pgd', '*.pgc']:
+        for path in glob.glob(os.path.join(instrumented_dir, pattern)):
+            shutil.copy2(path, optimized_dir)
+
+
+def _run_builds(builds, slots, max_concurrent):
+    results = BuildScheduler(builds, slots, max_concurrent).run()
+    failed = [name for name, returncode in results.items() if returncode]
+    if failed:
+        print(f'ERROR: Build for {", ".join(failed)} Failed.')
+    return not failed
+
+
+def run_pgo(root, models_dir, training_dir=None, slots=None, max_concurrent=None, config='Release', cache=None,
+            force=False, repetitions=benchmark.DEFAULT_REPETITIONS, rounds=benchmark.DEFAULT_ROUNDS,
+            threads=None):
+    """
+    Build the host architecture plain and instrumented, train the instrumented
+    build on the models under training_dir, rebuild with the profile and LTO, and
+    report the gain of the optimized build over the plain one on models_dir.
+    Training is skipped while the instrumented build and the training models are unchanged.
+    """
+    system = platform.system()
+    if system not in ort_build.GENERATORS:
+        print(f"Unsupported operating system: {system}")
+        return 1
+    src_dir = dependency_dir(root, 'onnxruntime-src')
+    if not os.path.isfile(ort_build.build_script(src_dir)):
+        print(f'ERROR: No onnxruntime source at {src_dir}. Run 2_download_onnxruntime_src.py first.')
+        return 1
+    deps_dir = os.path.dirname(src_dir)
+    training_dir = training_dir or models_dir
+    for directory in {models_dir, training_dir}:
+        if not minimal_build.find_models(directory):
+            print(f"ERROR: No .onnx models under {directory}")
+            return 1
+
+    generator = ort_build.GENERATORS[system]
+    compiler = ort_build.compiler_id(system)
+    plain = ort_build.host_variant(system)
+    instrumented, optimized, profile_dir = stage_variants(plain, compiler, deps_dir, system)
+
+    print("== Stage 1: plain and instrumented builds")
+    if not _run_builds([
+        ort_build.build_job(src_dir, deps_dir, system, variant, generator, config, cache, force)
+        for variant in [plain, instrumented]
+    ], slots, max_concurrent):
+        return 1
+
+    print("== Stage 2: training")
+    instrumented_perf_test = benchmark.perf_test_path(ort_build.build_dir(deps_dir, system, instrumented), config)
+    if instrumented_perf_test is None:
+        print(f"ERROR: No onnxruntime_perf_test for {instrumented.name}.")
+        return 1
+    inputs = _training_inputs(deps_dir, system, instrumented, training_dir, repetitions)
+    try:
+        with open(os.path.join(profile_dir, TRAINING_STAMP)) as f:
+            trained = inputs["instrumented"] is None or json.load(f) != inputs
+    except (OSError, ValueError):
+        trained = True
+    if not trained:
+        print(f"Profile in {profile_dir} is up to date.")
+    elif not train(instrumented_perf_test, training_dir, profile_dir, compiler, repetitions, threads, inputs):
+        return 1
+    if compiler == 'msvc':
+        copy_msvc_profiles(os.path.dirname(instrumented_perf_test),
+                           ort_build.output_dir(ort_build.build_dir(deps_dir, system, optimized), config, generator))
+
+    print("== Stage 3: optimized build")
+    # A new profile changes the output without changing the build arguments
+    if not _run_builds([
+        ort_build.build_job(src_dir, deps_dir, system, optimized, generator, config, cache, force or trained)
+    ], slots, max_concurrent):
+        return 1
+
+    print("== Gain over the plain build")
+    medians = benchmark.compare_builds({
+        label: benchmark.perf_test_path(ort_build.build_dir(deps_dir, system, variant), config)
+        for label, variant in [('plain', plain), ('pgo', optimized)]
+    }, models_dir, repetitions, rounds, threads)
+    if medians is None:
+        return 1
+    change = benchmark.relative_cost(medians['pgo'], medians['plain'])
+    for metric in benchmark.METRICS:
+        print(f"  {metric:12} {change[metric]:+8.1f}%" if change[metric] is not None else f"  {metric:12}        -")
+    report = {"compiler": compiler, "config": config, "rounds": rounds, "change": change, "results": medians}
+    report_path = os.path.join(deps_dir, 'onnxruntime-build', system, REPORT_FILE)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Report written to {report_path}")
+    return 0
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="pgo_build",
+        description="Build onnxruntime with profile-guided optimization and LTO and report the gain over Release."
+    )
+    parser.add_argument(
+        "root",
+        type=Path,
+        metavar="root",
+        help="root directory of onnxruntime-secure repository"
+    )
+    parser.add_argument("--models", type=Path, required=True, help="directory of .onnx models to measure the gain on")
+    parser.add_argument("--training-models", type=Path, default=None,
+                        help="directory of .onnx models to train the profile on (default: --models)")
+    parser.add_argument("--config", default="Release", help="CMake build configuration (default: %(default)s)")
+    parser.add_argument("--slots", type=int, default=None,
+                        help="compile jobs shared by all builds (default: CPU count, capped at 2 GiB of memory each)")
+    parser.add_argument("--max-concurrent", type=int, default=None,
+                        help="builds compiling at once (default: one per 4 slots)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the recorded fingerprint matches")
+    parser.add_argument("--repetitions", type=int, default=benchmark.DEFAULT_REPETITIONS,
+                        help="inference runs per model for training and each benchmark round (default: %(default)s)")
+    parser.add_argument("--rounds", type=int, default=benchmark.DEFAULT_ROUNDS,
+                        help="benchmark rounds per build; the median is reported (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=None, help="intra-op threads (default: onnxruntime's)")
+    compiler_cache.add_compiler_cache_arguments(parser)
+    args = parser.parse_args()
+
+    cache = compiler_cache.find_compiler_cache(args.compiler_cache, args.compiler_cache_size)
+    with tracing.span("pgo_build", "script"):
+        sys.exit(run_pgo(
+            args.root.resolve(), str(args.models.resolve()),
+            str(args.training_models.resolve()) if args.training_models else None,
+            args.slots, args.max_concurrent, args.config, cache, args.force, args.repetitions, args.rounds,
+            args.threads))
@@ -0,0 +1,215 @@
+import os, sys, json, time, hashlib, platform, threading, subprocess, argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import make_dataclass, field
+
+import hash_memo
+import tracing
+from git_sync import dependency_dir, MANIFEST_FILE, LOCK_FILE
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = "pipeline-state.json"  # input hash of every completed stage, under _deps
+
+Stage = make_dataclass('Stage', [
+    ('name', str), ('script', str), ('args', list), ('deps', list),
+    ('inputs', list, field(default_factory=list)), ('outputs', list, field(default_factory=list)),
+    ('cached', bool, True),
+])
+## inputs: files whose content is part of the input hash; outputs: paths that must still exist to skip the stage
+## cached: False for stages that do their own up-to-date check (the builds) and always run
+
+
+def pipeline_stages(root, system=None):
+    """
+    Bootstrap stages of the repository: package manager, build tools, the three
+    independent downloads, then the build for the host platform and its packaging.
+    """
+    system = system or platform.system()
+    manifest = [os.path.join(root, MANIFEST_FILE), os.path.join(root, LOCK_FILE)]
+    stages = [
+        Stage('package-manager', '0_ensure_package_manager.py', [], []),
+        Stage('build-tools', '1_install_build_tools.py', [], ['package-manager']),
+        Stage('android-sdk', '2_download_android_sdk.py', [str(root)], ['build-tools'],
+              outputs=[os.path.join(root, '_deps', 'android-sdk')]),
+        Stage('opencl-src', '2_download_opencl_src.py', [str(root)], ['build-tools'],
+              inputs=manifest, outputs=[dependency_dir(root, 'opencl-src')]),
+        Stage('onnxruntime-src', '2_download_onnxruntime_src.py', [str(root)], ['build-tools'],
+              inputs=manifest, outputs=[dependency_dir(root, 'onnxruntime-src')]),
+    ]
+    if system == 'Linux':
+        stages.append(Stage('build', 'install_onnxruntime_linux.py', [str(root)], ['onnxruntime-src'], cached=False))
+    elif system == 'Windows':
+        stages.append(Stage('build', 'install_onnxruntime_windows.py', [str(root)], ['onnxruntime-src'], cached=False))
+    if system in ('Linux', 'Windows'):
+        stages.append(Stage('artifacts', 'artifact_store.py', ['pack', str(root)], ['build'], cached=False))
+    return stages
+
+
+def select_stages(stages, names):
+    """
+    The named stages and everything they depend on, in pipeline order.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    wanted, pending = set(), list(names)
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(by_name[name].deps)
+    return [stage for stage in stages if stage.name in wanted]
+
+
+def input_hash(stage, dep_hashes):
+    """
+    Hash of the stage script, its arguments, its input files, PATH and the hashes
+    of the stages it depends on, so a change upstream reruns everything downstream.
+    """
+    script = os.path.join(SCRIPTS_DIR, stage.script)
+    inputs = {
+        "script": hash_memo.file_digest(script),
+        "args": stage.args,
+        "files": {path: hash_memo.file_digest(path) if os.path.isfile(path) else None for path in stage.inputs},
+        "deps": {name: dep_hashes.get(name) for name in stage.deps},
+        "path": os.environ.get("PATH", ""),
+        "platform": platform.platform(),
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(path, state):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+_print_lock = threading.Lock()
+
+
+def _print(stage, line):
+    with _print_lock:
+        print(f"[{stage.name}] {line}", flush=True)
+
+
+def run_stage(stage):
+    """
+    Run the stage script with the current interpreter, prefixing its output with
+    the stage name. Returns the exit code.
+    """
+    cmd = [sys.executable, os.path.join(SCRIPTS_DIR, stage.script)] + stage.args
+    _print(stage, f"[RUN] {' '.join(cmd)}")
+    with tracing.span(stage.name, "pipeline", cmd=cmd) as span_args:
+        proc = subprocess.Popen(cmd, cwd=SCRIPTS_DIR, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, encoding="utf-8", errors="replace", bufsize=1)
+        for line in proc.stdout:
+            _print(stage, line.rstrip())
+        span_args["exit_code"] = proc.wait()
+    return span_args["exit_code"]
+
+
+def critical_path(stages, durations):
+    """
+    (total seconds, [stage names]) of the longest chain of dependent stages.
+    """
+    best = {}
+    for stage in stages:  # stages are in dependency order
+        before = max(((best[dep][0], best[dep][1]) for dep in stage.deps if dep in best), default=(0.0, []))
+        best[stage.name] = (before[0] + durations.get(stage.name, 0.0), before[1] + [stage.name])
+    return max(best.values(), default=(0.0, []))
+
+
+def run_pipeline(root, names=None, force=False, jobs=None):
+    """
+    Run the stages as a dependency graph: every stage starts as soon as the stages
+    it depends on have succeeded, so the downloads run concurrently. A cached stage
+    whose input hash matches its last successful run and whose outputs still exist
+    is skipped. Returns 1 if any stage failed or could not run.
+    """
+    stages = pipeline_stages(root)
+    if names:
+        unknown = sorted(set(names) - {stage.name for stage in stages})
+        if unknown:
+            print(f"ERROR: Unknown stages: {', '.join(unknown)}")
+            return 1
+        stages = select_stages(stages, names)
+    state_path = os.path.join(os.path.dirname(dependency_dir(root, 'onnxruntime-src')), STATE_FILE)
+    state = load_state(state_path)
+
+    hashes, durations, status = {}, {}, {}
+    pending = {stage.name: stage for stage in stages}
+    running = {}
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=jobs or len(stages) or 1) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if any(status.get(dep) in ('failed', 'blocked') for dep in stage.deps):
+                    status[name] = 'blocked'
+                    del pending[name]
+                    continue
+                if not all(status.get(dep) in ('ok', 'cached') for dep in stage.deps):
+                    continue
+                del pending[name]
+                hashes[name] = input_hash(stage, hashes)
+                recorded = state.get(name, {})
+                if stage.cached and not force and recorded.get("hash") == hashes[name] \
+                        and all(os.path.exists(path) for path in stage.outputs):
+                    status[name] = 'cached'
+                    _print(stage, "Inputs unchanged; skipping.")
+                    continue
+                running[pool.submit(run_stage, stage)] = (stage, time.monotonic())
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, started = running.pop(future)
+                durations[stage.name] = time.monotonic() - started
+                try:
+                    returncode = future.result()
+                except Exception as e:
+                    _print(stage, f"ERROR: {e}")
+                    returncode = 1
+                status[stage.name] = 'ok' if returncode == 0 else 'failed'
+                if returncode == 0:
+                    state[stage.name] = {"hash": hashes[stage.name], "seconds": round(durations[stage.name], 1)}
+                else:
+                    state.pop(stage.name, None)
+                save_state(state_path, state)
+    wall = time.monotonic() - start
+
+    print("Pipeline summary:")
+    for stage in stages:
+        print(f"  {stage.name:16} {status.get(stage.name, 'blocked'):8} {durations.get(stage.name, 0.0):8.1f}s")
+    total, path = critical_path(stages, durations)
+    print(f"Critical path {total:.1f}s of {wall:.1f}s wall: {' -> '.join(path)}")
+    return 1 if any(status.get(stage.name) in ('failed', 'blocked', None) for stage in stages) else 0
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="pipeline",
+        description="Run the bootstrap and build scripts as a dependency graph, skipping stages whose inputs are unchanged."
+    )
+    parser.add_argument(
+        "root",
+        type=Path,
+        metavar="root",
+        help="root directory of onnxruntime-secure repository"
+    )
+    parser.add_argument("stages", nargs="*", metavar="stage",
+                        help="stages to run together with their dependencies (default: all)")
+    parser.add_argument("--force", action="store_true", help="run every stage even if its inputs are unchanged")
+    parser.add_argument("--jobs", type=int, default=None, help="stages running at once (default: no limit)")
+    args = parser.parse_args()
+
+    with tracing.span("pipeline", "script"):
+        sys.exit(run_pipeline(args.root.resolve(), args.stages, args.force, args.jobs))
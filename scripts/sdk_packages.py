@@ -0,0 +1,126 @@
+import os, sys, zipfile, argparse
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import deps_cache
+import tracing
+import zip_extract
+
+PACKAGE_XML = "package.xml"
+
+
+def archive_dir():
+    """
+    Local archive cache for offline installs. Override with ONNXRUNTIME_SECURE_ANDROID_ARCHIVES.
+    """
+    return os.environ.get("ONNXRUNTIME_SECURE_ANDROID_ARCHIVES") or \
+        os.path.join(deps_cache.cache_root(), "android-packages")
+
+
+def _local_package(xml_path):
+    """
+    (path, revision) from the localPackage element of a package.xml, or None.
+    """
+    try:
+        root = ET.parse(xml_path).getroot()
+    except (OSError, ET.ParseError):
+        return None
+    package = next((element for element in root.iter() if element.tag.endswith("localPackage")), None)
+    if package is None or not package.get("path"):
+        return None
+    revision = package.find("revision")
+    parts = [revision.findtext(part) for part in ("major", "minor", "micro")] if revision is not None else []
+    return package.get("path"), ".".join(part for part in parts if part)
+
+
+def installed_packages(sdk_root):
+    """
+    {package path: revision} of every package installed under sdk_root, read from
+    the package.xml sdkmanager writes at the top of each package directory. The
+    walk does not descend into package directories, so it never enters the NDK.
+    """
+    installed = {}
+    with tracing.span("scan_sdk", "probe", sdk_root=str(sdk_root)) as span_args:
+        for dirpath, dirnames, filenames in os.walk(sdk_root):
+            if PACKAGE_XML in filenames:
+                package = _local_package(os.path.join(dirpath, PACKAGE_XML))
+                if package:
+                    installed[package[0]] = package[1]
+                dirnames.clear()
+            else:
+                dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+        span_args["packages"] = len(installed)
+    return installed
+
+
+def missing_packages(sdk_root, requested):
+    installed = installed_packages(sdk_root)
+    return [package for package in requested if package not in installed]
+
+
+def package_dir(sdk_root, package):
+    return os.path.join(sdk_root, *package.split(";"))
+
+
+def archive_path(archives, package):
+    return os.path.join(archives, package.replace(";", "-") + ".zip")
+
+
+def export_packages(sdk_root, archives, packages):
+    """
+    Archive each installed package directory, package.xml included, with paths
+    relative to sdk_root, so install_from_archives restores it in place.
+    Existing archives are kept. Returns the archives written.
+    """
+    os.makedirs(archives, exist_ok=True)
+    written = []
+    for package in packages:
+        path = archive_path(archives, package)
+        directory = package_dir(sdk_root, package)
+        if os.path.isfile(path) or not os.path.isfile(os.path.join(directory, PACKAGE_XML)):
+            continue
+        tmp = f"{path}.tmp{os.getpid()}"
+        with tracing.span("export", "extract", package=package):
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+                for dirpath, dirnames, filenames in os.walk(directory):
+                    for name in filenames:
+                        file_path = os.path.join(dirpath, name)
+                        if not os.path.exists(file_path):  # dangling symlink
+                            continue
+                        zf.write(file_path, os.path.relpath(file_path, sdk_root))
+        os.replace(tmp, path)
+        written.append(path)
+    return written
+
+
+def install_from_archives(sdk_root, archives, packages):
+    """
+    Extract each package from the archive cache into sdk_root. Returns the
+    packages without an archive.
+    """
+    unavailable = []
+    for package in packages:
+        path = archive_path(archives, package)
+        if not os.path.isfile(path):
+            unavailable.append(package)
+            continue
+        rewritten, total = zip_extract.sync_zip(path, sdk_root)
+        print(f"Installed {package} from {path} ({rewritten} of {total} files rewritten).")
+    return unavailable
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="sdk_packages",
+        description="List the Android SDK packages installed under an SDK root."
+    )
+    parser.add_argument("sdk_root", type=Path, help="Android SDK root, e.g. _deps/android-sdk")
+    args = parser.parse_args()
+
+    installed = installed_packages(args.sdk_root)
+    if not installed:
+        print(f"No packages installed under {args.sdk_root}")
+        sys.exit(1)
+    for path, revision in sorted(installed.items()):
+        print(f"{path:40} {revision}")
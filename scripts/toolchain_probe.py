@@ -0,0 +1,172 @@
+import os, sys, json, shutil, subprocess, argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import make_dataclass, asdict
+
+import deps_cache
+import tracing
+import vswhere
+
+ToolProbe = make_dataclass('ToolProbe', [
+    ('name', str), ('path', str), ('version', str), ('status', str)
+])
+## status is "ok", "missing" or "error"
+
+ProbeSpec = make_dataclass('ProbeSpec', [
+    ('executable', str), ('args', list), ('stamp', str), ('check', object)
+])
+## stamp: extra file whose mtime also invalidates the cached result
+## check(returncode, output): True if the tool is usable
+
+def _succeeded(returncode, output):
+    return returncode == 0
+
+PROBES = {
+    'cmake': ProbeSpec('cmake', ['--version'], '', _succeeded),
+    'ninja': ProbeSpec('ninja', ['--version'], '', _succeeded),
+    'java': ProbeSpec('java', ['-version'], '', _succeeded),
+    'build-essential': ProbeSpec(
+        'dpkg-query', ['-W', '-f=${Status} ${Version}', 'build-essential'], '/var/lib/dpkg/status',
+        lambda returncode, output: returncode == 0 and output.startswith('install ok installed')),
+    'xcode': ProbeSpec('xcode-select', ['-p'], '', _succeeded),
+    'cxx': ProbeSpec(os.environ.get('CXX', 'c++'), ['--version'], '', _succeeded),
+}
+# Latest Visual Studio 2022 installation; vswhere is not on PATH
+MSVC_PROBE = 'msvc'
+# Visual Studio Installer records one <instance id>/state.json per installation here
+VS_INSTANCES_DIR = os.path.join(os.environ.get('ProgramData', r'C:\ProgramData'),
+                                'Microsoft', 'VisualStudio', 'Packages', '_Instances')
+
+
+def cache_path():
+    return os.path.join(deps_cache.cache_root(), "toolchain-probes.json")
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _signature(spec, path):
+    return [path, _mtime_ns(path), spec.stamp, _mtime_ns(spec.stamp) if spec.stamp else None]
+
+
+def _msvc_signature(path):
+    try:
+        instances = sorted(os.listdir(VS_INSTANCES_DIR))
+    except OSError:
+        instances = []
+    return [path, _mtime_ns(path), VS_INSTANCES_DIR, _mtime_ns(VS_INSTANCES_DIR),
+            [[instance, _mtime_ns(os.path.join(VS_INSTANCES_DIR, instance, 'state.json'))] for instance in instances]]
+
+
+def _run_probe(name, spec, path):
+    try:
+        result = tracing.run([path] + spec.args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                             category="probe")
+    except OSError:
+        return ToolProbe(name, path, '', 'error')
+    output = result.stdout.strip()
+    version = output.splitlines()[0] if output else ''
+    if spec.check(result.returncode, output):
+        return ToolProbe(name, path, version, 'ok')
+    return ToolProbe(name, path, version, 'missing' if name == 'build-essential' else 'error')
+
+
+def _probe_msvc(path):
+    installation = vswhere.latest_installation(path)
+    if installation is None:
+        return ToolProbe(MSVC_PROBE, path, '', 'missing'), None
+    return ToolProbe(MSVC_PROBE, vswhere.installation_property(installation, 'installationPath'),
+                     vswhere.installation_property(installation, 'installationVersion'), 'ok'), installation
+
+
+def probe_tools(names, jobs=None):
+    """
+    Probe the given tools concurrently and return {name: ToolProbe}.
+
+    Results are cached keyed by PATH and each executable's mtime (plus a stamp file
+    for package queries), so a repeat run with an unchanged toolchain resolves every
+    probe from the cache without starting a single process. Missing tools are not
+    cached; finding that out only takes a PATH lookup. The msvc probe is keyed by
+    vswhere and the Visual Studio instance state files; it keeps the installation
+    it found, so later vswhere lookups in this process answer without running it.
+    """
+    try:
+        with open(cache_path()) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if cache.get('PATH') != os.environ.get('PATH', ''):
+        cache = {'PATH': os.environ.get('PATH', ''), 'tools': {}}
+    tools = cache.setdefault('tools', {})
+
+    results, to_run, msvc = {}, [], None
+    for name in names:
+        if name == MSVC_PROBE:
+            path = vswhere.vswhere_path()
+            cached = tools.get(name)
+            if not path:
+                results[name] = ToolProbe(name, '', '', 'missing')
+            elif cached and cached['signature'] == _msvc_signature(path):
+                results[name] = ToolProbe(**cached['probe'])
+                vswhere.seed_installations(path, [cached['installation']])
+            else:
+                msvc = path
+            continue
+        spec = PROBES[name]
+        path = shutil.which(spec.executable)
+        if path is None:
+            results[name] = ToolProbe(name, '', '', 'missing')
+            continue
+        cached = tools.get(name)
+        if cached and cached['signature'] == _signature(spec, path):
+            results[name] = ToolProbe(**cached['probe'])
+        else:
+            to_run.append((name, spec, path))
+
+    with tracing.span("probe_tools", "probe", tools=names, probed=len(to_run) + bool(msvc)):
+        if to_run or msvc:
+            with ThreadPoolExecutor(jobs or len(to_run) + bool(msvc)) as pool:
+                if msvc:
+                    msvc_probe = pool.submit(_probe_msvc, msvc)
+                for (name, spec, path), probe in zip(to_run, pool.map(lambda item: _run_probe(*item), to_run)):
+                    results[name] = probe
+                    if probe.status == 'ok':
+                        tools[name] = {'signature': _signature(spec, path), 'probe': asdict(probe)}
+                    else:
+                        tools.pop(name, None)
+                if msvc:
+                    probe, installation = msvc_probe.result()
+                    results[MSVC_PROBE] = probe
+                    if installation:
+                        tools[MSVC_PROBE] = {'signature': _msvc_signature(msvc), 'probe': asdict(probe),
+                                             'installation': installation}
+                    else:
+                        tools.pop(MSVC_PROBE, None)
+            os.makedirs(os.path.dirname(cache_path()), exist_ok=True)
+            tmp = f"{cache_path()}.tmp{os.getpid()}"
+            with open(tmp, "w") as f:
+                json.dump(cache, f, indent=1)
+            os.replace(tmp, cache_path())
+    return {name: results[name] for name in names}
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="toolchain_probe",
+        description="Print the path, version and status of build tools."
+    )
+    parser.add_argument("names", nargs="*", metavar="tool",
+                        help=f"tools to probe (default: all of {', '.join(sorted(PROBES))}; also {MSVC_PROBE})")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in PROBES and name != MSVC_PROBE]
+    if unknown:
+        parser.error(f"unknown tools: {', '.join(unknown)}")
+
+    probes = probe_tools(args.names or sorted(PROBES))
+    for probe in probes.values():
+        print(f"{probe.name:16} {probe.status:8} {probe.path or '-'}  {probe.version}")
+    sys.exit(0 if all(probe.status == 'ok' for probe in probes.values()) else 1)
@@ -0,0 +1,136 @@
+import os, sys, json, time, threading, subprocess, argparse
+from contextlib import contextmanager
+
+from file_lock import file_lock
+
+# Path of the Chrome/Perfetto trace to append to; tracing is off when unset
+TRACE_ENV = "ONNXRUNTIME_SECURE_TRACE"
+
+_named_threads = set()
+_named_lock = threading.Lock()
+
+
+def trace_path():
+    return os.environ.get(TRACE_ENV) or None
+
+
+def _append(events):
+    """
+    Append events to the trace in the Chrome JSON array format. Every process and
+    thread appends with O_APPEND and a single write per call, so concurrent scripts
+    (and their child scripts) can share one file. The closing "]" is optional for
+    chrome://tracing and Perfetto and is never written.
+    """
+    path = trace_path()
+    if not path:
+        return
+    data = "".join(json.dumps(event, default=str) + ",\n" for event in events).encode()
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with file_lock(path + ".lock"):
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                _write(path, b"[\n" + data)
+                return
+    _write(path, data)
+
+
+def _write(path, data):
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def _thread_metadata():
+    """
+    thread_name/process_name metadata the first time a thread emits an event.
+    """
+    key = (os.getpid(), threading.get_ident())
+    with _named_lock:
+        if key in _named_threads:
+            return []
+        first_in_process = not any(pid == key[0] for pid, _ in _named_threads)
+        _named_threads.add(key)
+    events = [{"name": "thread_name", "ph": "M", "pid": key[0], "tid": key[1],
+               "args": {"name": threading.current_thread().name}}]
+    if first_in_process:
+        events.append({"name": "process_name", "ph": "M", "pid": key[0], "tid": key[1],
+                       "args": {"name": os.path.basename(sys.argv[0]) or "python"}})
+    return events
+
+
+@contextmanager
+def span(name, category, **args):
+    """
+    Record the enclosed block as a complete ("X") event. The yielded dict is the
+    event's args: the block may add results such as bytes or exit codes to it.
+    An exception escaping the block is recorded as args["error"].
+    """
+    if not trace_path():
+        yield args
+        return
+    start = time.time()
+    try:
+        yield args
+    except SystemExit as e:
+        args.setdefault("exit_code", e.code)
+        raise
+    except BaseException as e:
+        args.setdefault("error", repr(e))
+        raise
+    finally:
+        end = time.time()
+        _append(_thread_metadata() + [{
+            "name": name, "cat": category, "ph": "X",
+            "ts": int(start * 1e6), "dur": int((end - start) * 1e6),
+            "pid": os.getpid(), "tid": threading.get_ident(),
+            "args": args,
+        }])
+
+
+def instant(name, category, **args):
+    """
+    Record a point in time, e.g. a build reaching its link step.
+    """
+    if trace_path():
+        _append(_thread_metadata() + [{
+            "name": name, "cat": category, "ph": "i", "s": "t",
+            "ts": int(time.time() * 1e6), "pid": os.getpid(), "tid": threading.get_ident(),
+            "args": args,
+        }])
+
+
+def run(cmd, category="subprocess", **kwargs):
+    """
+    subprocess.run recorded as a span named after the executable, with the full
+    command line, working directory and exit code.
+    """
+    with span(os.path.basename(str(cmd[0])), category, cmd=[str(c) for c in cmd],
+              cwd=str(kwargs.get("cwd") or os.getcwd())) as args:
+        try:
+            result = subprocess.run(cmd, **kwargs)
+        except subprocess.CalledProcessError as e:
+            args["exit_code"] = e.returncode
+            raise
+        args["exit_code"] = result.returncode
+        return result
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="tracing",
+        description=f"Run a command with {TRACE_ENV} set, so every script it starts appends to one trace."
+    )
+    parser.add_argument("trace", help="trace file to write (open it in https://ui.perfetto.dev or chrome://tracing)")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="command to run, e.g. python scripts/1_install_build_tools.py")
+    args = parser.parse_args()
+    if not args.command:
+        parser.error("no command given")
+
+    os.environ[TRACE_ENV] = os.path.abspath(args.trace)
+    with span(" ".join(args.command), "script") as span_args:
+        returncode = subprocess.run(args.command).returncode
+        span_args["exit_code"] = returncode
+    sys.exit(returncode)
@@ -0,0 +1,150 @@
+import os, sys, json, argparse
+
+import tracing
+
+VS2022_VERSION_RANGE = "[17.0,18.0)"
+
+_installations = {}
+
+
+def vswhere_path():
+    """
+    Path of vswhere.exe, or "" if it is not installed. Override with VSWHERE
+    (e.g. a stub emitting fixture JSON when testing off Windows).
+    """
+    override = os.environ.get("VSWHERE")
+    if override:
+        return override
+    pf86 = os.environ.get("ProgramFiles(x86)")
+    if not pf86:
+        return ""
+    path = os.path.join(pf86, "Microsoft Visual Studio", "Installer", "vswhere.exe")
+    return path if os.path.isfile(path) else ""
+
+
+def query_installations(vswhere, version=VS2022_VERSION_RANGE):
+    """
+    All Visual Studio installations in the version range, with their packages,
+    from a single `vswhere -format json -include packages` call. Cached per process.
+    """
+    key = (vswhere, version)
+    if key not in _installations:
+        result = tracing.run(
+            [
+                vswhere,
+                "-products", "*",
+                "-version", version,
+                "-format", "json",
+                "-include", "packages",
+                "-utf8",
+            ],
+            capture_output=True, encoding="utf-8", category="probe"
+        )
+        try:
+            _installations[key] = json.loads(result.stdout) if result.returncode == 0 else []
+        except ValueError:
+            _installations[key] = []
+    return _installations[key]
+
+
+def seed_installations(vswhere, installations, version=VS2022_VERSION_RANGE):
+    """
+    Answer later queries with installations recorded earlier (e.g. by the toolchain
+    probe cache) instead of running vswhere.
+    """
+    _installations[(vswhere, version)] = installations
+
+
+def _version_key(installation):
+    return tuple(int(part) for part in installation.get("installationVersion", "0").split(".") if part.isdigit())
+
+
+def latest_installation(vswhere, version=VS2022_VERSION_RANGE):
+    """
+    The installation `vswhere -latest` would pick, or None.
+    """
+    installations = query_installations(vswhere, version)
+    return max(installations, key=_version_key) if installations else None
+
+
+def installation_property(installation, name):
+    """
+    Same value as `vswhere -property <name>`; "" if unknown or no installation.
+    """
+    if not installation:
+        return ""
+    value = installation
+    for part in name.split("_"):
+        if not isinstance(value, dict) or part not in value:
+            return ""
+        value = value[part]
+    return str(value)
+
+
+# vcvarsall.bat argument for each build.py target architecture, from an x64 host
+VCVARS_TARGETS = {'x64': 'x64', 'x86': 'amd64_x86', 'ARM64': 'amd64_arm64', 'ARM': 'amd64_arm'}
+
+_vcvars = {}
+
+
+def vcvars_env(installation, arch):
+    """
+    Environment of a developer command prompt for arch (a VCVARS_TARGETS key):
+    vcvarsall.bat run in cmd.exe, then `set`. Names are upper-cased like os.environ
+    on Windows. None if there is no installation or vcvarsall.bat fails. Cached per process.
+    """
+    root = installation_property(installation, "installationPath")
+    if not root:
+        return None
+    key = (root, arch)
+    if key not in _vcvars:
+        script = os.path.join(root, "VC", "Auxiliary", "Build", "vcvarsall.bat")
+        result = tracing.run(
+            ["cmd", "/d", "/c", "call", script, VCVARS_TARGETS[arch], ">nul", "&&", "set"],
+            capture_output=True, text=True, category="probe"
+        )
+        env = None
+        if result.returncode == 0:
+            env = {}
+            for line in result.stdout.splitlines():
+                name, sep, value = line.partition("=")
+                if sep and name:
+                    env[name.upper()] = value
+        _vcvars[key] = env
+    return _vcvars[key]
+
+
+def component_version(installation, component_id):
+    """
+    installationVersion of the installation if it contains component_id, else "".
+    Same answer as `vswhere -requires <id> -property installationVersion`.
+    """
+    if not installation:
+        return ""
+    if any(package.get("id") == component_id for package in installation.get("packages", [])):
+        return installation.get("installationVersion", "")
+    return ""
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="vswhere",
+        description="Query the latest Visual Studio 2022 installation with a single vswhere call."
+    )
+    parser.add_argument("--property", action="append", default=[], help="installation property to print")
+    parser.add_argument("--requires", action="append", default=[], help="component id to look up")
+    args = parser.parse_args()
+
+    vswhere = vswhere_path()
+    if not vswhere:
+        print("vswhere.exe not found.")
+        sys.exit(1)
+    installation = latest_installation(vswhere)
+    if installation is None:
+        print("No Visual Studio 2022 installation found.")
+        sys.exit(1)
+    for name in args.property:
+        print(f"{name}: {installation_property(installation, name)}")
+    for component_id in args.requires:
+        print(f"{component_id}: {component_version(installation, component_id) or 'not installed'}")
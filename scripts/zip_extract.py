@@ -0,0 +1,123 @@
+import os, sys, zipfile, threading, argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import hash_memo
+import tracing
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _target_path(dest, name):
+    """
+    Resolve a member name under dest, refusing absolute paths and ".." escapes.
+    """
+    target = os.path.normpath(os.path.join(dest, name))
+    if os.path.isabs(name) or os.path.commonpath([dest, target]) != dest:
+        raise ValueError(f"Refusing to extract {name!r} outside of {dest}")
+    return target
+
+
+def _member_mode(info):
+    """
+    Unix permission bits stored in the archive, or None if the archive has none.
+    """
+    if info.create_system != 3:
+        return None
+    mode = (info.external_attr >> 16) & 0o777
+    return mode or None
+
+
+def _needs_rewrite(info, target, crcs):
+    if not os.path.isfile(target) or os.path.getsize(target) != info.file_size:
+        return True
+    return crcs.get(target) != f"{info.CRC:08x}"
+
+
+def _extract_member(zip_path, info, target, local, handles):
+    zf = getattr(local, "zf", None)
+    if zf is None:
+        zf = local.zf = zipfile.ZipFile(zip_path)
+        handles.append(zf)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f"{target}.tmp{os.getpid()}.{threading.get_ident()}"
+    with zf.open(info) as src, open(tmp, "wb") as dst:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+            dst.write(chunk)
+    mode = _member_mode(info)
+    if mode is not None and os.name != "nt":
+        os.chmod(tmp, mode)
+    os.replace(tmp, target)
+
+
+def sync_zip(zip_path, dest, jobs=None):
+    """
+    Make dest match the contents of zip_path, rewriting only members whose size or
+    CRC-32 differ from the file on disk. CRCs of extracted files are memoized, so
+    checking an intact tree does not read it back. Members are decompressed in a
+    thread pool, and Unix permission bits (such as +x on sdkmanager) are kept.
+    Returns (rewritten, total) member counts.
+    """
+    with tracing.span("extract", "extract", zip=str(zip_path), dest=str(dest)) as span_args:
+        rewritten, total, written = _sync_zip(zip_path, os.path.abspath(dest), jobs or os.cpu_count() or 1)
+        span_args.update(rewritten=rewritten, total=total, bytes=written)
+    return rewritten, total
+
+
+def _sync_zip(zip_path, dest, jobs):
+    with zipfile.ZipFile(zip_path) as zf:
+        infos = zf.infolist()
+
+    files = []
+    for info in infos:
+        target = _target_path(dest, info.filename)
+        if info.is_dir():
+            os.makedirs(target, exist_ok=True)
+        else:
+            files.append((info, target))
+
+    present = [target for info, target in files
+               if os.path.isfile(target) and os.path.getsize(target) == info.file_size]
+    with ThreadPoolExecutor(jobs) as pool:
+        digests = hash_memo.file_digests(
+            present, "crc32",
+            hasher=lambda paths: list(pool.map(lambda p: hash_memo.hash_file(p, "crc32"), paths)))
+    crcs = dict(zip(present, digests))
+
+    stale = [(info, target) for info, target in files if _needs_rewrite(info, target, crcs)]
+    local, handles = threading.local(), []
+    try:
+        with ThreadPoolExecutor(jobs) as pool:
+            list(pool.map(lambda item: _extract_member(zip_path, item[0], item[1], local, handles), stale))
+    finally:
+        for zf in handles:
+            zf.close()
+
+    for info, target in files:
+        mode = _member_mode(info)
+        if mode is not None and os.name != "nt" and (os.stat(target).st_mode & 0o777) != mode:
+            os.chmod(target, mode)
+
+    if stale:
+        # zipfile already verified each CRC while extracting
+        written = {target: f"{info.CRC:08x}" for info, target in stale}
+        hash_memo.file_digests(list(written), "crc32", hasher=lambda paths: [written[p] for p in paths])
+    return len(stale), len(files), sum(info.file_size for info, _ in stale)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        prog="zip_extract",
+        description="Incrementally extract a zip archive, rewriting only members that differ."
+    )
+    parser.add_argument("zip", type=Path, help="zip archive")
+    parser.add_argument("dest", type=Path, help="destination directory")
+    parser.add_argument("--jobs", type=int, default=None, help="decompression threads (default: CPU count)")
+    args = parser.parse_args()
+
+    if not args.zip.is_file():
+        print(f"No such archive: {args.zip}")
+        sys.exit(1)
+    rewritten, total = sync_zip(args.zip, args.dest, args.jobs)
+    print(f"Extracted {rewritten} of {total} files into {args.dest}")
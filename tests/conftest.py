@@ -0,0 +1,106 @@
+import os, sys, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """
+    Keep the machine-wide cache, traces and git identity out of every test.
+    """
+    monkeypatch.setenv("ONNXRUNTIME_SECURE_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("ONNXRUNTIME_SECURE_TRACE", raising=False)
+    for name in ["AUTHOR", "COMMITTER"]:
+        monkeypatch.setenv(f"GIT_{name}_NAME", "test")
+        monkeypatch.setenv(f"GIT_{name}_EMAIL", "test@example.com")
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    return tmp_path / "cache"
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Serves server.files with Range support and answers server.status for every other path.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, body):
+        self.server.requests.append((self.command, self.path))
+        content = self.server.files.get(self.path)
+        if content is None:
+            self.send_error(self.server.status)
+            return
+        start, end = 0, len(content)
+        ranged = self.headers.get("Range")
+        if ranged:
+            first, _, last = ranged.split("=", 1)[1].partition("-")
+            start, end = int(first), int(last) + 1 if last else len(content)
+        self.send_response(206 if ranged else 200)
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        if body:
+            self.wfile.write(content[start:end])
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def do_GET(self):
+        self._respond(True)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.files, httpd.requests, httpd.status = {}, [], 404
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+VS_INSTALLATION = {
+    "instanceId": "1a2b3c4d",
+    "installationPath": "C:\\Program Files\\Microsoft Visual Studio\\2022\\Community",
+    "installationVersion": "17.9.34607.119",
+    "channelId": "VisualStudio.17.Release",
+    "productId": "Microsoft.VisualStudio.Product.Community",
+    "catalog": {"productDisplayVersion": "17.9.6"},
+    "packages": [
+        {"id": "Microsoft.VisualStudio.Component.VC.Tools.x86.x64", "version": "17.9.34511.75"},
+        {"id": "Microsoft.VisualStudio.Component.VC.Tools.ARM64", "version": "17.9.34511.75"},
+    ],
+}
+
+
+@pytest.fixture
+def vs_installation():
+    """
+    The latest installation reported by vswhere_stub.
+    """
+    return VS_INSTALLATION
+
+
+@pytest.fixture
+def vswhere_stub(tmp_path, monkeypatch):
+    """
+    Executable standing in for vswhere.exe: prints fixture JSON of an older and the
+    latest installation and appends a line to <stub>.calls per run. VSWHERE points at it.
+    """
+    import vswhere
+    older = dict(VS_INSTALLATION, instanceId="0", installationVersion="17.4.33403.182", packages=[])
+    stub = tmp_path / "vswhere"
+    stub.write_text(f"#!{sys.executable}\n"
+                    "import sys, json\n"
+                    f"open({str(stub) + '.calls'!r}, 'a').write(' '.join(sys.argv[1:]) + '\\n')\n"
+                    f"print(json.dumps({[older, VS_INSTALLATION]!r}))\n")
+    stub.chmod(0o755)
+    monkeypatch.setenv("VSWHERE", str(stub))
+    monkeypatch.setattr(vswhere, "_installations", {})
+    return stub
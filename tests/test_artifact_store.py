@@ -0,0 +1,108 @@
+import os, json
+
+import pytest
+
+import artifact_store
+from artifact_store import COMMON_BUNDLE, MANIFEST_FILE
+
+needs_zstd = pytest.mark.skipif(artifact_store.zstd_backend() is None, reason="no zstd implementation")
+
+
+def file_entry(digest):
+    return {"sha256": digest * 64, "size": 1, "mode": 0o644}
+
+
+def test_plan_bundles_keys_shared_contents_by_arch_set():
+    trees = {
+        "x64": {"a": file_entry("a"), "ab": file_entry("b"), "all": file_entry("c")},
+        "arm64": {"ab": file_entry("b"), "all": file_entry("c"), "own": file_entry("d")},
+        "x86": {"all": file_entry("c")},
+    }
+    plan = artifact_store.plan_bundles(trees)
+    assert plan[COMMON_BUNDLE] == {"archs": ["arm64", "x64", "x86"], "digests": ["c" * 64]}
+    assert plan["common+arm64+x64"] == {"archs": ["arm64", "x64"], "digests": ["b" * 64]}
+    assert plan["x64"]["digests"] == ["a" * 64]
+    assert plan["arm64"]["digests"] == ["d" * 64]
+    assert plan["x86"]["digests"] == []
+
+
+def write_tree(root, files, links=None):
+    for relpath, content in files.items():
+        path = root / relpath
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    for relpath, target in (links or {}).items():
+        os.symlink(target, root / relpath)
+
+
+@pytest.fixture
+def install_root(tmp_path):
+    root = tmp_path / "install"
+    shared = os.urandom(4096)
+    write_tree(root / "x64", {"lib/libonnxruntime.so.1": shared, "include/api.h": b"api",
+                              "bin/tool": b"x64 tool"}, {"lib/libonnxruntime.so": "libonnxruntime.so.1"})
+    write_tree(root / "arm64", {"lib/libonnxruntime.so.1": shared, "include/api.h": b"api",
+                                "bin/tool": b"arm64 tool"})
+    write_tree(root / "x86", {"include/api.h": b"api", "bin/tool": b"x86 tool"})
+    return root
+
+
+def read_tree(root):
+    return {os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, "/"):
+            os.readlink(os.path.join(dirpath, name)) if os.path.islink(os.path.join(dirpath, name))
+            else open(os.path.join(dirpath, name), "rb").read()
+            for dirpath, dirnames, filenames in os.walk(root) for name in filenames}
+
+
+@needs_zstd
+def test_pack_unpack_round_trip(tmp_path, install_root):
+    store = tmp_path / "store"
+    manifest = artifact_store.pack(str(install_root), str(store))
+    assert manifest["archs"]["x86"] == [COMMON_BUNDLE, "x86"]
+    assert "common+arm64+x64" in manifest["archs"]["x64"]
+
+    dest = tmp_path / "out"
+    assert artifact_store.unpack(str(store), str(dest)) == ["arm64", "x64", "x86"]
+    for arch in ["x64", "arm64", "x86"]:
+        assert read_tree(dest / arch) == read_tree(install_root / arch)
+    assert os.path.islink(dest / "x64" / "lib" / "libonnxruntime.so")
+
+
+@needs_zstd
+def test_pack_subset_keeps_other_archs(tmp_path, install_root):
+    store = tmp_path / "store"
+    artifact_store.pack(str(install_root), str(store))
+    (install_root / "x64" / "bin" / "tool").write_bytes(b"new x64 tool")
+    # The other trees may be gone locally; their contents come from the old bundles
+    for arch in ["arm64", "x86"]:
+        os.rename(install_root / arch, tmp_path / f"{arch}-saved")
+
+    manifest = artifact_store.pack(str(install_root), str(store), ["x64"])
+    assert sorted(manifest["archs"]) == ["arm64", "x64", "x86"]
+    dest = tmp_path / "out"
+    artifact_store.unpack(str(store), str(dest))
+    assert (dest / "x64" / "bin" / "tool").read_bytes() == b"new x64 tool"
+    for arch in ["arm64", "x86"]:
+        assert read_tree(dest / arch) == read_tree(tmp_path / f"{arch}-saved")
+
+    manifest = artifact_store.pack(str(install_root), str(store), ["x64"], prune=True)
+    assert list(manifest["archs"]) == ["x64"]
+    assert sorted(os.listdir(store)) == [MANIFEST_FILE, "x64" + artifact_store.BUNDLE_SUFFIX]
+
+
+@pytest.mark.parametrize("relpath, entry", [
+    ("../escape", {"sha256": "a" * 64, "size": 1, "mode": 0o644}),
+    ("/etc/passwd", {"sha256": "a" * 64, "size": 1, "mode": 0o644}),
+    ("C:/evil", {"sha256": "a" * 64, "size": 1, "mode": 0o644}),
+    ("lib/../../escape", {"sha256": "a" * 64, "size": 1, "mode": 0o644}),
+    ("lib/link", {"link": "../../outside"}),
+    ("lib/link", {"link": "/etc"}),
+])
+def test_unpack_rejects_unsafe_paths(tmp_path, relpath, entry):
+    store = tmp_path / "store"
+    store.mkdir()
+    manifest = {"version": 1, "archs": {"x64": []}, "trees": {"x64": {relpath: entry}}, "bundles": {}}
+    (store / MANIFEST_FILE).write_text(json.dumps(manifest))
+    with pytest.raises(RuntimeError, match="Unsafe"):
+        artifact_store.unpack(str(store), str(tmp_path / "out"))
+    assert not (tmp_path / "out").exists()
@@ -0,0 +1,80 @@
+import sys
+
+import pytest
+
+import build_scheduler
+from build_scheduler import BuildJob, BuildScheduler
+
+
+def python_job(tmp_path, name, code, jobs_seen=None, configure=None):
+    """
+    BuildJob whose build step runs code in a fresh interpreter, recording the job count it got.
+    """
+    def build(jobs):
+        if jobs_seen is not None:
+            jobs_seen[name] = jobs
+        return [sys.executable, "-c", code]
+    return BuildJob(name=name, configure=configure, build=build, cwd=str(tmp_path),
+                    log=str(tmp_path / f"{name}.log"))
+
+
+def test_total_slots_capped_by_memory(monkeypatch):
+    monkeypatch.setattr(build_scheduler.os, "cpu_count", lambda: 16)
+    monkeypatch.setattr(build_scheduler, "available_memory", lambda: 5 * 1024 ** 3)
+    assert build_scheduler.total_slots(2 * 1024 ** 3) == 2
+    monkeypatch.setattr(build_scheduler, "available_memory", lambda: 1024)
+    assert build_scheduler.total_slots(2 * 1024 ** 3) == 1
+    monkeypatch.setattr(build_scheduler, "available_memory", lambda: None)
+    assert build_scheduler.total_slots(2 * 1024 ** 3) == 16
+
+
+@pytest.mark.parametrize("line, matches", [
+    ("[12/40] Building CXX object onnxruntime_framework.dir/tensor.cc.o", True),
+    ("[1/2] Re-checking globbed directories...", False),
+    ("[1/2] Re-running CMake...", False),
+    ("-- Configuring done", False),
+])
+def test_progress_pattern_skips_regeneration(line, matches):
+    assert bool(build_scheduler.PROGRESS_PATTERN.match(line)) == matches
+
+
+def test_next_build_compiles_while_first_links(tmp_path):
+    marker = tmp_path / "first-done"
+    jobs_seen = {}
+    first = python_job(tmp_path, "first", (
+        "import time\n"
+        "print('[1/3] Building CXX object a.o', flush=True)\n"
+        "print('[2/3] Building CXX object b.o', flush=True)\n"
+        "time.sleep(1.5)\n"
+        f"open({str(marker)!r}, 'w').close()\n"
+        "print('[3/3] Linking CXX shared library libonnxruntime.so')\n"), jobs_seen)
+    second = python_job(tmp_path, "second", f"import os; print('first done:', os.path.exists({str(marker)!r}))",
+                        jobs_seen)
+    scheduler = BuildScheduler([first, second], slots=8, max_concurrent=1)
+    assert scheduler.run() == {"first": 0, "second": 0}
+    assert "first done: False" in (tmp_path / "second.log").read_text()
+    assert jobs_seen == {"first": 8, "second": 7}
+    assert "link" in scheduler.timings["first"]
+    assert scheduler.free == 8
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_raising_build_counts_as_failed(tmp_path):
+    def build(jobs):
+        raise RuntimeError("no build command")
+    broken = BuildJob(name="broken", configure=None, build=build, cwd=str(tmp_path))
+    fine = python_job(tmp_path, "fine", "print('ok')")
+    scheduler = BuildScheduler([broken, fine], slots=2, max_concurrent=1)
+    assert scheduler.run() == {"broken": 1, "fine": 0}
+    assert scheduler.free == 2
+
+
+def test_failed_configure_and_error_jobs_do_not_build(tmp_path):
+    built = {}
+    failing = python_job(tmp_path, "failing", "", built, configure=[sys.executable, "-c", "raise SystemExit(3)"])
+    unusable = BuildJob(name="unusable", configure=None, build=None, cwd=str(tmp_path), error="no compiler")
+    current = BuildJob(name="current", configure=None, build=None, cwd=str(tmp_path), up_to_date=True)
+    scheduler = BuildScheduler([failing, unusable, current], slots=4)
+    assert scheduler.run() == {"failing": 3, "unusable": 1, "current": 0}
+    assert built == {}
+    assert scheduler.free == 4
@@ -0,0 +1,97 @@
+import os, json, subprocess
+
+import pytest
+
+import compiler_cache
+from compiler_cache import CompilerCache
+
+CCACHE = CompilerCache("ccache", "/usr/bin/ccache", "5G")
+SCCACHE = CompilerCache("sccache", "/usr/bin/sccache", "10G")
+
+# ccache 4.8 --print-stats
+CCACHE_STATS = """\
+autoconf_test\t0
+bad_compiler_arguments\t2
+cache_miss\t37
+compiler_check_failed\t0
+direct_cache_hit\t1180
+local_storage_hit\t1203
+local_storage_miss\t37
+preprocessed_cache_hit\t23
+stats_updated_timestamp\t1712345678
+stats_zeroed_timestamp\t1712340000
+"""
+
+# sccache 0.7 --show-stats --stats-format json (abridged)
+SCCACHE_STATS = {
+    "stats": {
+        "compile_requests": 1262,
+        "requests_executed": 1240,
+        "cache_errors": {"counts": {}, "adv_counts": {}},
+        "cache_hits": {"counts": {"C/C++": 1190, "CUDA": 8}, "adv_counts": {"clang [C/C++]": 1190}},
+        "cache_misses": {"counts": {"C/C++": 42}, "adv_counts": {"clang [C/C++]": 42}},
+        "cache_timeouts": 0,
+        "non_cacheable_compilations": 0,
+    },
+    "cache_location": "Local disk",
+}
+
+
+def test_cache_env_per_variant(isolated_cache):
+    x64 = compiler_cache.cache_env(CCACHE, "Windows-x64")
+    arm64 = compiler_cache.cache_env(CCACHE, "Windows-ARM64")
+    assert x64 == {"CCACHE_DIR": str(isolated_cache / "compiler-cache" / "ccache" / "Windows-x64"),
+                   "CCACHE_MAXSIZE": "5G"}
+    assert x64["CCACHE_DIR"] != arm64["CCACHE_DIR"]
+    assert os.path.isdir(x64["CCACHE_DIR"])
+
+
+def test_sccache_port_is_stable_and_per_variant():
+    x64 = compiler_cache.cache_env(SCCACHE, "Windows-x64")
+    assert x64 == compiler_cache.cache_env(SCCACHE, "Windows-x64")
+    assert x64["SCCACHE_CACHE_SIZE"] == "10G"
+    ports = {compiler_cache.cache_env(SCCACHE, name)["SCCACHE_SERVER_PORT"]
+             for name in ["Windows-x64", "Windows-ARM64", "Windows-x86", "Windows-ARM"]}
+    assert len(ports) == 4
+    assert all(compiler_cache.SCCACHE_BASE_PORT <= int(port) < compiler_cache.SCCACHE_BASE_PORT + 1000
+               for port in ports)
+
+
+def test_cache_defines():
+    launcher = ["CMAKE_C_COMPILER_LAUNCHER=/usr/bin/ccache", "CMAKE_CXX_COMPILER_LAUNCHER=/usr/bin/ccache"]
+    assert compiler_cache.cache_defines(CCACHE, "Linux") == launcher
+    assert compiler_cache.cache_defines(CCACHE, "Windows") == launcher + [
+        "CMAKE_POLICY_DEFAULT_CMP0141=NEW", "CMAKE_MSVC_DEBUG_INFORMATION_FORMAT=Embedded"]
+    assert compiler_cache.debug_info_defines("Linux") == []
+
+
+@pytest.fixture
+def tool_output(monkeypatch):
+    """
+    Replace the cache tool with canned output: {tuple(args): (returncode, stdout)}.
+    """
+    outputs, calls = {}, []
+
+    def run(cache, args, env):
+        calls.append(args)
+        returncode, stdout = outputs.get(tuple(args), (0, ""))
+        return subprocess.CompletedProcess([cache.path] + args, returncode, stdout, "")
+    monkeypatch.setattr(compiler_cache, "_run", run)
+    return outputs, calls
+
+
+def test_ccache_stats(tool_output):
+    outputs, _ = tool_output
+    outputs[("--print-stats",)] = (0, CCACHE_STATS)
+    assert compiler_cache.cache_stats(CCACHE, {}) == (1180 + 23, 37)
+    outputs[("--print-stats",)] = (1, "")
+    assert compiler_cache.cache_stats(CCACHE, {}) is None
+
+
+def test_sccache_stats_stop_the_server(tool_output):
+    outputs, calls = tool_output
+    outputs[("--show-stats", "--stats-format", "json")] = (0, json.dumps(SCCACHE_STATS))
+    assert compiler_cache.cache_stats(SCCACHE, {}) == (1198, 42)
+    assert ["--stop-server"] in calls
+    outputs[("--show-stats", "--stats-format", "json")] = (2, "sccache: error: couldn't connect to server")
+    assert compiler_cache.cache_stats(SCCACHE, {}) is None
@@ -0,0 +1,63 @@
+import os, time, hashlib, threading
+
+import pytest
+
+import deps_cache
+from file_lock import file_lock
+
+
+def sha256(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def cache_entry(content, atime):
+    path = deps_cache.cached_file_path(sha256(content))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    os.utime(path, ns=(atime, atime))
+    return path
+
+
+def test_fetch_stores_verified_download_and_hits_afterwards(tmp_path, server):
+    content = os.urandom(4096)
+    server.files["/dep.zip"] = content
+    first = deps_cache.fetch(server.url + "/dep.zip", sha256(content), str(tmp_path / "a" / "dep.zip"))
+    assert open(first, "rb").read() == content
+    assert open(deps_cache.cached_file_path(sha256(content)), "rb").read() == content
+
+    second = deps_cache.fetch(server.url + "/dep.zip", sha256(content).upper(), str(tmp_path / "b" / "dep.zip"))
+    assert open(second, "rb").read() == content
+    assert [method for method, _ in server.requests].count("GET") == 1
+
+
+def test_fetch_does_not_cache_content_with_wrong_hash(tmp_path, server):
+    server.files["/dep.zip"] = b"tampered"
+    expected = sha256(b"expected")
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        deps_cache.fetch(server.url + "/dep.zip", expected, str(tmp_path / "dep.zip"))
+    assert deps_cache.lookup(expected) is None
+    assert not (tmp_path / "dep.zip").exists()
+
+
+def test_evict_drops_least_recently_used_first():
+    old = cache_entry(b"o" * 100, 1_000_000_000)
+    kept = cache_entry(b"k" * 100, 2_000_000_000)
+    new = cache_entry(b"n" * 100, 3_000_000_000)
+    deps_cache.evict(max_size=150, keep=[kept])
+    assert not os.path.exists(old)
+    assert os.path.exists(kept)
+    assert not os.path.exists(new)
+
+
+def test_evict_keeps_entry_looked_up_while_it_waited_for_the_lock():
+    content = b"x" * 100
+    path = cache_entry(content, 1_000_000_000)
+    with file_lock(deps_cache.entry_lock_path(sha256(content))):
+        evicting = threading.Thread(target=deps_cache.evict, kwargs={"max_size": 0})
+        evicting.start()
+        time.sleep(0.2)
+        assert evicting.is_alive()
+        assert deps_cache.lookup(sha256(content)) == path
+    evicting.join()
+    assert os.path.exists(path)
@@ -0,0 +1,52 @@
+import os, hashlib
+from urllib.error import HTTPError
+
+import pytest
+
+import downloader
+
+
+def test_download_verifies_sha256(tmp_path, server):
+    content = os.urandom(100000)
+    server.files["/file"] = content
+    dest = tmp_path / "file"
+    digest = downloader.download(server.url + "/file", dest, sha256=hashlib.sha256(content).hexdigest())
+    assert digest == hashlib.sha256(content).hexdigest()
+    assert dest.read_bytes() == content
+
+
+def test_download_rejects_sha256_mismatch(tmp_path, server):
+    server.files["/file"] = b"tampered"
+    dest = tmp_path / "file"
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        downloader.download(server.url + "/file", dest, sha256=hashlib.sha256(b"expected").hexdigest())
+    assert not dest.exists()
+    assert not os.path.exists(str(dest) + ".part")
+
+
+def test_parallel_download_hashes_segments_in_order(tmp_path, server, monkeypatch):
+    monkeypatch.setattr(downloader, "MIN_SEGMENT_SIZE", 64 * 1024)
+    monkeypatch.setattr(downloader, "CHUNK_SIZE", 4096)
+    content = os.urandom(512 * 1024)
+    server.files["/big"] = content
+    dest = tmp_path / "big"
+    digest = downloader.download(server.url + "/big", dest, sha256=hashlib.sha256(content).hexdigest(), jobs=4)
+    assert digest == hashlib.sha256(content).hexdigest()
+    assert dest.read_bytes() == content
+    assert sum(1 for method, _ in server.requests if method == "GET") == 4
+
+
+@pytest.mark.parametrize("status", [403, 404])
+def test_client_errors_are_not_retried(tmp_path, server, status):
+    server.status = status
+    with pytest.raises(HTTPError):
+        downloader.download(server.url + "/missing", tmp_path / "missing")
+    assert [method for method, _ in server.requests] == ["HEAD", "GET"]
+
+
+def test_rate_limiting_is_retried(tmp_path, server, monkeypatch):
+    monkeypatch.setattr(downloader, "RETRIES", 2)
+    server.status = 429
+    with pytest.raises(HTTPError):
+        downloader.download(server.url + "/limited", tmp_path / "limited")
+    assert [method for method, _ in server.requests] == ["HEAD", "GET", "GET", "GET"]
@@ -0,0 +1,141 @@
+import os, sys, json, subprocess
+
+import pytest
+
+import git_sync
+from git_sync import SyncOptions
+
+
+def git(*args, cwd=None):
+    return subprocess.run(["git"] + list(args), cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def make_repo(path, files):
+    git("init", "-q", "-b", "main", str(path))
+    for name, content in files.items():
+        (path / name).write_text(content)
+    git("add", "-A", cwd=path)
+    git("commit", "-q", "-m", "init", cwd=path)
+    return git("rev-parse", "HEAD", cwd=path)
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    path = tmp_path / "upstream"
+    path.mkdir()
+    return str(path), make_repo(path, {"README.md": "upstream\n"})
+
+
+@pytest.fixture
+def options():
+    return SyncOptions(use_mirror=False, jobs=1)
+
+
+def test_fresh_clone(tmp_path, upstream, options):
+    url, head = upstream
+    clone_dir = str(tmp_path / "_deps" / "src")
+    git_sync.sync_repo(url, clone_dir, options)
+    assert git("rev-parse", "HEAD", cwd=clone_dir) == head
+    assert git_sync.is_usable_repo(clone_dir)
+
+
+def test_repair_non_git_directory(tmp_path, upstream, options):
+    url, head = upstream
+    clone_dir = tmp_path / "src"
+    clone_dir.mkdir()
+    (clone_dir / "stale.txt").write_text("left over\n")
+    git_sync.sync_repo(url, str(clone_dir), options)
+    assert git("rev-parse", "HEAD", cwd=clone_dir) == head
+    assert (clone_dir / "README.md").read_text() == "upstream\n"
+
+
+def test_repoint_mismatched_origin(tmp_path, upstream, options):
+    url, head = upstream
+    other = tmp_path / "other"
+    other.mkdir()
+    make_repo(other, {"other.txt": "other\n"})
+    clone_dir = str(tmp_path / "src")
+    git("clone", "-q", str(other), clone_dir)
+    git_sync.sync_repo(url, clone_dir, options)
+    assert git_sync.get_remote_url(clone_dir) == url
+    assert git("rev-parse", "HEAD", cwd=clone_dir) == head
+
+
+def test_damaged_nested_repo_leaves_parent_alone(tmp_path, upstream, options):
+    """
+    With HEAD missing, git run inside the nested clone resolves to the enclosing
+    checkout; the sync must repair the nested clone, not reset the parent.
+    """
+    url, head = upstream
+    parent = tmp_path / "parent"
+    parent.mkdir()
+    parent_head = make_repo(parent, {"work.txt": "committed\n"})
+    git("remote", "add", "origin", "https://example.com/onnxruntime-secure.git", cwd=parent)
+    (parent / "work.txt").write_text("uncommitted\n")
+
+    clone_dir = parent / "_deps" / "onnxruntime-src"
+    git_sync.sync_repo(url, str(clone_dir), options)
+    os.remove(clone_dir / ".git" / "HEAD")
+    assert not git_sync.is_usable_repo(str(clone_dir))
+
+    git_sync.sync_repo(url, str(clone_dir), options)
+
+    assert git_sync.get_remote_url(str(parent)) == "https://example.com/onnxruntime-secure.git"
+    assert git("rev-parse", "HEAD", cwd=parent) == parent_head
+    assert (parent / "work.txt").read_text() == "uncommitted\n"
+    assert git_sync.is_own_toplevel(str(clone_dir))
+    assert git("rev-parse", "HEAD", cwd=clone_dir) == head
+
+
+def test_mirror_only_for_full_syncs_with_persistent_cache(monkeypatch, isolated_cache):
+    assert not git_sync.mirror_enabled(SyncOptions(use_mirror=True, fetch_mode="shallow"))
+    assert not git_sync.mirror_enabled(SyncOptions(use_mirror=True, fetch_mode="blobless"))
+    assert git_sync.mirror_enabled(SyncOptions(use_mirror=True))
+    assert git_sync.mirror_enabled(SyncOptions())
+    monkeypatch.delenv("ONNXRUNTIME_SECURE_CACHE_DIR")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(isolated_cache))
+    monkeypatch.setattr(git_sync.deps_cache.platform, "system", lambda: "Linux")
+    assert not git_sync.mirror_enabled(SyncOptions())
+    os.makedirs(git_sync.mirrors_root())
+    assert git_sync.mirror_enabled(SyncOptions())
+
+
+def test_shallow_sync_skips_mirror(tmp_path, upstream):
+    url, head = upstream
+    clone_dir = str(tmp_path / "src")
+    git_sync.sync_repo(url, clone_dir, SyncOptions(use_mirror=True, fetch_mode="shallow", commit=head, jobs=1))
+    assert git("rev-parse", "HEAD", cwd=clone_dir) == head
+    assert not os.path.exists(git_sync.mirror_dir(url))
+
+
+def test_lock_follows_every_manifest_field(tmp_path, upstream):
+    url, head = upstream
+    manifest = {"dep": {"url": url, "ref": "main", "dest": "_deps/dep"}}
+    lock = git_sync.lock_dependencies(manifest, {})
+    assert lock["dep"] == dict(manifest["dep"], commit=head)
+
+    stale = {"dep": dict(lock["dep"], commit="0" * 40)}
+    assert git_sync.lock_dependencies(manifest, stale)["dep"]["commit"] == "0" * 40
+    manifest["dep"]["dest"] = "_deps/elsewhere"
+    relocked = git_sync.lock_dependencies(manifest, stale)["dep"]
+    assert relocked == dict(manifest["dep"], commit=head)
+
+
+def test_sync_empty_manifest(tmp_path, options):
+    (tmp_path / git_sync.MANIFEST_FILE).write_text("{}")
+    git_sync.sync_dependencies(str(tmp_path), options=options)
+
+
+def test_concurrent_lock_updates_keep_every_entry(tmp_path, upstream):
+    url, head = upstream
+    names = ["a", "b", "c"]
+    (tmp_path / git_sync.MANIFEST_FILE).write_text(json.dumps(
+        {name: {"url": url, "ref": "main", "dest": f"_deps/{name}"} for name in names}))
+    scripts = os.path.dirname(git_sync.__file__)
+    for _ in range(3):
+        (tmp_path / git_sync.LOCK_FILE).unlink(missing_ok=True)
+        procs = [subprocess.Popen([sys.executable, "-c", f"import git_sync; git_sync.update_lock_file({str(tmp_path)!r}, "
+                                   f"[{name!r}])"], cwd=scripts, stdout=subprocess.DEVNULL) for name in names]
+        assert [proc.wait() for proc in procs] == [0] * len(names)
+        lock = json.loads((tmp_path / git_sync.LOCK_FILE).read_text())
+        assert {name: entry["commit"] for name, entry in lock.items()} == {name: head for name in names}
@@ -0,0 +1,43 @@
+import os, json
+
+import pytest
+
+import toolchain_probe
+import vswhere
+
+
+def calls(stub):
+    path = stub.parent / (stub.name + ".calls")
+    return len(path.read_text().splitlines()) if path.exists() else 0
+
+
+@pytest.fixture
+def instances_dir(tmp_path, monkeypatch, vs_installation):
+    path = tmp_path / "_Instances"
+    (path / vs_installation["instanceId"]).mkdir(parents=True)
+    (path / vs_installation["instanceId"] / "state.json").write_text("{}")
+    monkeypatch.setattr(toolchain_probe, "VS_INSTANCES_DIR", str(path))
+    return path
+
+
+def test_msvc_probe_is_answered_from_cache(vswhere_stub, instances_dir, monkeypatch, vs_installation):
+    probe = toolchain_probe.probe_tools([toolchain_probe.MSVC_PROBE])[toolchain_probe.MSVC_PROBE]
+    assert (probe.status, probe.version) == ("ok", vs_installation["installationVersion"])
+    assert calls(vswhere_stub) == 1
+
+    monkeypatch.setattr(vswhere, "_installations", {})  # a new process
+    assert toolchain_probe.probe_tools([toolchain_probe.MSVC_PROBE])[toolchain_probe.MSVC_PROBE] == probe
+    installation = vswhere.latest_installation(str(vswhere_stub))
+    assert vswhere.component_version(installation, vs_installation["packages"][0]["id"])
+    assert calls(vswhere_stub) == 1
+
+
+def test_msvc_probe_reruns_when_an_instance_changes(vswhere_stub, instances_dir, monkeypatch, vs_installation):
+    toolchain_probe.probe_tools([toolchain_probe.MSVC_PROBE])
+    state = instances_dir / vs_installation["instanceId"] / "state.json"
+    state.write_text(json.dumps({"updated": True}))
+    stat = state.stat()
+    os.utime(state, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    monkeypatch.setattr(vswhere, "_installations", {})
+    toolchain_probe.probe_tools([toolchain_probe.MSVC_PROBE])
+    assert calls(vswhere_stub) == 2
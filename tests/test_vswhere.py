@@ -0,0 +1,50 @@
+import vswhere
+
+
+def stub_calls(stub):
+    path = stub.parent / (stub.name + ".calls")
+    return path.read_text().splitlines() if path.exists() else []
+
+
+def test_vswhere_path_honours_override(vswhere_stub):
+    assert vswhere.vswhere_path() == str(vswhere_stub)
+
+
+def test_latest_installation_picks_highest_version(vswhere_stub, vs_installation):
+    installation = vswhere.latest_installation(vswhere.vswhere_path())
+    assert installation == vs_installation
+    assert stub_calls(vswhere_stub) == [
+        f"-products * -version {vswhere.VS2022_VERSION_RANGE} -format json -include packages -utf8"]
+
+
+def test_installation_property(vswhere_stub, vs_installation):
+    installation = vswhere.latest_installation(vswhere.vswhere_path())
+    assert vswhere.installation_property(installation, "installationPath") == vs_installation["installationPath"]
+    assert vswhere.installation_property(installation, "catalog_productDisplayVersion") == "17.9.6"
+    assert vswhere.installation_property(installation, "missing") == ""
+    assert vswhere.installation_property(None, "installationPath") == ""
+
+
+def test_component_version(vswhere_stub, vs_installation):
+    installation = vswhere.latest_installation(vswhere.vswhere_path())
+    version = vs_installation["installationVersion"]
+    assert vswhere.component_version(installation, "Microsoft.VisualStudio.Component.VC.Tools.ARM64") == version
+    assert vswhere.component_version(installation, "Microsoft.VisualStudio.Component.VC.Tools.ARM") == ""
+    assert vswhere.component_version(None, "Microsoft.VisualStudio.Component.VC.Tools.ARM64") == ""
+
+
+def test_vswhere_runs_once_per_process(vswhere_stub):
+    path = vswhere.vswhere_path()
+    installation = vswhere.latest_installation(path)
+    for _ in range(3):
+        assert vswhere.latest_installation(path) == installation
+        vswhere.query_installations(path)
+    assert len(stub_calls(vswhere_stub)) == 1
+
+
+def test_failing_vswhere_reports_no_installation(tmp_path, monkeypatch):
+    stub = tmp_path / "vswhere"
+    stub.write_text("#!/bin/sh\nexit 1\n")
+    stub.chmod(0o755)
+    monkeypatch.setattr(vswhere, "_installations", {})
+    assert vswhere.latest_installation(str(stub)) is None